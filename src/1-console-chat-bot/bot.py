@@ -1,12 +1,12 @@
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 from openai import (
@@ -15,6 +15,11 @@ from openai import (
     AuthenticationError
 )
 
+from hedging import HedgedChatModel
+from response_cache import CachedChatModel, ChatResponseCache
+from session_store import InMemorySessionStore, SQLiteSessionStore
+from telemetry import TelemetryHandler
+
 import logging
 
 logging.basicConfig(
@@ -28,19 +33,57 @@ logging.basicConfig(
 
 # Создаём класс для CLI-бота
 class CliBot():
-    def __init__(self, model_name, system_prompt="Ты полезный ассистент."):
+    def __init__(
+            self,
+            model_name,
+            system_prompt="Ты полезный ассистент.",
+            stream=True,
+            base_url="https://openrouter.ai/api/v1",
+            history_token_budget=2000,
+            session_db=None,
+            max_hot_sessions=1000,
+            http_async_client=None,
+            response_cache=None,
+            hedging=True,
+            fallback_model=None,
+            telemetry=None,
+    ):
         api_key = os.getenv("OPENROUTER_API_KEY", "")
 
-        self.chat_model = ChatOpenAI(
-            model=model_name,
+        model_kwargs = dict(
             temperature=0.7,
-            base_url="https://openrouter.ai/api/v1",
+            base_url=base_url,
             api_key=api_key,
             timeout=15,
+            stream_usage=True, # число токенов приходит в последнем чанке
+            http_async_client=http_async_client, # общий пул соединений в режиме сервера
+            cache=response_cache, # None — без кэша (или глобальный, если он задан)
+            max_retries=0 if hedging else 2, # с хеджированием повторами занимается HedgedChatModel
+            callbacks=[telemetry] if telemetry is not None else None, # JSONL-запись на каждый вызов
         )
+        self.chat_model = ChatOpenAI(model=model_name, **model_kwargs)
+        self.response_cache = response_cache
+
+        # Медленный ответ дублируется (в fallback_model, если задана) после p95 задержки
+        self.hedged_model = None
+        if hedging:
+            fallback = ChatOpenAI(model=fallback_model, **model_kwargs) if fallback_model else None
+            self.hedged_model = HedgedChatModel(self.chat_model, fallback=fallback)
 
-        # Создаём Хранилище истории
-        self.store = {} 
+        # Печатать ответ по мере генерации
+        self.stream = stream
+        # Метрики каждого хода: ttft, tokens, tokens_per_sec, total
+        self.turn_metrics = []
+
+        # Создаём Хранилище истории: SQLite переживает перезапуск, в памяти — только горячие сессии
+        if session_db:
+            self.store = SQLiteSessionStore(
+                session_db, max_hot_sessions=max_hot_sessions, token_budget=history_token_budget
+            )
+        else:
+            self.store = InMemorySessionStore(token_budget=history_token_budget)
+        # Старые ходы сворачиваются в резюме в фоне, пока пользователь читает ответ
+        self.summary_executor = ThreadPoolExecutor(max_workers=1)
 
         # Создаем шаблон промпта
         self.prompt = ChatPromptTemplate.from_messages([
@@ -50,7 +93,11 @@ class CliBot():
         ])
 
         # Создаём цепочку (тут используется синтаксис LCEL*)
-        self.chain = self.prompt | self.chat_model
+        # stream() у модели идёт мимо кэша, поэтому при кэше подставляем обёртку
+        model = self.hedged_model if self.hedged_model is not None else self.chat_model
+        if response_cache is not None:
+            model = CachedChatModel(self.chat_model, runner=model)
+        self.chain = self.prompt | model
 
         # Создаём цепочку с историей
         self.chain_with_history = RunnableWithMessageHistory(
@@ -62,16 +109,94 @@ class CliBot():
 
     # Метод для получения истории по session_id
     def get_session_history(self, session_id: str):
-        if session_id not in self.store:
-            self.store[session_id] = InMemoryChatMessageHistory()
-        return self.store[session_id]
+        return self.store.get(session_id)
+
+    @staticmethod
+    def session_config(session_id: str):
+        """Конфиг вызова: session_id для истории и (через metadata) для колбэков телеметрии"""
+        return {"configurable": {"session_id": session_id}, "metadata": {"session_id": session_id}}
     
+    def _reply_streaming(self, user_text, session_id):
+        """Печатает токены по мере прихода и возвращает полный ответ и метрики хода"""
+        start = time.perf_counter()
+        first_token_at = None
+        parts = []
+        usage = None
+
+        print("Бот: ", end="", flush=True)
+        # RunnableWithMessageHistory сам сохранит в историю собранное сообщение целиком
+        for chunk in self.chain_with_history.stream(
+            {"question": user_text},
+            self.session_config(session_id)
+        ):
+            if chunk.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                print(chunk.content, end="", flush=True)
+                parts.append(chunk.content)
+            if getattr(chunk, "usage_metadata", None):
+                usage = chunk.usage_metadata
+        end = time.perf_counter()
+        print("\n")
+
+        # без usage считаем каждый чанк за токен
+        tokens = usage["output_tokens"] if usage else len(parts)
+        first_token_at = first_token_at or end
+        generation_time = end - first_token_at
+        metrics = {
+            "ttft": first_token_at - start,
+            "tokens": tokens,
+            "tokens_per_sec": tokens / generation_time if generation_time > 0 else None,
+            "total": end - start,
+        }
+        return "".join(parts), metrics
+
+    def _reply_blocking(self, user_text, session_id):
+        start = time.perf_counter()
+        response = self.chain_with_history.invoke(
+            {"question": user_text},
+            self.session_config(session_id)
+        )
+        total = time.perf_counter() - start
+        bot_reply = response.content.strip()
+        usage = getattr(response, "usage_metadata", None)
+        print('Бот:', bot_reply, "\n")
+        return bot_reply, {
+            "ttft": total, # без стриминга первый токен виден только вместе с последним
+            "tokens": usage.get("output_tokens") if usage else None, # у ответа из кэша токенов нет
+            "tokens_per_sec": None,
+            "total": total,
+        }
+
+    def print_session_metrics(self):
+        """Сводка по задержкам за сессию"""
+        if not self.turn_metrics:
+            return
+        ttft = sorted(m["ttft"] for m in self.turn_metrics)
+        total = sorted(m["total"] for m in self.turn_metrics)
+        rates = [m["tokens_per_sec"] for m in self.turn_metrics if m["tokens_per_sec"]]
+        median = lambda values: values[len(values) // 2]
+        summary = (f"Ходов: {len(self.turn_metrics)} | медиана TTFT {median(ttft):.2f}s | "
+                   f"медиана общего времени {median(total):.2f}s")
+        if rates:
+            summary += f" | средняя скорость {sum(rates) / len(rates):.1f} ток/с"
+        if self.response_cache is not None:
+            summary += f" | попаданий в кэш {self.response_cache.hit_rate:.0%}"
+        if self.hedged_model is not None:
+            rates = self.hedged_model.rates
+            summary += f" | дублей {rates['hedge_rate']:.0%}, из них выиграли {rates['hedge_win_rate']:.0%}"
+            if self.hedged_model.fallback is not None:
+                summary += f" | ответов резервной модели {rates['fallback_rate']:.0%}"
+        print(summary)
+        logging.info(f"Session metrics: {summary}")
+
     def __call__(self, session_id):
         while True:
             try:
                 user_text = input("Вы: ").strip()
             except (KeyboardInterrupt, EOFError):
                 print("\nБот: Завершение работы.")
+                self.print_session_metrics()
                 break
             if not user_text:
                 continue
@@ -81,26 +206,28 @@ class CliBot():
             msg = user_text.lower()
             if msg in ("выход", "стоп", "конец"):
                 print("Бот: До свидания!")
+                self.print_session_metrics()
                 break
             if msg == "сброс":
-                if session_id in self.store:
-                    del self.store[session_id]
+                self.store.delete(session_id)
                 print("Бот: Контекст диалога очищен.")
                 continue
             
             try:
-                print("Sending request to API...")
-                start_time = time.time()
-                response = self.chain_with_history.invoke(
-                    {"question": user_text},
-                    {"configurable": {"session_id": session_id}}
+                if self.stream:
+                    bot_reply, metrics = self._reply_streaming(user_text, session_id)
+                else:
+                    print("Sending request to API...")
+                    bot_reply, metrics = self._reply_blocking(user_text, session_id)
+                logging.info(f"Bot: {bot_reply}")
+                self.get_session_history(session_id).compact_in_background(
+                    self.chat_model, self.summary_executor
                 )
-                logging.info(f"Bot: {response.content}")
-                end_time = time.time()
 
-                bot_reply = response.content.strip()
-                print(f"Response time: {end_time - start_time:.2f} seconds")
-                print('Бот:', bot_reply, "\n")
+                self.turn_metrics.append(metrics)
+                logging.info(f"Metrics: {metrics}")
+                rate = f" | {metrics['tokens_per_sec']:.1f} ток/с" if metrics["tokens_per_sec"] else ""
+                print(f"⏱ TTFT {metrics['ttft']:.2f}s{rate} | всего {metrics['total']:.2f}s\n")
             except APITimeoutError as e:
                 print("Бот: [Ошибка] Превышено время ожидания ответа.")
                 continue
@@ -118,9 +245,26 @@ class CliBot():
 if __name__ == "__main__":
     system_prompt = '''Ты полезный ассистент. Еще ты лихой пират в прошлом. Отвечай подробно и по существу с щепоткой соленого морского юмора'''
 
+    # BOT_SEMANTIC_CACHE=<модель эмбеддингов> включает семантический уровень кэша
+    semantic_model = os.getenv("BOT_SEMANTIC_CACHE")
+    embeddings = None
+    if semantic_model:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=semantic_model)
+
+    # JSONL-телеметрия вызовов LLM; отчёт: python telemetry.py report
+    telemetry = TelemetryHandler(os.getenv("BOT_TELEMETRY", "chat_telemetry.jsonl"))
+
     bot = CliBot(
         model_name = os.getenv("OPENROUTER_API_MODEL", "no-model"),
+        stream = os.getenv("BOT_STREAM", "1") != "0",
+        session_db = os.getenv("BOT_SESSION_DB", "chat_sessions.db"),
+        response_cache = ChatResponseCache(ttl=float(os.getenv("BOT_CACHE_TTL", "3600")), embeddings=embeddings),
+        hedging = os.getenv("BOT_HEDGE", "1") != "0",
+        fallback_model = os.getenv("BOT_FALLBACK_MODEL"),
+        telemetry = telemetry,
     )
 
     logging.info("=== New session ===")
-    bot("user_123")
\ No newline at end of file
+    bot("user_123")
+    telemetry.close()
\ No newline at end of file
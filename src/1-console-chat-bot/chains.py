@@ -1,21 +1,31 @@
 
 import os
+import time
 from dotenv import load_dotenv
 
+from langchain_core.globals import set_llm_cache
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableSequence
 
+from response_cache import ChatResponseCache
+from telemetry import TelemetryHandler
+
 
 load_dotenv()
 model = os.getenv("OPENAI_API_MODEL", "gpt-5-mini")
 
+# Глобальный кэш ответов: одинаковые промпты во всех цепочках ниже не уходят в API повторно
+response_cache = ChatResponseCache(ttl=3600)
+set_llm_cache(response_cache)
+# Задержки и токены каждого вызова — в chat_telemetry.jsonl (отчёт: python telemetry.py report)
+telemetry = TelemetryHandler()
 
 
 # Base 
 prompt = ChatPromptTemplate.from_template("Переведи на английский: {текст}")
 
-llm = ChatOpenAI(model=model, temperature=0)
+llm = ChatOpenAI(model=model, temperature=0, callbacks=[telemetry])
 chain = RunnableSequence(first=prompt, last=llm)
 result = chain.invoke({"текст": "Доброе утро"})
 
@@ -114,3 +124,14 @@ chain = {"text": RunnablePassthrough()} | branch | StrOutputParser()
 
 result = chain.invoke({"text": "Какая сегодня погода?"})
 print(result)
+
+
+# Повторный запрос с тем же промптом и параметрами модели отвечает из кэша
+prompt = ChatPromptTemplate.from_template("Переведи на английский: {текст}")
+chain = prompt | llm | StrOutputParser()
+for attempt in range(2):
+    start = time.perf_counter()
+    result = chain.invoke({"текст": "Доброе утро"})
+    print(f"{result} ({time.perf_counter() - start:.3f}s)")
+print(response_cache.stats)
+telemetry.close()
@@ -0,0 +1,366 @@
+import asyncio
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Iterator, Optional
+
+import numpy as np
+from langchain_core.runnables import Runnable, RunnableConfig
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+
+# Ошибки, после которых есть смысл повторить запрос (APITimeoutError — наследник APIConnectionError)
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+_DONE = object()
+
+
+# Обёртка над чат-моделью против хвостовых задержек: дублирующий запрос, резервная модель, повторы
+class HedgedChatModel(Runnable):
+    def __init__(
+            self,
+            model,
+            fallback=None,
+            hedge_quantile: float = 0.95,
+            initial_delay: float = 2.0,
+            min_delay: float = 0.3,
+            max_delay: float = 10.0,
+            window: int = 200,
+            min_samples: int = 20,
+            max_retries: int = 2,
+            backoff_base: float = 0.5,
+    ):
+        """
+        Args:
+            model: Основная чат-модель (лучше с max_retries=0 — повторами занимается обёртка)
+            fallback: Модель для дублирующего запроса; None — дублируем в основную
+            hedge_quantile: Какой квантиль задержки ждать перед дублирующим запросом
+            initial_delay: Задержка дубля, пока не набралось min_samples замеров
+            min_delay: Нижняя граница задержки дубля
+            max_delay: Верхняя граница задержки дубля
+            window: Сколько последних замеров учитывать
+            min_samples: С какого числа замеров задержка считается по квантилю
+            max_retries: Сколько раз повторять запрос при сетевых ошибках
+            backoff_base: Базовая пауза экспоненциального отката с джиттером, секунды
+        """
+        self.model = model
+        self.fallback = fallback
+        self.hedge_quantile = hedge_quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        # задержки отдельно для invoke (весь ответ) и stream (первый чанк)
+        self._latencies = {"invoke": deque(maxlen=window), "stream": deque(maxlen=window)}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8)
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "fallback_wins": 0, "retries": 0, "failures": 0}
+
+    @property
+    def InputType(self):
+        return self.model.InputType
+
+    @property
+    def OutputType(self):
+        return self.model.OutputType
+
+    def hedge_delay(self, mode: str = "invoke") -> float:
+        """Сколько ждать основной запрос, прежде чем отправить дубль"""
+        with self._lock:
+            samples = list(self._latencies[mode])
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        delay = float(np.quantile(samples, self.hedge_quantile))
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    def _backoff(self, attempt: int) -> float:
+        # полный джиттер: одновременно упавшие клиенты не повторяют запрос синхронно
+        return random.uniform(0, self.backoff_base * 2 ** attempt)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _finish(self, mode: str, role: str, latency: float):
+        with self._lock:
+            self._latencies[mode].append(latency)
+            if role == "hedge":
+                self.stats["hedge_wins"] += 1
+                if self.fallback is not None:
+                    self.stats["fallback_wins"] += 1
+
+    def _hedge_model(self):
+        return self.fallback if self.fallback is not None else self.model
+
+    def _model(self, role: str):
+        return self.model if role == "primary" else self._hedge_model()
+
+    @property
+    def rates(self) -> dict:
+        """Доли запросов с дублем и ответов, которые пришли от дубля / резервной модели"""
+        requests = self.stats["requests"] or 1
+        return {
+            "hedge_rate": self.stats["hedged"] / requests,
+            "hedge_win_rate": self.stats["hedge_wins"] / requests,
+            "fallback_rate": self.stats["fallback_wins"] / requests,
+        }
+
+    # --- синхронный режим (CLI): попытки в потоках, проигравшая отбрасывается ---
+
+    def _invoke_with_retries(self, model, input, config, kwargs, stop: threading.Event):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return model.invoke(input, config, **kwargs)
+            except RETRYABLE_ERRORS:
+                # проигравшая попытка не повторяется: её ответ уже никому не нужен
+                if attempt == self.max_retries or stop.is_set():
+                    raise
+                self._count("retries")
+                # пауза прерывается, как только попытку остановят
+                if stop.wait(self._backoff(attempt)):
+                    raise
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        self._count("requests")
+        start = time.perf_counter()
+        futures = {}
+        stops = {}
+
+        def launch(role, model):
+            stop = threading.Event()
+            future = self._executor.submit(self._invoke_with_retries, model, input, config, kwargs, stop)
+            futures[future] = role
+            stops[future] = stop
+
+        launch("primary", self.model)
+        hedged = False
+        last_error = None
+        try:
+            done, _ = wait(futures, timeout=self.hedge_delay("invoke"))
+            while True:
+                for future in done:
+                    role = futures.pop(future)
+                    if future.exception() is None:
+                        self._finish("invoke", role, time.perf_counter() - start)
+                        return future.result()
+                    last_error = future.exception()
+                # дубль — по таймеру или сразу, если основной запрос упал на сетевой ошибке;
+                # ошибку самого запроса (неверный ключ, плохой запрос) дубль не исправит
+                if not hedged and (last_error is None or isinstance(last_error, RETRYABLE_ERRORS)):
+                    hedged = True
+                    self._count("hedged")
+                    launch("hedge", self._hedge_model())
+                if not futures:
+                    self._count("failures")
+                    raise last_error
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        finally:
+            # синхронный HTTP-вызов не прервать: проигравший дорабатывает текущий запрос, но не повторяет его
+            for future in futures:
+                stops[future].set()
+                future.cancel()
+
+    def _stream_attempt(self, model, role, input, config, kwargs, out: queue.Queue, stop: threading.Event):
+        """Поток одной попытки: чанки в общую очередь, пока попытку не остановят"""
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                for chunk in model.stream(input, config, **kwargs):
+                    if stop.is_set():
+                        return  # выход из цикла закрывает генератор и HTTP-ответ
+                    started = True
+                    out.put((role, chunk))
+                out.put((role, _DONE))
+                return
+            except Exception as e:
+                # после первого чанка ответ уже показан пользователю — повтор невозможен
+                if started or not isinstance(e, RETRYABLE_ERRORS) or attempt == self.max_retries:
+                    out.put((role, e))
+                    return
+                self._count("retries")
+                if stop.wait(self._backoff(attempt)):
+                    return
+
+    def stream(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator:
+        stream = self.stream_with_model(input, config, **kwargs)
+        try:
+            for _, chunk in stream:
+                yield chunk
+        finally:
+            stream.close()
+
+    def stream_with_model(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[tuple]:
+        """Как stream(), но вместе с чанком отдаёт модель, чья попытка выиграла (для ключа кэша)"""
+        self._count("requests")
+        start = time.perf_counter()
+        out = queue.Queue()
+        stops = {}
+
+        def launch(role, model):
+            stops[role] = threading.Event()
+            threading.Thread(
+                target=self._stream_attempt, args=(model, role, input, config, kwargs, out, stops[role]), daemon=True
+            ).start()
+
+        launch("primary", self.model)
+        deadline = start + self.hedge_delay("stream")
+        winner = None
+        failed = set()
+        last_error = None
+        try:
+            while True:
+                timeout = max(deadline - time.perf_counter(), 0) if "hedge" not in stops else None
+                try:
+                    role, item = out.get(timeout=timeout)
+                except queue.Empty:
+                    role, item = None, None
+                # до первого чанка: по таймеру или сетевой ошибке основного запроса отправляем дубль
+                if winner is None and (role is None or isinstance(item, Exception)):
+                    if role is not None:
+                        failed.add(role)
+                        last_error = item
+                    if "hedge" not in stops and (role is None or isinstance(item, RETRYABLE_ERRORS)):
+                        self._count("hedged")
+                        launch("hedge", self._hedge_model())
+                    elif failed == set(stops):
+                        self._count("failures")
+                        raise last_error
+                    continue
+                if winner is None:
+                    winner = role
+                    for other, stop in stops.items():
+                        if other != winner:
+                            stop.set()
+                    self._finish("stream", role, time.perf_counter() - start)
+                if role != winner:
+                    continue
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield self._model(winner), item
+        finally:
+            for stop in stops.values():
+                stop.set()
+
+    # --- асинхронный режим (сервер): проигравшая задача отменяется ---
+
+    async def _ainvoke_with_retries(self, model, input, config, kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await model.ainvoke(input, config, **kwargs)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def ainvoke(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        self._count("requests")
+        start = time.perf_counter()
+        tasks = {asyncio.ensure_future(self._ainvoke_with_retries(self.model, input, config, kwargs)): "primary"}
+        hedged = False
+        last_error = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay("invoke"))
+            while True:
+                for task in done:
+                    role = tasks.pop(task)
+                    if task.exception() is None:
+                        self._finish("invoke", role, time.perf_counter() - start)
+                        return task.result()
+                    last_error = task.exception()
+                if not hedged and (last_error is None or isinstance(last_error, RETRYABLE_ERRORS)):
+                    hedged = True
+                    self._count("hedged")
+                    tasks[asyncio.ensure_future(
+                        self._ainvoke_with_retries(self._hedge_model(), input, config, kwargs)
+                    )] = "hedge"
+                if not tasks:
+                    self._count("failures")
+                    raise last_error
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _astream_attempt(self, model, role, input, config, kwargs, out: asyncio.Queue):
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async for chunk in model.astream(input, config, **kwargs):
+                    started = True
+                    await out.put((role, chunk))
+                await out.put((role, _DONE))
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if started or not isinstance(e, RETRYABLE_ERRORS) or attempt == self.max_retries:
+                    await out.put((role, e))
+                    return
+                self._count("retries")
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def astream(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        stream = self.astream_with_model(input, config, **kwargs)
+        try:
+            async for _, chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def astream_with_model(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        """Как astream(), но вместе с чанком отдаёт модель, чья попытка выиграла (для ключа кэша)"""
+        self._count("requests")
+        start = time.perf_counter()
+        out = asyncio.Queue()
+        tasks = {}
+
+        def launch(role, model):
+            tasks[role] = asyncio.ensure_future(self._astream_attempt(model, role, input, config, kwargs, out))
+
+        launch("primary", self.model)
+        deadline = start + self.hedge_delay("stream")
+        winner = None
+        failed = set()
+        last_error = None
+        try:
+            while True:
+                timeout = max(deadline - time.perf_counter(), 0) if "hedge" not in tasks else None
+                try:
+                    role, item = await asyncio.wait_for(out.get(), timeout)
+                except asyncio.TimeoutError:
+                    role, item = None, None
+                if winner is None and (role is None or isinstance(item, Exception)):
+                    if role is not None:
+                        failed.add(role)
+                        last_error = item
+                    if "hedge" not in tasks and (role is None or isinstance(item, RETRYABLE_ERRORS)):
+                        self._count("hedged")
+                        launch("hedge", self._hedge_model())
+                    elif failed == set(tasks):
+                        self._count("failures")
+                        raise last_error
+                    continue
+                if winner is None:
+                    winner = role
+                    for other, task in tasks.items():
+                        if other != winner:
+                            task.cancel()
+                    self._finish("stream", role, time.perf_counter() - start)
+                if role != winner:
+                    continue
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield self._model(winner), item
+        finally:
+            for task in tasks.values():
+                task.cancel()
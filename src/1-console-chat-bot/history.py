@@ -0,0 +1,125 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+
+SUMMARY_PROMPT = """Ниже краткое содержание беседы и её продолжение.
+Обнови краткое содержание так, чтобы в нём остались все факты, договорённости,
+имена, числа и открытые вопросы пользователя. Пиши кратко, от третьего лица.
+
+Краткое содержание:
+{summary}
+
+Продолжение беседы:
+{dialog}
+
+Новое краткое содержание:"""
+
+
+# История с бюджетом токенов: свежие ходы дословно, старые — в скользящем резюме
+class CompactingChatMessageHistory(BaseChatMessageHistory):
+    def __init__(self, token_budget: int = 2000, keep_ratio: float = 0.5, min_recent_turns: int = 2):
+        """
+        Args:
+            token_budget: Сжимать историю, когда дословная часть больше этого числа токенов
+            keep_ratio: Доля бюджета, которая остаётся дословной после сжатия
+            min_recent_turns: Сколько последних ходов никогда не сжимаются
+        """
+        self.token_budget = token_budget
+        self.keep_ratio = keep_ratio
+        self.min_recent_turns = min_recent_turns
+        self.summary = ""
+        self._messages: List[BaseMessage] = []
+        self._lock = threading.Lock()
+        self._epoch = 0  # меняется при clear(), чтобы не применять устаревшее резюме
+        self._pending: Optional[Future] = None
+
+    @property
+    def messages(self):
+        """Резюме (если есть) + последние ходы дословно"""
+        with self._lock:
+            recent = list(self._messages)
+            summary = self.summary
+        if summary:
+            return [SystemMessage(content=f"Краткое содержание предыдущей части беседы: {summary}")] + recent
+        return recent
+
+    def add_message(self, message: BaseMessage):
+        with self._lock:
+            self._messages.append(message)
+
+    def clear(self):
+        with self._lock:
+            self._messages = []
+            self.summary = ""
+            self._epoch += 1
+
+    def count_tokens(self, messages: List[BaseMessage]) -> int:
+        return count_tokens_approximately(messages)
+
+    def _split_point(self) -> int:
+        """Сколько старых сообщений свернуть в резюме (0 — сжимать не нужно)"""
+        if self.count_tokens(self._messages) <= self.token_budget:
+            return 0
+        # границы ходов — сообщения пользователя
+        turn_starts = [i for i, m in enumerate(self._messages) if isinstance(m, HumanMessage)]
+        if len(turn_starts) <= self.min_recent_turns:
+            return 0
+        keep_budget = self.token_budget * self.keep_ratio
+        cut = turn_starts[-self.min_recent_turns]
+        # отдаём дословной части столько свежих ходов, сколько влезает в keep_budget
+        for start in reversed(turn_starts[:-self.min_recent_turns]):
+            if self.count_tokens(self._messages[start:]) > keep_budget:
+                break
+            cut = start
+        return cut
+
+    def compact(self, llm):
+        """Свернуть старые ходы в резюме (блокирующий вызов LLM)"""
+        with self._lock:
+            cut = self._split_point()
+            if cut == 0:
+                return
+            to_fold = list(self._messages[:cut])
+            summary = self.summary
+            epoch = self._epoch
+
+        dialog = "\n".join(f"{m.type}: {m.content}" for m in to_fold)
+        response = llm.invoke(SUMMARY_PROMPT.format(summary=summary or "(пусто)", dialog=dialog))
+
+        with self._lock:
+            # пока шёл запрос, историю могли очистить — тогда резюме уже не нужно
+            if epoch != self._epoch:
+                return
+            self.summary = response.content.strip()
+            # новые сообщения только дописываются в конец, так что первые cut — те же самые
+            self._messages = self._messages[cut:]
+            self._after_compact(cut)
+        logging.info(f"History compacted: {len(to_fold)} messages folded into summary")
+
+    def _after_compact(self, folded: int):
+        """Хук для наследников: вызывается под блокировкой после сворачивания folded сообщений"""
+
+    @property
+    def compacting(self) -> bool:
+        return self._pending is not None and not self._pending.done()
+
+    def compact_in_background(self, llm, executor: ThreadPoolExecutor) -> Optional[Future]:
+        """Запустить compact() в фоне, если он ещё не идёт"""
+        if self.compacting:
+            return self._pending
+
+        def run():
+            try:
+                self.compact(llm)
+            except Exception as e:
+                # при ошибке просто остаёмся с полной историей до следующей попытки
+                logging.warning(f"History compaction failed: {e}")
+
+        self._pending = executor.submit(run)
+        return self._pending
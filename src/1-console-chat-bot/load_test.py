@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+import click
+from aiohttp import web
+
+
+# Заглушка OpenAI-совместимого API: отвечает с задержкой, чтобы мерить сам сервер, а не модель
+async def start_stub_llm(port: int, delay: float) -> web.AppRunner:
+    stats = {"calls": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        stats["calls"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            stats["in_flight"] -= 1
+        content = f"Ответ на сообщение №{len(body['messages'])}"
+        if body.get("stream"):
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for word in content.split(" "):
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            await response.write(b"data: [DONE]\n\n")
+            return response
+        return web.json_response({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    app["stats"] = stats
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def run_session(http: aiohttp.ClientSession, url: str, session_id: str, turns: int, stream: bool, results: dict):
+    """Один пользователь: ходы идут строго друг за другом, как в живом диалоге"""
+    for turn in range(turns):
+        start = time.perf_counter()
+        try:
+            async with http.post(url, json={"session_id": session_id, "message": f"Вопрос {turn}", "stream": stream}) as resp:
+                await resp.read()
+                status = resp.status
+        except aiohttp.ClientError:
+            status = "connection"
+        if status == 200:
+            results["latencies"].append(time.perf_counter() - start)
+        else:
+            results["errors"][str(status)] = results["errors"].get(str(status), 0) + 1
+
+
+@click.group()
+def cli():
+    """Load-test server.py against a local stub LLM."""
+
+
+@cli.command()
+@click.option("--port", default=8099, show_default=True)
+@click.option("--delay", default=0.5, show_default=True, help="Stub LLM latency, seconds")
+def stub(port, delay):
+    """Serve a stub OpenAI-compatible LLM (point server.py --base-url at it)."""
+    async def serve():
+        runner = await start_stub_llm(port, delay)
+        print(f"🧪 Заглушка LLM: http://127.0.0.1:{port}/v1 (задержка {delay}s)")
+        try:
+            while True:
+                await asyncio.sleep(10)
+                print(f"🧪 {runner.app['stats']}")
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.option("--url", default="http://127.0.0.1:8080", show_default=True, help="Chat server address")
+@click.option("--sessions", default=200, show_default=True, help="Concurrent sessions")
+@click.option("--turns", default=5, show_default=True, help="Turns per session")
+@click.option("--stream/--no-stream", default=False, show_default=True)
+def run(url, sessions, turns, stream):
+    """Drive the chat server with many concurrent sessions."""
+    async def drive():
+        results = {"latencies": [], "errors": {}}
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as http:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                run_session(http, f"{url}/chat", f"load_{i}", turns, stream, results) for i in range(sessions)
+            ))
+            elapsed = time.perf_counter() - start
+            async with http.get(f"{url}/stats") as resp:
+                server_stats = await resp.json()
+
+        latencies = sorted(results["latencies"])
+        percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float("nan")
+        print(f"📊 {sessions} сессий × {turns} ходов за {elapsed:.1f}s: "
+              f"{len(latencies)} успешно, {len(latencies) / elapsed:.1f} ход/с")
+        print(f"⏱ p50 {percentile(0.5):.2f}s | p95 {percentile(0.95):.2f}s | p99 {percentile(0.99):.2f}s")
+        if results["errors"]:
+            print(f"❌ Ошибки: {results['errors']}")
+        print(f"🖥 Сервер: {server_stats}")
+
+    asyncio.run(drive())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterator, Optional, Sequence
+
+import numpy as np
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.callbacks import AsyncCallbackManager, CallbackManager
+from langchain_core.embeddings import Embeddings
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import Runnable, RunnableConfig, ensure_config
+
+
+# Кэш ответов модели: точный уровень по хэшу промпта + необязательный семантический для вопросов без истории
+class ChatResponseCache(BaseCache):
+    def __init__(
+            self,
+            max_size: int = 1000,
+            ttl: Optional[float] = 3600,
+            embeddings: Optional[Embeddings] = None,
+            semantic_threshold: float = 0.95,
+    ):
+        """
+        Args:
+            max_size: Сколько ответов хранить; самые давно использованные вытесняются
+            ttl: Время жизни ответа в секундах (None — бессрочно)
+            embeddings: Локальные эмбеддинги для семантического уровня (None — только точный)
+            semantic_threshold: Минимальная косинусная близость вопроса для семантического попадания
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.embeddings = embeddings
+        self.semantic_threshold = semantic_threshold
+        self._lock = threading.Lock()
+        # ключ -> (истекает, ответ); порядок — от давно использованных к свежим
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # семантический индекс: (модель, системный промпт) -> {ключ: нормированный вектор вопроса}
+        self._vectors = {}
+        self._vector_group = {}
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        # llm_string содержит модель, температуру и прочие параметры вызова
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _stateless_question(prompt: str, llm_string: str):
+        """(группа, вопрос) для промпта без истории: системное сообщение + один вопрос; иначе None"""
+        try:
+            messages = json.loads(prompt)
+        except ValueError:
+            return None
+        types = [m.get("kwargs", {}).get("type") for m in messages]
+        if types not in (["human"], ["system", "human"]):
+            return None
+        question = messages[-1]["kwargs"]["content"]
+        if not isinstance(question, str):
+            return None
+        system = messages[0]["kwargs"]["content"] if len(messages) == 2 else ""
+        return (llm_string, system), question
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _drop(self, key: str):
+        self._entries.pop(key, None)
+        group = self._vector_group.pop(key, None)
+        if group is not None:
+            self._vectors[group].pop(key, None)
+            if not self._vectors[group]:
+                del self._vectors[group]
+
+    @staticmethod
+    def _mark_cached(value: RETURN_VAL_TYPE) -> RETURN_VAL_TYPE:
+        # пометка для телеметрии: ответ из кэша не тратит токены, хотя в usage_metadata лежат токены исходного вызова
+        return [g.model_copy(update={"generation_info": {**(g.generation_info or {}), "cached": True}}) for g in value]
+
+    def _get_fresh(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            self._drop(key)
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            value = self._get_fresh(key)
+            if value is not None:
+                self.stats["exact_hits"] += 1
+                return self._mark_cached(value)
+
+        stateless = self._stateless_question(prompt, llm_string) if self.embeddings else None
+        if stateless is not None:
+            group, question = stateless
+            # эмбеддинг считаем вне блокировки: это самая долгая часть поиска
+            query = self._embed(question)
+            with self._lock:
+                candidates = self._vectors.get(group, {})
+                if candidates:
+                    keys = list(candidates)
+                    scores = np.stack([candidates[k] for k in keys]) @ query
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.semantic_threshold:
+                        value = self._get_fresh(keys[best])
+                        if value is not None:
+                            self.stats["semantic_hits"] += 1
+                            return self._mark_cached(value)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        stateless = self._stateless_question(prompt, llm_string) if self.embeddings else None
+        vector = self._embed(stateless[1]) if stateless is not None else None
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (expires_at, return_val)
+            if vector is not None:
+                group = stateless[0]
+                self._vectors.setdefault(group, {})[key] = vector
+                self._vector_group[key] = group
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            self._vector_group.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+def _cache_args(model, input) -> tuple:
+    """(prompt, llm_string) так же, как их строит сама модель при invoke()"""
+    # Публичного способа получить ключ кэша у BaseChatModel нет: повторяем BaseChatModel._generate_with_cache
+    # через приватные _convert_input и _get_llm_string. Если они изменятся,
+    # stream() перестанет попадать в записи invoke() — это ловит test_response_cache.py
+    messages = model._convert_input(input).to_messages()
+    # id сообщений различается от вызова к вызову, в ключ он не входит
+    messages = [m.model_copy(update={"id": None}) if getattr(m, "id", None) else m for m in messages]
+    return dumps(messages), model._get_llm_string()
+
+
+# Обёртка для стриминга: BaseChatModel.stream() в обход кэша ходит в API, эта — сначала смотрит в кэш
+class CachedChatModel(Runnable):
+    def __init__(self, model, runner: Optional[Runnable] = None):
+        """
+        Args:
+            model: Чат-модель с ChatResponseCache в параметре cache; по ней строится ключ
+            runner: Что вызывать при промахе (например, HedgedChatModel над model); None — саму model.
+                Если стрим выиграла резервная модель HedgedChatModel, ответ кэшируется под её ключом
+        """
+        self.model = model
+        self.runner = runner if runner is not None else model
+        self.cache: ChatResponseCache = model.cache
+
+    @property
+    def InputType(self):
+        return self.model.InputType
+
+    @property
+    def OutputType(self):
+        return self.model.OutputType
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        # invoke() у модели уже проходит через cache
+        return self.runner.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        return await self.runner.ainvoke(input, config, **kwargs)
+
+    @staticmethod
+    def _as_chunk(cached: Optional[RETURN_VAL_TYPE]) -> Optional[AIMessageChunk]:
+        """Закэшированный ответ целиком одним чанком"""
+        if not cached:
+            return None
+        return AIMessageChunk(content=cached[0].message.content)
+
+    @staticmethod
+    def _assemble(chunks: Sequence[AIMessageChunk]) -> Optional[RETURN_VAL_TYPE]:
+        if not chunks:
+            return None
+        full = chunks[0]
+        for chunk in chunks[1:]:
+            full = full + chunk
+        message = AIMessage(content=full.content, response_metadata=full.response_metadata)
+        return [ChatGeneration(message=message)]
+
+    def _hit_callbacks(self, manager_cls, config: Optional[RunnableConfig]):
+        """Колбэки модели (телеметрия) для ответа из кэша: invoke() зовёт их сам, а попадание в stream() мимо модели"""
+        config = ensure_config(config)
+        return manager_cls.configure(
+            config.get("callbacks"), self.model.callbacks, self.model.verbose,
+            config.get("tags"), self.model.tags, config.get("metadata"), self.model.metadata,
+        )
+
+    def _hit_start_kwargs(self, input) -> dict:
+        return dict(
+            serialized={},
+            messages=[self.model._convert_input(input).to_messages()],
+            invocation_params={"model": getattr(self.model, "model_name", None)},
+            name=self.model.get_name(),
+        )
+
+    def _runner_stream(self, input, config, kwargs) -> Iterator[tuple]:
+        """(модель, чанк): HedgedChatModel сообщает, чья попытка выиграла, иначе отвечает сама model"""
+        if hasattr(self.runner, "stream_with_model"):
+            return self.runner.stream_with_model(input, config, **kwargs)
+        return ((self.model, chunk) for chunk in self.runner.stream(input, config, **kwargs))
+
+    async def _arunner_stream(self, input, config, kwargs):
+        if hasattr(self.runner, "astream_with_model"):
+            async for item in self.runner.astream_with_model(input, config, **kwargs):
+                yield item
+            return
+        async for chunk in self.runner.astream(input, config, **kwargs):
+            yield self.model, chunk
+
+    def _store_key(self, winner, input, key: tuple) -> tuple:
+        # ответ резервной модели кладём под её собственный ключ: под ключом основной он подменил бы её ответы
+        return key if winner is self.model else _cache_args(winner, input)
+
+    def stream(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[AIMessageChunk]:
+        prompt, llm_string = _cache_args(self.model, input)
+        cached = self.cache.lookup(prompt, llm_string)
+        hit = self._as_chunk(cached)
+        if hit is not None:
+            callbacks = self._hit_callbacks(CallbackManager, config)
+            run_managers = callbacks.on_chat_model_start(**self._hit_start_kwargs(input))
+            yield hit
+            for run_manager in run_managers:
+                run_manager.on_llm_end(LLMResult(generations=[cached]))
+            return
+        chunks = []
+        winner = self.model
+        for winner, chunk in self._runner_stream(input, config, kwargs):
+            chunks.append(chunk)
+            yield chunk
+        generations = self._assemble(chunks)
+        if generations:
+            self.cache.update(*self._store_key(winner, input, (prompt, llm_string)), generations)
+
+    async def astream(self, input, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        prompt, llm_string = _cache_args(self.model, input)
+        # alookup/aupdate уводят эмбеддинги семантического уровня из цикла событий
+        cached = await self.cache.alookup(prompt, llm_string)
+        hit = self._as_chunk(cached)
+        if hit is not None:
+            callbacks = self._hit_callbacks(AsyncCallbackManager, config)
+            run_managers = await callbacks.on_chat_model_start(**self._hit_start_kwargs(input))
+            yield hit
+            for run_manager in run_managers:
+                await run_manager.on_llm_end(LLMResult(generations=[cached]))
+            return
+        chunks = []
+        winner = self.model
+        async for winner, chunk in self._arunner_stream(input, config, kwargs):
+            chunks.append(chunk)
+            yield chunk
+        generations = self._assemble(chunks)
+        if generations:
+            await self.cache.aupdate(*self._store_key(winner, input, (prompt, llm_string)), generations)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import time
+
+import click
+import httpx
+from aiohttp import web
+
+from bot import CliBot
+from response_cache import ChatResponseCache
+from telemetry import TelemetryHandler
+
+
+# Асинхронный HTTP-сервер поверх той же цепочки с историей, что и у CliBot
+class ChatServer:
+    def __init__(self, bot: CliBot, max_in_flight: int = 64, max_queue: int = 512):
+        """
+        Args:
+            bot: Бот с цепочкой и хранилищем сессий
+            max_in_flight: Сколько запросов к LLM выполняется одновременно
+            max_queue: Сколько запросов может ждать своей очереди в сессии или свободного слота; сверх этого — 503
+        """
+        self.bot = bot
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.llm_slots = asyncio.Semaphore(max_in_flight)
+        # очередь ходов внутри сессии: ответы приходят в том же порядке, что и вопросы
+        self.session_locks = {}
+        self.session_waiters = {}
+        self.stats = {"served": 0, "rejected": 0, "errors": 0, "in_flight": 0, "queued": 0}
+        self.latencies = []
+
+    def _session_lock(self, session_id: str) -> asyncio.Lock:
+        if session_id not in self.session_locks:
+            self.session_locks[session_id] = asyncio.Lock()
+            self.session_waiters[session_id] = 0
+        return self.session_locks[session_id]
+
+    def _release_session(self, session_id: str):
+        self.session_waiters[session_id] -= 1
+        # не копим блокировки для всех сессий, которые когда-либо приходили
+        if self.session_waiters[session_id] == 0:
+            del self.session_locks[session_id]
+            del self.session_waiters[session_id]
+
+    async def _turn(self, session_id: str, message: str, on_chunk=None) -> str:
+        """Один ход диалога: порядок внутри сессии + общий лимит вызовов LLM"""
+        config = self.bot.session_config(session_id)
+        lock = self._session_lock(session_id)
+        self.session_waiters[session_id] += 1
+        # в очереди и те, кто ждёт предыдущий ход своей сессии, и те, кто ждёт слот LLM
+        self.stats["queued"] += 1
+        waiting = True
+        try:
+            async with lock:
+                await self.llm_slots.acquire()
+                self.stats["queued"] -= 1
+                waiting = False
+                self.stats["in_flight"] += 1
+                try:
+                    if on_chunk is None:
+                        response = await self.bot.chain_with_history.ainvoke({"question": message}, config)
+                        reply = response.content
+                    else:
+                        parts = []
+                        async for chunk in self.bot.chain_with_history.astream({"question": message}, config):
+                            if chunk.content:
+                                parts.append(chunk.content)
+                                await on_chunk(chunk.content)
+                        reply = "".join(parts)
+                finally:
+                    self.stats["in_flight"] -= 1
+                    self.llm_slots.release()
+        finally:
+            if waiting:
+                self.stats["queued"] -= 1
+            self._release_session(session_id)
+
+        self.bot.get_session_history(session_id).compact_in_background(
+            self.bot.chat_model, self.bot.summary_executor
+        )
+        return reply
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        """POST /chat {"session_id", "message", "stream": false}"""
+        try:
+            body = await request.json()
+            session_id = str(body["session_id"])
+            message = str(body["message"]).strip()
+        except (ValueError, KeyError):
+            return web.json_response({"error": "expected JSON with session_id and message"}, status=400)
+
+        # обратное давление: при переполненной очереди (сессии + слоты LLM) отказываем сразу, а не копим задачи
+        if self.stats["queued"] >= self.max_queue:
+            self.stats["rejected"] += 1
+            return web.json_response({"error": "overloaded"}, status=503, headers={"Retry-After": "1"})
+
+        if message.lower() == "сброс":
+            self.bot.store.delete(session_id)
+            return web.json_response({"reply": "Контекст диалога очищен."})
+
+        start = time.perf_counter()
+        try:
+            if body.get("stream"):
+                response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+                await response.prepare(request)
+                await self._turn(session_id, message, on_chunk=lambda text: response.write(text.encode("utf-8")))
+                await response.write_eof()
+            else:
+                reply = await self._turn(session_id, message)
+                response = web.json_response({"reply": reply})
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.exception(f"Chat turn failed for session {session_id}")
+            return web.json_response({"error": str(e)}, status=502)
+
+        self.stats["served"] += 1
+        self.latencies.append(time.perf_counter() - start)
+        if len(self.latencies) > 10_000:
+            self.latencies = self.latencies[-5_000:]
+        return response
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        latencies = sorted(self.latencies)
+        cache = self.bot.response_cache
+        hedged = self.bot.hedged_model
+        percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+        return web.json_response({
+            **self.stats,
+            "sessions_active": len(self.session_locks),
+            "p50_seconds": percentile(0.5),
+            "p95_seconds": percentile(0.95),
+            "cache": {**cache.stats, "size": len(cache), "hit_rate": cache.hit_rate} if cache is not None else None,
+            "hedging": {**hedged.stats, **hedged.rates} if hedged is not None else None,
+        })
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/chat", self.handle_chat)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8080, show_default=True)
+@click.option("--base-url", default="https://openrouter.ai/api/v1", show_default=True,
+              help="OpenAI-compatible endpoint (e.g. a local stub for load tests)")
+@click.option("--max-in-flight", default=64, show_default=True, help="Concurrent LLM calls")
+@click.option("--max-queue", default=512, show_default=True, help="Waiting requests before 503")
+@click.option("--max-connections", default=100, show_default=True, help="Size of the shared HTTP pool")
+@click.option("--session-db", default="chat_sessions.db", show_default=True, help="SQLite session store ('' for memory)")
+@click.option("--cache-size", default=10_000, show_default=True, help="Cached responses (0 disables the cache)")
+@click.option("--cache-ttl", default=3600.0, show_default=True, help="Cached response lifetime, seconds")
+@click.option("--hedge/--no-hedge", default=True, show_default=True, help="Duplicate slow requests after the p95 delay")
+@click.option("--fallback-model", default=None, help="Model for hedged requests (default: the primary model)")
+@click.option("--telemetry", default="chat_telemetry.jsonl", show_default=True, help="JSONL log of LLM calls ('' to disable)")
+def main(host, port, base_url, max_in_flight, max_queue, max_connections, session_db, cache_size, cache_ttl,
+         hedge, fallback_model, telemetry):
+    """Serve CliBot over HTTP for many concurrent sessions."""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(15.0),
+    )
+    telemetry = TelemetryHandler(telemetry) if telemetry else None
+    bot = CliBot(
+        model_name=os.getenv("OPENROUTER_API_MODEL", "no-model"),
+        base_url=base_url,
+        session_db=session_db or None,
+        http_async_client=http_client,
+        response_cache=ChatResponseCache(max_size=cache_size, ttl=cache_ttl) if cache_size else None,
+        hedging=hedge,
+        fallback_model=fallback_model,
+        telemetry=telemetry,
+    )
+    server = ChatServer(bot, max_in_flight=max_in_flight, max_queue=max_queue)
+    app = server.make_app()
+
+    async def close_pool(app):
+        await http_client.aclose()
+        if telemetry is not None:
+            telemetry.close()
+
+    app.on_cleanup.append(close_pool)
+    print(f"🚀 Сервер чата: http://{host}:{port}/chat (статистика: /stats)")
+    web.run_app(app, host=host, port=port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from history import CompactingChatMessageHistory
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summary_upto INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+# Хранилище в памяти: поведение по умолчанию, сессии живут до перезапуска
+class InMemorySessionStore:
+    def __init__(self, token_budget: int = 2000):
+        self.token_budget = token_budget
+        self._sessions = {}
+
+    def get(self, session_id: str) -> CompactingChatMessageHistory:
+        if session_id not in self._sessions:
+            self._sessions[session_id] = CompactingChatMessageHistory(token_budget=self.token_budget)
+        return self._sessions[session_id]
+
+    def delete(self, session_id: str):
+        history = self._sessions.pop(session_id, None)
+        if history is not None:
+            history.clear()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+
+# История одной сессии в SQLite: сообщения только дописываются, сжатие двигает указатель summary_upto
+class SQLiteChatMessageHistory(CompactingChatMessageHistory):
+    def __init__(self, store: "SQLiteSessionStore", session_id: str, token_budget: int = 2000):
+        super().__init__(token_budget=token_budget)
+        self.store = store
+        self.session_id = session_id
+        self._row_ids: List[int] = []
+        self._load()
+
+    def _load(self):
+        """Загрузить резюме и несвёрнутые сообщения сессии"""
+        with self.store.lock:
+            row = self.store.conn.execute(
+                "SELECT summary, summary_upto FROM sessions WHERE session_id = ?", (self.session_id,)
+            ).fetchone()
+            summary, upto = row if row else ("", 0)
+            rows = self.store.conn.execute(
+                "SELECT id, message FROM messages WHERE session_id = ? AND id > ? ORDER BY id",
+                (self.session_id, upto),
+            ).fetchall()
+        self.summary = summary
+        self._row_ids = [r[0] for r in rows]
+        self._messages = messages_from_dict([json.loads(r[1]) for r in rows])
+
+    def add_message(self, message: BaseMessage):
+        with self._lock:
+            with self.store.lock, self.store.conn:
+                cursor = self.store.conn.execute(
+                    "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                    (self.session_id, json.dumps(message_to_dict(message), ensure_ascii=False)),
+                )
+            self._messages.append(message)
+            self._row_ids.append(cursor.lastrowid)
+
+    def _after_compact(self, folded: int):
+        upto = self._row_ids[folded - 1]
+        self._row_ids = self._row_ids[folded:]
+        with self.store.lock, self.store.conn:
+            self.store.conn.execute(
+                "INSERT INTO sessions (session_id, summary, summary_upto) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, summary_upto = excluded.summary_upto",
+                (self.session_id, self.summary, upto),
+            )
+
+    def clear(self):
+        with self._lock:
+            self.store.delete_rows(self.session_id)
+            self._messages = []
+            self._row_ids = []
+            self.summary = ""
+            self._epoch += 1
+
+
+# SQLite + ограниченный LRU «горячих» сессий в памяти; холодные подгружаются при обращении
+class SQLiteSessionStore:
+    def __init__(self, path: str = "chat_sessions.db", max_hot_sessions: int = 1000, token_budget: int = 2000):
+        """
+        Args:
+            path: Файл базы SQLite
+            max_hot_sessions: Сколько сессий держать в памяти одновременно
+            token_budget: Бюджет токенов истории для каждой сессии
+        """
+        self.max_hot_sessions = max_hot_sessions
+        self.token_budget = token_budget
+        # соединение общее для фоновых потоков сжатия, доступ — через lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        self._hot: "OrderedDict[str, SQLiteChatMessageHistory]" = OrderedDict()
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0}
+
+    def get(self, session_id: str) -> SQLiteChatMessageHistory:
+        with self.lock:
+            history = self._hot.get(session_id)
+            if history is not None:
+                self._hot.move_to_end(session_id)
+                self.stats["hits"] += 1
+                return history
+            history = SQLiteChatMessageHistory(self, session_id, token_budget=self.token_budget)
+            self.stats["loads"] += 1
+            self._hot[session_id] = history
+            self._evict()
+            return history
+
+    def _evict(self):
+        """Выгрузить самые давние сессии; те, что сейчас сжимаются, пропускаем"""
+        for session_id in list(self._hot):
+            if len(self._hot) <= self.max_hot_sessions:
+                break
+            if self._hot[session_id].compacting:
+                continue
+            del self._hot[session_id]
+            self.stats["evictions"] += 1
+
+    def delete_rows(self, session_id: str):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def delete(self, session_id: str):
+        """Сброс сессии: два DELETE по индексу, без чтения истории"""
+        with self.lock:
+            history = self._hot.pop(session_id, None)
+        if history is not None:
+            history.clear()
+        else:
+            self.delete_rows(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self.lock:
+            if session_id in self._hot:
+                return True
+            row = self.conn.execute("SELECT 1 FROM messages WHERE session_id = ? LIMIT 1", (session_id,)).fetchone()
+        return row is not None
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+import click
+import pandas as pd
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.common.json_cache import read_jsonl
+
+
+_STOP = object()
+
+
+# Фоновый писатель JSONL: запросы только кладут запись в очередь, на диск пишет отдельный поток
+class JsonlWriter:
+    def __init__(self, path: str, max_queue: int = 10_000):
+        """
+        Args:
+            path: Файл, в который дописываются записи
+            max_queue: Размер очереди; при переполнении запись теряется, а не тормозит запрос
+        """
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is _STOP:
+                    break
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                # пачку, накопившуюся за время записи, сбрасываем одним flush
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self, timeout: float = 5.0):
+        """Дописать очередь и остановить поток"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self.dropped:
+            logging.warning(f"Telemetry: {self.dropped} records dropped (queue full)")
+
+
+# Колбэк LangChain: одна JSONL-запись на каждый вызов чат-модели
+class TelemetryHandler(BaseCallbackHandler):
+    # обработчик только кладёт запись в очередь, поэтому и в async-цепочках его можно звать прямо в цикле событий
+    run_inline = True
+
+    def __init__(self, path: str = "chat_telemetry.jsonl", max_queue: int = 10_000):
+        self.writer = JsonlWriter(path, max_queue=max_queue)
+        self._runs: Dict[UUID, dict] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: dict, messages: List[list], *, run_id: UUID,
+                            metadata: Optional[dict] = None, **kwargs: Any):
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        with self._lock:
+            self._runs[run_id] = {
+                "start": time.perf_counter(),
+                "first_token": None,
+                "session_id": metadata.get("session_id"),
+                "model": metadata.get("ls_model_name") or params.get("model") or params.get("model_name"),
+            }
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and token and run["first_token"] is None:
+                run["first_token"] = time.perf_counter()
+
+    @staticmethod
+    def _is_cached(response: LLMResult) -> bool:
+        """Ответ отдан из ChatResponseCache: он помечает generation_info своих попаданий"""
+        return any((generation.generation_info or {}).get("cached")
+                   for generations in response.generations for generation in generations)
+
+    @staticmethod
+    def _usage(response: LLMResult) -> tuple:
+        """(prompt_tokens, completion_tokens) из ответа; None, если провайдер их не вернул"""
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage and "input_tokens" in usage:
+                    return usage["input_tokens"], usage["output_tokens"]
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+
+    def _finish(self, run_id: UUID, **fields):
+        end = time.perf_counter()
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        first_token = run["first_token"]
+        self.writer.write({
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "run_id": str(run_id),
+            "session_id": run["session_id"],
+            "model": run["model"],
+            "ttft": round(first_token - run["start"], 4) if first_token else None,
+            "latency": round(end - run["start"], 4),
+            **fields,
+        })
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        cached = self._is_cached(response)
+        # в закэшированном сообщении usage_metadata исходного вызова, но провайдеру за этот ответ не платим
+        prompt_tokens, completion_tokens = (0, 0) if cached else self._usage(response)
+        self._finish(run_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                     cached=cached, error=None, cancelled=False)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        # проигравший дублирующий запрос прерывается — это не ошибка провайдера
+        cancelled = isinstance(error, (GeneratorExit, asyncio.CancelledError))
+        self._finish(run_id, prompt_tokens=None, completion_tokens=None, cached=False,
+                     error=None if cancelled else type(error).__name__, cancelled=cancelled)
+
+    def close(self):
+        self.writer.close()
+
+
+def load_telemetry(path: str) -> pd.DataFrame:
+    """Записи телеметрии; нет файла или он пуст — пустая таблица, недописанная последняя строка пропускается"""
+    return pd.DataFrame(list(read_jsonl(path)))
+
+
+def telemetry_report(df: pd.DataFrame) -> pd.DataFrame:
+    """Перцентили задержек и расход токенов по моделям"""
+    # столбец из одних None (например, ttft без стриминга) иначе остаётся object и ломает quantile
+    numeric = {col: pd.to_numeric(df[col]) for col in ("ttft", "latency", "prompt_tokens", "completion_tokens")}
+    df = df.assign(
+        **numeric,
+        model=df["model"].fillna("unknown"),
+        failed=df["error"].notna(),
+        cancelled=df.get("cancelled", pd.Series(False, index=df.index)).fillna(False).astype(bool),
+        cached=df.get("cached", pd.Series(False, index=df.index)).fillna(False).astype(bool),
+    )
+    ok = df[~df["failed"] & ~df["cancelled"]]
+    # задержки — только реальных вызовов: мгновенные ответы из кэша занижали бы перцентили модели
+    called = ok[~ok["cached"]]
+    report = pd.DataFrame({
+        "calls": df.groupby("model").size(),
+        "cache_hits": df.groupby("model")["cached"].sum(),
+        "errors": df.groupby("model")["failed"].sum(),
+        "cancelled": df.groupby("model")["cancelled"].sum(),
+        "latency_p50": called.groupby("model")["latency"].quantile(0.5),
+        "latency_p95": called.groupby("model")["latency"].quantile(0.95),
+        "latency_p99": called.groupby("model")["latency"].quantile(0.99),
+        "ttft_p50": called.groupby("model")["ttft"].quantile(0.5),
+        "ttft_p95": called.groupby("model")["ttft"].quantile(0.95),
+        "prompt_tokens": ok.groupby("model")["prompt_tokens"].sum(),
+        "completion_tokens": ok.groupby("model")["completion_tokens"].sum(),
+    })
+    return report.sort_values("calls", ascending=False)
+
+
+@click.group()
+def cli():
+    """Chat telemetry tools."""
+
+
+@cli.command()
+@click.argument("path", default="chat_telemetry.jsonl", type=click.Path(dir_okay=False))
+def report(path):
+    """Print latency percentiles and token usage per model."""
+    df = load_telemetry(path)
+    if df.empty:
+        print("Записей нет")
+        return
+    print(f"📊 {len(df)} вызовов LLM, {df['session_id'].nunique()} сессий")
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.3f}".format):
+        print(telemetry_report(df))
+    errors = df["error"].dropna()
+    if len(errors):
+        print("\n❌ Ошибки по типам:")
+        print(errors.value_counts().to_string())
+
+
+if __name__ == "__main__":
+    cli()
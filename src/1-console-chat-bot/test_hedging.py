@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+from openai import APIConnectionError, AuthenticationError
+
+from hedging import HedgedChatModel
+from load_test import start_stub_llm
+from response_cache import CachedChatModel, ChatResponseCache, _cache_args
+
+REQUEST = httpx.Request("POST", "http://stub/v1/chat/completions")
+MESSAGES = [HumanMessage(content="Сколько заваривать улун?")]
+
+
+class FakeModel:
+    """Модель-заглушка: ждёт delay и отвечает reply либо бросает error"""
+
+    def __init__(self, reply: str = "ответ", delay: float = 0.0, error=None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, input, config=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.reply
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return self.invoke(input, config, **kwargs)
+
+
+def test_losing_attempt_stops_retrying():
+    primary = FakeModel(delay=0.2, error=APIConnectionError(request=REQUEST))
+    fallback = FakeModel(reply="резервный ответ")
+    hedged = HedgedChatModel(primary, fallback=fallback, initial_delay=0.05, max_retries=5, backoff_base=0.05)
+
+    assert hedged.invoke("вопрос") == "резервный ответ"
+    # основной запрос дорабатывает текущий HTTP-вызов, но повторов после проигрыша нет
+    time.sleep(0.5)
+    assert primary.calls == 1
+    assert hedged.stats["retries"] == 0
+    assert hedged.stats["fallback_wins"] == 1
+
+
+@pytest.mark.parametrize("mode", ["invoke", "ainvoke"])
+def test_request_errors_are_not_hedged(mode):
+    error = AuthenticationError("invalid key", response=httpx.Response(401, request=REQUEST), body=None)
+    primary = FakeModel(error=error)
+    fallback = FakeModel(reply="резервный ответ")
+    hedged = HedgedChatModel(primary, fallback=fallback, initial_delay=1.0)
+    with pytest.raises(AuthenticationError):
+        if mode == "invoke":
+            hedged.invoke("вопрос")
+        else:
+            asyncio.run(hedged.ainvoke("вопрос"))
+    assert fallback.calls == 0
+    assert (hedged.stats["hedged"], hedged.stats["failures"]) == (0, 1)
+
+
+def test_stream_won_by_fallback_is_cached_under_fallback_key():
+    async def main():
+        slow = await start_stub_llm(0, 1.0)
+        fast = await start_stub_llm(0, 0.01)
+        cache = ChatResponseCache()
+
+        def make_model(name, stub):
+            return ChatOpenAI(model=name, api_key="test", base_url=f"http://127.0.0.1:{stub.addresses[0][1]}/v1",
+                              cache=cache, max_retries=0)
+
+        primary, fallback = make_model("primary-model", slow), make_model("fallback-model", fast)
+        hedged = HedgedChatModel(primary, fallback=fallback, initial_delay=0.05)
+        try:
+            chunks = [chunk async for chunk in CachedChatModel(primary, runner=hedged).astream(MESSAGES)]
+            return chunks, cache, primary, fallback, hedged
+        finally:
+            await slow.cleanup()
+            await fast.cleanup()
+
+    chunks, cache, primary, fallback, hedged = asyncio.run(main())
+    assert hedged.stats["fallback_wins"] == 1
+    # ответ резервной модели не должен отдаваться как ответ основной
+    assert cache.lookup(*_cache_args(primary, MESSAGES)) is None
+    cached = cache.lookup(*_cache_args(fallback, MESSAGES))
+    assert cached[0].message.content == "".join(chunk.content for chunk in chunks)
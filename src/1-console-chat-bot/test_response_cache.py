@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration
+from langchain_openai import ChatOpenAI
+
+from load_test import start_stub_llm
+from response_cache import CachedChatModel, ChatResponseCache
+
+MESSAGES = [SystemMessage(content="Ты помощник"), HumanMessage(content="Сколько заваривать улун?")]
+
+
+def run_with_model(scenario, **model_kwargs):
+    """ChatOpenAI с ChatResponseCache над заглушкой LLM; scenario(make_model, llm_stats) выполняется внутри"""
+
+    async def main():
+        llm = await start_stub_llm(0, 0.01)
+        cache = ChatResponseCache()
+
+        def make_model(**kwargs) -> ChatOpenAI:
+            return ChatOpenAI(model="stub-model", api_key="test", base_url=f"http://127.0.0.1:{llm.addresses[0][1]}/v1",
+                              cache=cache, **{**model_kwargs, **kwargs})
+
+        try:
+            return await scenario(make_model, llm.app["stats"])
+        finally:
+            await llm.cleanup()
+
+    return asyncio.run(main())
+
+
+async def collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_stream_hits_entry_stored_by_invoke():
+    # _cache_args повторяет приватный путь BaseChatModel; тест сломается, если ключи разойдутся
+    async def scenario(make_model, llm_stats):
+        model = make_model()
+        answer = await model.ainvoke(MESSAGES)
+        chunks = await collect(CachedChatModel(model).astream(MESSAGES))
+        return answer, chunks, llm_stats["calls"], model.cache.stats
+
+    answer, chunks, calls, stats = run_with_model(scenario)
+    assert [chunk.content for chunk in chunks] == [answer.content]
+    assert calls == 1
+    assert stats["exact_hits"] == 1
+
+
+def test_invoke_hits_entry_stored_by_stream():
+    async def scenario(make_model, llm_stats):
+        model = make_model()
+        chunks = await collect(CachedChatModel(model).astream(MESSAGES))
+        answer = await model.ainvoke(MESSAGES)
+        return chunks, answer, llm_stats["calls"]
+
+    chunks, answer, calls = run_with_model(scenario)
+    assert len(chunks) > 1
+    assert answer.content == "".join(chunk.content for chunk in chunks)
+    assert calls == 1
+
+
+def test_call_parameters_are_part_of_the_key():
+    async def scenario(make_model, llm_stats):
+        await make_model().ainvoke(MESSAGES)
+        await collect(CachedChatModel(make_model(temperature=0.9)).astream(MESSAGES))
+        return llm_stats["calls"]
+
+    assert run_with_model(scenario, temperature=0) == 2
+
+
+def answer(text: str) -> list:
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def test_expired_and_least_recently_used_entries_are_dropped():
+    cache = ChatResponseCache(max_size=2, ttl=0.05)
+    cache.update("a", "llm", answer("A"))
+    cache.update("b", "llm", answer("B"))
+    assert cache.lookup("a", "llm")[0].message.content == "A"
+    # "b" давно не читали — его и вытесняет новая запись
+    cache.update("c", "llm", answer("C"))
+    assert cache.lookup("b", "llm") is None
+    assert cache.stats["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.lookup("a", "llm") is None
+    assert cache.stats["expired"] == 1
@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import aiohttp
+import httpx
+import pytest
+from aiohttp import web
+
+from bot import CliBot
+from load_test import start_stub_llm
+from server import ChatServer
+
+
+def run_with_server(scenario, delay: float = 0.05, **server_kwargs):
+    """Заглушка LLM + ChatServer на свободных портах; scenario(url, server, llm_stats) выполняется внутри"""
+
+    async def main():
+        llm = await start_stub_llm(0, delay)
+        llm_port = llm.addresses[0][1]
+        http_client = httpx.AsyncClient()
+        bot = CliBot(
+            model_name="stub-model",
+            base_url=f"http://127.0.0.1:{llm_port}/v1",
+            http_async_client=http_client,
+            hedging=False,
+        )
+        server = ChatServer(bot, **server_kwargs)
+        runner = web.AppRunner(server.make_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/chat"
+        try:
+            return await scenario(url, server, llm.app["stats"])
+        finally:
+            await runner.cleanup()
+            await http_client.aclose()
+            await llm.cleanup()
+
+    return asyncio.run(main())
+
+
+async def post(http: aiohttp.ClientSession, url: str, session_id: str, message: str, stream: bool = False):
+    async with http.post(url, json={"session_id": session_id, "message": message, "stream": stream}) as resp:
+        body = await resp.text()
+        return resp.status, body, resp.headers
+
+
+@pytest.fixture(autouse=True)
+def _api_key(monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+
+
+def test_turns_of_one_session_keep_order_and_history():
+    async def scenario(url, server, llm_stats):
+        async with aiohttp.ClientSession() as http:
+            results = await asyncio.gather(*(post(http, url, "s1", f"вопрос {i}") for i in range(3)))
+        history = server.bot.get_session_history("s1").messages
+        return results, [m.content for m in history if m.type == "human"]
+
+    results, questions = run_with_server(scenario)
+    assert [status for status, _, _ in results] == [200, 200, 200]
+    assert questions == ["вопрос 0", "вопрос 1", "вопрос 2"]
+    # заглушка отвечает номером сообщения в запросе: история растёт на два сообщения за ход
+    assert [json.loads(body)["reply"] for _, body, _ in results] == [
+        "Ответ на сообщение №2", "Ответ на сообщение №4", "Ответ на сообщение №6",
+    ]
+
+
+def test_llm_calls_are_capped_by_max_in_flight():
+    async def scenario(url, server, llm_stats):
+        async with aiohttp.ClientSession() as http:
+            results = await asyncio.gather(*(post(http, url, f"s{i}", "привет", stream=i % 2 == 0)
+                                             for i in range(12)))
+        return results, llm_stats["max_in_flight"], server.stats
+
+    results, max_in_flight, stats = run_with_server(scenario, max_in_flight=3)
+    assert all(status == 200 for status, _, _ in results)
+    assert max_in_flight == 3
+    assert (stats["served"], stats["queued"], stats["in_flight"]) == (12, 0, 0)
+
+
+def test_backpressure_counts_requests_waiting_on_a_session():
+    async def scenario(url, server, llm_stats):
+        async with aiohttp.ClientSession() as http:
+            # все запросы одной сессии: один идёт в LLM, остальные ждут блокировку сессии
+            tasks = [asyncio.create_task(post(http, url, "s1", f"вопрос {i}")) for i in range(6)]
+            await asyncio.sleep(0.05)
+            queued_while_busy = server.stats["queued"]
+            results = await asyncio.gather(*tasks)
+        return results, queued_while_busy, server.stats
+
+    results, queued_while_busy, stats = run_with_server(scenario, delay=0.3, max_in_flight=4, max_queue=2)
+    statuses = sorted(status for status, _, _ in results)
+    assert statuses == [200, 200, 200, 503, 503, 503]
+    assert queued_while_busy == 2
+    assert all(headers.get("Retry-After") == "1" for status, _, headers in results if status == 503)
+    assert (stats["rejected"], stats["queued"]) == (3, 0)
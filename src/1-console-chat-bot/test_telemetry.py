@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pandas as pd
+from click.testing import CliRunner
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration
+from langchain_openai import ChatOpenAI
+
+from load_test import start_stub_llm
+from response_cache import CachedChatModel, ChatResponseCache, _cache_args
+from telemetry import TelemetryHandler, cli, load_telemetry, telemetry_report
+
+QUESTION = [HumanMessage(content="Сколько заваривать улун?")]
+
+
+def test_cache_hits_are_logged_without_billed_tokens(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    telemetry = TelemetryHandler(str(path))
+
+    async def main():
+        llm = await start_stub_llm(0, 0.01)
+        model = ChatOpenAI(model="stub-model", api_key="test", base_url=f"http://127.0.0.1:{llm.addresses[0][1]}/v1",
+                           cache=ChatResponseCache(), callbacks=[telemetry])
+        # в кэше ответ исходного вызова вместе с его usage_metadata
+        cached = AIMessage(content="3 минуты",
+                           usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+        model.cache.update(*_cache_args(model, QUESTION), [ChatGeneration(message=cached)])
+        config = {"metadata": {"session_id": "s1"}}
+        try:
+            await model.ainvoke(QUESTION, config)
+            _ = [chunk async for chunk in CachedChatModel(model).astream(QUESTION, config)]
+            await model.ainvoke([HumanMessage(content="А пуэр?")], config)
+            return llm.app["stats"]["calls"]
+        finally:
+            await llm.cleanup()
+
+    calls = asyncio.run(main())
+    telemetry.close()
+    records = load_telemetry(str(path)).to_dict("records")
+    assert calls == 1
+    assert [(r["cached"], r["prompt_tokens"], r["completion_tokens"]) for r in records] == [
+        (True, 0, 0), (True, 0, 0), (False, 0, 0),
+    ]
+    assert {(r["session_id"], r["model"]) for r in records} == {("s1", "stub-model")}
+
+
+def test_report_counts_cache_hits_apart_from_model_latency():
+    records = [
+        {"session_id": "s1", "model": "m", "ttft": None, "latency": 1.0, "prompt_tokens": 100,
+         "completion_tokens": 10, "cached": False, "error": None, "cancelled": False},
+        {"session_id": "s1", "model": "m", "ttft": None, "latency": 0.001, "prompt_tokens": 0,
+         "completion_tokens": 0, "cached": True, "error": None, "cancelled": False},
+    ]
+    row = telemetry_report(pd.DataFrame(records)).loc["m"]
+    assert (row["calls"], row["cache_hits"], row["prompt_tokens"]) == (2, 1, 100)
+    assert row["latency_p50"] == 1.0
+
+
+def test_report_without_records_does_not_crash(tmp_path):
+    runner = CliRunner()
+    missing = runner.invoke(cli, ["report", str(tmp_path / "missing.jsonl")])
+    (tmp_path / "empty.jsonl").write_text("", encoding="utf-8")
+    empty = runner.invoke(cli, ["report", str(tmp_path / "empty.jsonl")])
+    assert (missing.exit_code, empty.exit_code) == (0, 0)
+    assert "Записей нет" in missing.output and "Записей нет" in empty.output
+
+
+def test_report_skips_torn_last_line(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    record = {"session_id": "s1", "model": "m", "ttft": 0.1, "latency": 0.5, "prompt_tokens": 10,
+              "completion_tokens": 5, "cached": False, "error": None, "cancelled": False}
+    path.write_text(json.dumps(record) + '\n{"session_id": "s2", "mod', encoding="utf-8")
+    result = CliRunner().invoke(cli, ["report", str(path)])
+    assert result.exit_code == 0
+    assert "1 вызовов LLM, 1 сессий" in result.output
@@ -2,10 +2,10 @@ import os
 from dotenv import load_dotenv
 
 from langchain_core.prompts import PromptTemplate, FewShotPromptTemplate
-from langchain_core.example_selectors import SemanticSimilarityExampleSelector
-from langchain_community.vectorstores import Chroma
 from langchain_openai import ChatOpenAI
 
+from example_store import PersistentExampleSelector, load_examples
+
 load_dotenv()
 MODEL = os.getenv("OPENAI_API_MODEL", "gpt-5")
 llm = ChatOpenAI(model=MODEL, temperature=0)
@@ -19,21 +19,17 @@ embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
 # embeddings = OpenAIEmbeddings()
 
 example_prompt = PromptTemplate.from_template("Вопрос: {question}\nОтвет: {answer}")
-examples = [
-    {"question": "Что делать, если опоздал на работу?",
-     "answer": "Притворись, что это спецплан компании по тестированию терпения коллег."},
-    {"question": "Как победить лень?",
-     "answer": "Скажи лени, что завтра — её выходной, и действуй, пока она отдыхает."},
-    {"question": "Что делать, если забыл день рождения друга?",
-     "answer": "Сделай вид, что это сюрприз для него, и улыбайся, когда он удивлённо морщит лоб."}
-]
+# Примеры лежат в prompts.yaml; их эмбеддинги кэшируются на диске по хэшу текста
+examples = load_examples("prompts.yaml")
 
 # Создание ExampleSelector (динамический выбор k ближайших примеров)
-example_selector = SemanticSimilarityExampleSelector.from_examples(
+# При повторном запуске пересчитываются только новые или изменённые примеры
+example_selector = PersistentExampleSelector(
     examples=examples,
     embeddings=embeddings,
-    vectorstore_cls=Chroma,
-    k=2  # выбираем 2 ближайших примера
+    cache_path=".cache/few_shot_embeddings.npz",
+    k=2,  # выбираем 2 ближайших примера
+    # use_mmr=True,  # ближайшие, но непохожие друг на друга примеры
 )
 
 # Few-shot шаблон с динамическим ExampleSelector
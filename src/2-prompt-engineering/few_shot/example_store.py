@@ -0,0 +1,194 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import yaml
+from langchain_core.embeddings import Embeddings
+from langchain_core.example_selectors import BaseExampleSelector
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+
+def load_examples(path: str = "prompts.yaml", key: str = "examples") -> List[Dict[str, str]]:
+    """Примеры для few-shot из YAML: prompts -> <key> -> список словарей"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    return data["prompts"][key]
+
+
+def example_to_text(example: Dict[str, str], input_keys: Optional[List[str]] = None) -> str:
+    """Текст для эмбеддинга — как у SemanticSimilarityExampleSelector: значения, отсортированные по ключу"""
+    if input_keys:
+        example = {key: example[key] for key in input_keys}
+    return " ".join(example[key] for key in sorted(example))
+
+
+def embeddings_namespace(embeddings: Embeddings) -> str:
+    """Имя модели эмбеддингов для кэша: model_name (HuggingFace), model (OpenAI), иначе имя класса"""
+    name = next((value for value in (getattr(embeddings, "model_name", None), getattr(embeddings, "model", None))
+                 if isinstance(value, str) and value), None)
+    namespace = f"{type(embeddings).__name__}:{name}" if name else type(embeddings).__name__
+    # у OpenAI размерность задаётся отдельно от имени модели
+    dimensions = getattr(embeddings, "dimensions", None)
+    return f"{namespace}:{dimensions}" if dimensions else namespace
+
+
+# Эмбеддинги на диске по хэшу текста: при старте считаются только новые или изменённые примеры
+class EmbeddingCache:
+    def __init__(self, path: str, model_name: str = ""):
+        """
+        Args:
+            path: Файл .npz с хэшами и векторами
+            model_name: Пространство имён модели эмбеддингов; файл другой модели не читается, а пересобирается
+        """
+        self.path = Path(path)
+        self.model_name = model_name
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.dim: Optional[int] = None
+        self.dirty = False
+        if self.path.exists():
+            data = np.load(self.path)
+            # файл без пометок (старый формат) или от другой модели — пересобираем с нуля
+            stored_model = str(data["model_name"]) if "model_name" in data.files else None
+            if stored_model == model_name:
+                self.vectors = dict(zip(data["hashes"].tolist(), data["vectors"]))
+                self.dim = int(data["dim"]) if self.vectors else None
+            else:
+                self.dirty = True
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def reset(self):
+        """Забыть все векторы (например, при смене размерности); файл перепишется при save()"""
+        self.vectors = {}
+        self.dim = None
+        self.dirty = True
+
+    def _embed(self, items: Dict[str, str], embeddings: Embeddings):
+        if not items:
+            return
+        new_vectors = embeddings.embed_documents(list(items.values()))
+        for key, vector in zip(items, new_vectors):
+            self.vectors[key] = np.asarray(vector, dtype=np.float32)
+        self.dirty = True
+
+    def get_or_embed(self, texts: List[str], embeddings: Embeddings) -> np.ndarray:
+        """Матрица векторов для texts; в модель уходят только тексты, которых нет в кэше"""
+        keys = [self.key(text) for text in texts]
+        missing = {key: text for key, text in zip(keys, texts) if key not in self.vectors}
+        if missing:
+            self._embed(missing, embeddings)
+            dim = len(self.vectors[next(iter(missing))])
+            if self.dim is not None and dim != self.dim:
+                # модель под тем же именем отдаёт векторы другой размерности: старые непригодны
+                fresh = {key: self.vectors[key] for key in missing}
+                self.reset()
+                self.vectors = fresh
+                self._embed({key: text for key, text in zip(keys, texts) if key not in self.vectors}, embeddings)
+            self.dim = dim
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([self.vectors[key] for key in keys])
+
+    def save(self, keep: Optional[List[str]] = None):
+        """Атомарно записать кэш; keep — хэши, которые оставить (остальные выкидываются)"""
+        hashes = list(self.vectors) if keep is None else [h for h in keep if h in self.vectors]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            hashes=np.array(hashes),
+            vectors=np.stack([self.vectors[h] for h in hashes]) if hashes else np.zeros((0, 0), dtype=np.float32),
+            model_name=np.array(self.model_name),
+            dim=np.array(self.dim if self.dim is not None else 0),
+        )
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+# Селектор примеров поверх матрицы в памяти: k ближайших или MMR, индекс переживает перезапуск
+class PersistentExampleSelector(BaseExampleSelector):
+    def __init__(
+            self,
+            examples: List[Dict[str, str]],
+            embeddings: Embeddings,
+            cache_path: str = ".cache/few_shot_embeddings.npz",
+            k: int = 4,
+            input_keys: Optional[List[str]] = None,
+            use_mmr: bool = False,
+            fetch_k: int = 20,
+            lambda_mult: float = 0.5,
+    ):
+        """
+        Args:
+            examples: Примеры (словари с одинаковыми ключами)
+            embeddings: Модель эмбеддингов
+            cache_path: Файл кэша эмбеддингов
+            k: Сколько примеров выбирать
+            input_keys: По каким ключам примера строить текст для эмбеддинга (None — по всем)
+            use_mmr: Выбирать по MMR (близость + разнообразие) вместо k ближайших
+            fetch_k: Сколько ближайших кандидатов рассматривает MMR
+            lambda_mult: Баланс MMR: 1 — только близость, 0 — только разнообразие
+        """
+        self.embeddings = embeddings
+        self.k = k
+        self.input_keys = input_keys
+        self.use_mmr = use_mmr
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+        self.cache = EmbeddingCache(cache_path, model_name=embeddings_namespace(embeddings))
+        self.examples = list(examples)
+        texts = self._texts()
+        self._matrix = self._normalize(self.cache.get_or_embed(texts, embeddings))
+        if self.cache.dirty:
+            # в файле остаются только актуальные примеры: удалённые из YAML не копятся
+            self.cache.save(keep=[self.cache.key(text) for text in texts])
+
+    def _texts(self) -> List[str]:
+        return [example_to_text(example, self.input_keys) for example in self.examples]
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        if matrix.size == 0:
+            return matrix
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def add_example(self, example: Dict[str, str]) -> None:
+        text = example_to_text(example, self.input_keys)
+        vector = self._normalize(self.cache.get_or_embed([text], self.embeddings))
+        self.examples.append(example)
+        if self._matrix.size and vector.shape[1] != self._matrix.shape[1]:
+            # кэш пересобран под новую размерность — матрицу тоже пересчитываем целиком
+            self._matrix = self._normalize(self.cache.get_or_embed(self._texts(), self.embeddings))
+        else:
+            self._matrix = vector if self._matrix.size == 0 else np.vstack([self._matrix, vector])
+        if self.cache.dirty:
+            self.cache.save()
+
+    def select_examples(self, input_variables: Dict[str, str]) -> List[dict]:
+        if not self.examples:
+            return []
+        query = np.asarray(
+            self.embeddings.embed_query(example_to_text(input_variables, self.input_keys)), dtype=np.float32
+        )
+        query = query / (np.linalg.norm(query) or 1.0)
+        if query.shape[0] != self._matrix.shape[1]:
+            # все примеры были в кэше, но модель теперь отдаёт другую размерность — пересчитываем их
+            self.cache.reset()
+            self._matrix = self._normalize(self.cache.get_or_embed(self._texts(), self.embeddings))
+            self.cache.save()
+        scores = self._matrix @ query
+        k = min(self.k, len(self.examples))
+        if not self.use_mmr:
+            top = np.argpartition(-scores, k - 1)[:k]
+            indices = top[np.argsort(-scores[top])]
+        else:
+            fetch_k = min(max(self.fetch_k, k), len(self.examples))
+            candidates = np.argpartition(-scores, fetch_k - 1)[:fetch_k]
+            candidates = candidates[np.argsort(-scores[candidates])]
+            chosen = maximal_marginal_relevance(query, self._matrix[candidates], lambda_mult=self.lambda_mult, k=k)
+            indices = candidates[chosen]
+        return [self.examples[i] for i in indices]
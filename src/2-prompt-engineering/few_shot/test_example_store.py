@@ -0,0 +1,88 @@
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from example_store import PersistentExampleSelector, embeddings_namespace
+
+EXAMPLES = [{"input": word, "output": word.upper()} for word in ("чай", "кофе", "улун", "пуэр", "матча")]
+
+
+class FakeOpenAIEmbeddings(Embeddings):
+    """Как OpenAIEmbeddings: имя модели в .model; вектор — счётчики букв по размерности dim"""
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = 8):
+        self.model = model
+        self.dim = dim
+        self.embedded: List[str] = []
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim)
+        for char in text:
+            vector[ord(char) % self.dim] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+class FakeHuggingFaceEmbeddings(FakeOpenAIEmbeddings):
+    def __init__(self, model_name: str):
+        super().__init__()
+        del self.model
+        self.model_name = model_name
+
+
+def test_namespace_uses_model_name_then_model_then_class():
+    assert embeddings_namespace(FakeHuggingFaceEmbeddings("bge-m3")) == "FakeHuggingFaceEmbeddings:bge-m3"
+    assert embeddings_namespace(FakeOpenAIEmbeddings("text-embedding-3-large")) == \
+        "FakeOpenAIEmbeddings:text-embedding-3-large"
+    assert embeddings_namespace(FakeOpenAIEmbeddings("")) == "FakeOpenAIEmbeddings"
+
+
+def test_restart_reuses_cached_vectors(tmp_path):
+    path = str(tmp_path / "cache.npz")
+    PersistentExampleSelector(EXAMPLES, FakeOpenAIEmbeddings(), cache_path=path, k=2)
+
+    embeddings = FakeOpenAIEmbeddings()
+    selector = PersistentExampleSelector(EXAMPLES, embeddings, cache_path=path, k=2)
+    assert embeddings.embedded == []
+    assert selector.select_examples({"input": "улун"})[0]["input"] == "улун"
+
+
+def test_model_switch_rebuilds_cache(tmp_path):
+    path = str(tmp_path / "cache.npz")
+    PersistentExampleSelector(EXAMPLES, FakeOpenAIEmbeddings("text-embedding-3-small", dim=8), cache_path=path)
+
+    embeddings = FakeOpenAIEmbeddings("text-embedding-3-large", dim=12)
+    selector = PersistentExampleSelector(EXAMPLES, embeddings, cache_path=path, k=1)
+    assert len(embeddings.embedded) == len(EXAMPLES)
+    assert selector.select_examples({"input": "пуэр"}) == [{"input": "пуэр", "output": "ПУЭР"}]
+
+    data = np.load(path)
+    assert (str(data["model_name"]), int(data["dim"])) == ("FakeOpenAIEmbeddings:text-embedding-3-large", 12)
+    assert data["vectors"].shape == (len(EXAMPLES), 12)
+
+
+def test_same_name_with_new_dimension_is_rebuilt(tmp_path):
+    path = str(tmp_path / "cache.npz")
+    PersistentExampleSelector(EXAMPLES, FakeOpenAIEmbeddings(dim=8), cache_path=path)
+
+    # все примеры в кэше, поэтому новая размерность видна только по вектору запроса
+    embeddings = FakeOpenAIEmbeddings(dim=6)
+    selector = PersistentExampleSelector(EXAMPLES, embeddings, cache_path=path, k=1)
+    assert selector.select_examples({"input": "матча"})[0]["input"] == "матча"
+    assert len(embeddings.embedded) == len(EXAMPLES)
+    assert int(np.load(path)["dim"]) == 6
+
+    # новый пример с другой размерностью пересобирает кэш, а не склеивает векторы разной длины
+    wider = FakeOpenAIEmbeddings(dim=10)
+    selector = PersistentExampleSelector(EXAMPLES, wider, cache_path=path, k=1)
+    selector.add_example({"input": "ройбуш", "output": "РОЙБУШ"})
+    assert len(wider.embedded) == len(EXAMPLES) + 1
+    assert selector.select_examples({"input": "чай"})[0]["input"] == "чай"
+    assert np.load(path)["vectors"].shape == (len(EXAMPLES) + 1, 10)
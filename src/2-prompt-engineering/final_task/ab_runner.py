@@ -0,0 +1,111 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import click
+import pandas as pd
+import yaml
+from langchain_core.prompts import BasePromptTemplate
+
+
+async def run_variants(
+        llm,
+        variants: Dict[str, BasePromptTemplate],
+        inputs: List[dict],
+        max_concurrency: int = 8,
+) -> pd.DataFrame:
+    """
+    Параллельный прогон всех пар (вариант, вход)
+
+    Args:
+        llm: Чат-модель для всех вариантов
+        variants: Имя варианта -> шаблон промпта (собирается один раз вызывающим кодом)
+        inputs: Переменные шаблона для каждого входа
+        max_concurrency: Сколько запросов к LLM выполняется одновременно
+
+    Returns:
+        Строка на пару: variant, input_id, answer, latency, токены, error
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(name: str, template: BasePromptTemplate, input_id: int, variables: dict) -> dict:
+        row = {"variant": name, "input_id": input_id, **variables}
+        prompt = template.format(**variables)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await llm.ainvoke(prompt)
+            except Exception as e:
+                return {**row, "latency": time.perf_counter() - start, "error": type(e).__name__}
+            latency = time.perf_counter() - start
+        usage = getattr(response, "usage_metadata", None) or {}
+        return {
+            **row,
+            "answer": response.content,
+            "latency": latency,
+            "prompt_tokens": usage.get("input_tokens"),
+            "completion_tokens": usage.get("output_tokens"),
+            "error": None,
+        }
+
+    rows = await asyncio.gather(*(
+        run_one(name, template, input_id, variables)
+        for name, template in variants.items()
+        for input_id, variables in enumerate(inputs)
+    ))
+    columns = ["variant", "input_id", *inputs[0].keys(), "answer", "latency", "prompt_tokens",
+               "completion_tokens", "error"] if inputs else []
+    return pd.DataFrame(rows, columns=columns)
+
+
+def compare_variants(results: pd.DataFrame) -> pd.DataFrame:
+    """Сравнительная таблица: перцентили задержки и расход токенов по вариантам"""
+    ok = results[results["error"].isna()]
+    by_variant = ok.groupby("variant")
+    table = pd.DataFrame({
+        "runs": results.groupby("variant").size(),
+        "errors": results.groupby("variant")["error"].count(),
+        "latency_p50": by_variant["latency"].quantile(0.5),
+        "latency_p95": by_variant["latency"].quantile(0.95),
+        "prompt_tokens_avg": by_variant["prompt_tokens"].mean(),
+        "completion_tokens_avg": by_variant["completion_tokens"].mean(),
+        "total_tokens": by_variant["prompt_tokens"].sum() + by_variant["completion_tokens"].sum(),
+        "answer_chars_avg": by_variant["answer"].apply(lambda answers: answers.str.len().mean()),
+    })
+    return table
+
+
+@click.command()
+@click.option("--prompts", "prompts_path", default="prompts.yaml", show_default=True,
+              help="YAML с prompts.ab_inputs")
+@click.option("--max-concurrency", default=8, show_default=True, help="Сколько запросов к LLM одновременно")
+@click.option("--output-dir", default="ab_results", show_default=True,
+              help="Куда записать results.csv и comparison.csv")
+def main(prompts_path, max_concurrency, output_dir):
+    """Сравнение вариантов промпта из few_shot.py на всех входах за один параллельный прогон"""
+    # импорт здесь: few_shot.py при загрузке создаёт модель и читает prompts.yaml
+    from few_shot import PROMPT_VARIANTS, llm
+
+    with open(prompts_path, "r", encoding="utf-8") as f:
+        inputs = [{"input": text} for text in yaml.safe_load(f)["prompts"]["ab_inputs"]]
+
+    print(f"🚀 {len(PROMPT_VARIANTS)} варианта × {len(inputs)} входов, до {max_concurrency} запросов параллельно")
+    start = time.perf_counter()
+    results = asyncio.run(run_variants(llm, PROMPT_VARIANTS, inputs, max_concurrency=max_concurrency))
+    print(f"⏱ Готово за {time.perf_counter() - start:.1f}s")
+
+    table = compare_variants(results)
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    results.to_csv(output / "results.csv", index=False)
+    table.to_csv(output / "comparison.csv")
+
+    print("\n📊 Сравнение вариантов:")
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.2f}".format):
+        print(table)
+    print(f"\n💾 Ответы: {output / 'results.csv'}, таблица: {output / 'comparison.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,30 +21,39 @@ llm = ChatOpenAI(
     temperature=0
 )
 
+# Шаблоны собираются один раз при импорте, а не на каждый запрос
+EXAMPLE_PROMPT = PromptTemplate.from_template(
+    "Как имплементировать: {input} \n Ответ: {output}"
+)
+
+FEW_SHOT_PROMPT = FewShotPromptTemplate(
+    examples=examples,
+    example_prompt=EXAMPLE_PROMPT,
+    prefix="Кратко объясни как реализовать функцию в Python",
+    suffix="Как имплементировать: {input} \n Ответ:",
+    input_variables=["input"]
+)
+
+SIMPLE_PROMPT = PromptTemplate.from_template(
+    "Кратко объясни как реализовать функцию в Python {input}"
+)
+
+# Варианты промпта для сравнения (см. ab_runner.py)
+PROMPT_VARIANTS = {
+    "few_shot": FEW_SHOT_PROMPT,
+    "simple": SIMPLE_PROMPT,
+}
+
+
 def answer_with_examples(input_text: str):
-    example_prompt = PromptTemplate.from_template(
-        "Как имплементировать: {input} \n Ответ: {output}"
-    )    
-
-    prompt_with_examples = FewShotPromptTemplate(
-        examples=examples,
-        example_prompt=example_prompt,
-        prefix="Кратко объясни как реализовать функцию в Python",
-        suffix="Как имплементировать: {input} \n Ответ:",
-        input_variables=["input"]
-    )
-
-    formatted_prompt = prompt_with_examples.format(input=input_text)
+    formatted_prompt = FEW_SHOT_PROMPT.format(input=input_text)
     # print(formatted_prompt)    
     response = llm.invoke(formatted_prompt)
 
     return response.content
 
 def answer_with_simple_prompt(input_text: str):
-    prompt = PromptTemplate.from_template(
-        "Кратко объясни как реализовать функцию в Python {input}"
-    )
-    formatted_prompt = prompt.format(input=input_text)
+    formatted_prompt = SIMPLE_PROMPT.format(input=input_text)
     response = llm.invoke(formatted_prompt)
     return response.content
 
@@ -61,19 +70,22 @@ def __main__():
         if not input_text:
             continue
 
+        # оба варианта уходят в модель параллельно
+        answer, answer_unstable = llm.batch([
+            FEW_SHOT_PROMPT.format(input=input_text),
+            SIMPLE_PROMPT.format(input=input_text),
+        ])
+
         print("\n")
         print(delimeter)
         print("Ответ с примерами:\n")
-        answer = answer_with_examples(input_text)
-        print(answer)
+        print(answer.content)
         print(delimeter)
         print("\n")
 
-        answer_unstable = answer_with_simple_prompt("генерация простых чисел до N")
         print(delimeter)
         print("Ответ без примеров:\n")
-        answer_unstable = answer_with_simple_prompt(input_text)
-        print(answer_unstable)
+        print(answer_unstable.content)
         print(delimeter)
 
         
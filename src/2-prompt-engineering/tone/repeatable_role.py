@@ -1,11 +1,12 @@
 import os
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, HumanMessagePromptTemplate, SystemMessagePromptTemplate
 from langchain_core.messages import SystemMessage
 
+from token_history import TokenBudgetChatMessageHistory
+
 load_dotenv()
 
 model_name = "x-ai/grok-code-fast-1"
@@ -32,7 +33,8 @@ chain = prompt_template | llm
 store = {}
 def get_session_history(session_id: str):
     if session_id not in store:
-        store[session_id] = InMemoryChatMessageHistory()
+        # системный промпт приходит из шаблона, история лишь держит диалог в пределах бюджета
+        store[session_id] = TokenBudgetChatMessageHistory(max_tokens=4000)
     return store[session_id]
 
 chain_with_history = RunnableWithMessageHistory(
@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import tiktoken
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage
+
+
+def message_text(message: BaseMessage) -> str:
+    """Текст сообщения; у мультимодальных сообщений — только текстовые части"""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in message.content
+    )
+
+
+# История с бюджетом токенов: каждое сообщение кодируется один раз при добавлении
+class TokenBudgetChatMessageHistory(BaseChatMessageHistory):
+    def __init__(self, max_tokens: int = 4000, system_prompt: Optional[str] = None, encoding: str = "cl100k_base"):
+        """
+        Args:
+            max_tokens: Сколько токенов (вместе с системным промптом) может занимать история
+            system_prompt: Системный промпт, который всегда идёт первым и не усекается
+            encoding: Кодировка tiktoken для подсчёта токенов
+        """
+        self.max_tokens = max_tokens
+        self.encoder = tiktoken.get_encoding(encoding)
+        self.system_prompt = system_prompt
+        self.system_tokens = self.count_tokens(system_prompt) if system_prompt else 0
+        # окно диалога: (сообщение, его токены); старые сообщения уходят слева
+        self._window: Deque[Tuple[BaseMessage, int]] = deque()
+        self._window_tokens = 0
+        self.trimmed = 0  # сколько сообщений уже вытеснено из окна
+
+    def count_tokens(self, text: str) -> int:
+        # encode_ordinary: пользовательский текст со спецтокенами вроде <|endoftext|> не роняет подсчёт
+        return len(self.encoder.encode_ordinary(text))
+
+    @property
+    def token_count(self) -> int:
+        return self.system_tokens + self._window_tokens
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Системный промпт + сообщения, которые помещаются в бюджет"""
+        history = [message for message, _ in self._window]
+        if self.system_prompt:
+            return [SystemMessage(content=self.system_prompt)] + history
+        return history
+
+    def add_message(self, message: BaseMessage):
+        tokens = self.count_tokens(message_text(message))
+        self._window.append((message, tokens))
+        self._window_tokens += tokens
+        self._trim()
+
+    def _trim(self):
+        """Вытесняем самые старые сообщения, пока не уложимся в бюджет: O(число вытесненных)"""
+        while self._window and self.token_count > self.max_tokens:
+            _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            self.trimmed += 1
+
+    def clear(self):
+        self._window.clear()
+        self._window_tokens = 0
+        self.trimmed = 0
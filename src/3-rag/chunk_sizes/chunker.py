@@ -2,15 +2,21 @@
 import os
 import click
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 
 from utils import (
-    make_splitter, 
     load_data_from_url,
     clean_wikipedia_text,
 )
+from index_cache import build_indices, DEFAULT_CACHE_DIR
+from cost_report import measure_costs, print_cost_table
+from grid_search import (
+    make_candidates,
+    successive_halving,
+    write_leaderboard,
+    print_leaderboard,
+)
 from llm_assessor import LLMAssessor
 from evaluators import ScoreBasedEvaluator, LLMBasedEvaluator
 
@@ -22,6 +28,9 @@ CONFIGS = [
     {"name": "hybrid_balanced", "chunk_size": 500, "chunk_overlap": 50, "note": "Компромисс для гибридного поиска"},
 ]
 
+EMBED_MODEL_NAME = "cointegrated/rubert-tiny2"
+LLM_CACHE_DIR = ".cache/llm_assessments"
+
 SRC_URL = "https://ru.wikipedia.org/wiki/%D0%98%D0%BD%D0%B4%D0%BE%D0%BD%D0%B5%D0%B7%D0%B8%D1%8F"
 QUESTIONS = [
     "столица Индонезии",
@@ -59,6 +68,10 @@ def run_tests(
         api_key,
         max_len_of_sample=500,
         evaluation_mode="score-based",
+        cache_dir=DEFAULT_CACHE_DIR,
+        llm_concurrency=8,
+        llm_cache_dir=LLM_CACHE_DIR,
+        llm_batch_tokens=0,
 ):
     """
     Run tests with different evaluation modes
@@ -71,6 +84,10 @@ def run_tests(
         max_len_of_sample: Max length for sample output
         evaluation_mode: "score-based" or "llm-based"
         llm_model: Model name for LLM assessment (optional)
+        cache_dir: Directory for persisted FAISS indices (None disables caching)
+        llm_concurrency: Max concurrent LLM requests in llm-based mode
+        llm_cache_dir: Directory for cached LLM assessments (None disables caching)
+        llm_batch_tokens: Token budget for packing several questions per LLM request (0 disables)
     """
     # Validate evaluation mode
     if evaluation_mode not in ["score-based", "llm-based"]:
@@ -78,29 +95,18 @@ def run_tests(
     
     # Initialize evaluator based on mode
     if evaluation_mode == "llm-based":
-        assessor = LLMAssessor(model_name=llm_model, api_key=api_key)
-        evaluator = LLMBasedEvaluator(assessor)
+        assessor = LLMAssessor(model_name=llm_model, api_key=api_key, cache_dir=llm_cache_dir)
+        evaluator = LLMBasedEvaluator(
+            assessor, max_concurrency=llm_concurrency, batch_tokens=llm_batch_tokens
+        )
         print(f"✅ LLM evaluator initialized")
     else:
         evaluator = ScoreBasedEvaluator()
         print(f"✅ Score-based evaluator initialized")
     
-    # Создаем базы данных для каждой конфигурации
-    dbs = []
-    for cfg in configs:
-        splitter = make_splitter(cfg)
-        chunks = []
-        for doc in docs:
-            for chunk_text in splitter.split_text(doc.page_content):
-                md = (doc.metadata or {}).copy() if hasattr(doc, "metadata") else {}
-                chunks.append(Document(page_content=chunk_text, metadata=md))
-
-        print(f"📊 Создание БД для конфигурации: {cfg['name']} "
-              f"(chunk_size={cfg['chunk_size']}, overlap={cfg['chunk_overlap']}), "
-              f"всего чанков={len(chunks)}")
-
-        db = FAISS.from_documents(chunks, embedding_model)
-        dbs.append(db)
+    # Создаем базы данных для каждой конфигурации (эмбеддинги считаются один раз на уникальный чанк)
+    build_stats = {}
+    dbs = build_indices(embedding_model, configs, docs, cache_dir=cache_dir, build_stats=build_stats)
 
     print("\n" + "="*80)
     print("🚀 НАЧАЛО ТЕСТИРОВАНИЯ ВОПРОСОВ")
@@ -109,14 +115,29 @@ def run_tests(
     # Инициализация статистики побед для каждой конфигурации
     win_stats = {cfg['name']: 0 for cfg in configs}
 
-    for q in questions:
+    # Все вопросы оцениваются одним батчем: один эмбеддинг-вызов и один поиск на конфиг,
+    # в LLM-режиме запросы к модели идут параллельно и кэшируются на диске
+    k = configs[0].get("k", 2)
+    if hasattr(evaluator, "evaluate_batch"):
+        batch_results = evaluator.evaluate_batch(dbs, configs, questions, k=k)
+    else:
+        batch_results = None
+
+    for q_idx, q in enumerate(questions):
         print(f"🔍 Вопрос: {q}")
         print(f"📊 Evaluation Mode: {evaluation_mode}")
         print("-" * 40)
 
         # Use evaluator to get results
-        k = configs[0].get("k", 2)
-        sorted_results = evaluator.evaluate(dbs, configs, q, k=k)
+        if batch_results is not None:
+            sorted_results = batch_results[q_idx]
+        else:
+            sorted_results = evaluator.evaluate(dbs, configs, q, k=k)
+
+        if not sorted_results:
+            print("⚠️ Оценка не получена, вопрос не учитывается в статистике побед")
+            print("\n" + "-"*60 + "\n")
+            continue
         
         # Update winner tracking and output
         best = sorted_results[0]
@@ -171,6 +192,10 @@ def run_tests(
     print(f"🎉 ПОБЕДИТЕЛЬ: {winner[0]} с {winner[1]} победами из {total_questions} вопросов!")
     print("="*80 + "\n")
 
+    # Стоимость: размер индекса и задержка поиска рядом со статистикой побед
+    costs = measure_costs(dbs, configs, questions, k=k, build_stats=build_stats)
+    print_cost_table(win_stats, costs, total_questions)
+
 @click.command()
 @click.option(
     '--eval-mode',
@@ -178,7 +203,41 @@ def run_tests(
     default='score-based',
     help='Evaluation mode for chunk quality'
 )
-def main(eval_mode):
+@click.option(
+    '--cache-dir',
+    default=DEFAULT_CACHE_DIR,
+    show_default=True,
+    help='Directory for persisted FAISS indices'
+)
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='Rebuild all indices and do not persist them'
+)
+@click.option(
+    '--llm-concurrency',
+    default=8,
+    show_default=True,
+    help='Max concurrent LLM requests in llm-based mode'
+)
+@click.option(
+    '--llm-batch-tokens',
+    default=0,
+    show_default=True,
+    help='Pack several questions into one LLM request under this token budget (0 = one request per question)'
+)
+@click.option(
+    '--search',
+    is_flag=True,
+    help='Search over parameter ranges with successive halving instead of fixed CONFIGS'
+)
+@click.option('--chunk-sizes', default="200,300,500,800,1200", show_default=True, help='Comma-separated chunk sizes')
+@click.option('--overlaps', default="0,50,100,200", show_default=True, help='Comma-separated chunk overlaps')
+@click.option('--k', 'search_k', default=2, show_default=True, help='Chunks retrieved per question during the search')
+@click.option('--eta', default=3, show_default=True, help='Keep best 1/eta candidates on each rung')
+@click.option('--workers', default=4, show_default=True, help='Number of worker processes')
+@click.option('--leaderboard', default="leaderboard.csv", show_default=True, help='Where to write the ranked leaderboard')
+def main(eval_mode, cache_dir, no_cache, llm_concurrency, llm_batch_tokens, search, chunk_sizes, overlaps, search_k, eta, workers, leaderboard):
     """Evaluate RAG chunking strategies"""
     # Load environment
     load_dotenv()
@@ -193,8 +252,29 @@ def main(eval_mode):
         for doc in docs
     ]
     
+    if search:
+        candidates = make_candidates(
+            [int(x) for x in chunk_sizes.split(",")],
+            [int(x) for x in overlaps.split(",")],
+        )
+        print(f"Поиск параметров: {len(candidates)} кандидатов, {workers} процессов, eta={eta}")
+        results = successive_halving(
+            candidates,
+            QUESTIONS,
+            EMBED_MODEL_NAME,
+            docs_cleaned,
+            k=search_k,
+            eta=eta,
+            workers=workers,
+            cache_dir=None if no_cache else cache_dir,
+        )
+        print_leaderboard(results)
+        write_leaderboard(results, leaderboard)
+        print(f"Таблица лидеров сохранена: {leaderboard}")
+        return
+
     print("Загрузка модели...")
-    embedding_model = HuggingFaceEmbeddings(model_name="cointegrated/rubert-tiny2")
+    embedding_model = HuggingFaceEmbeddings(model_name=EMBED_MODEL_NAME)
 
     llm_model = os.getenv("OPENROUTER_API_MODEL", "x-ai/grok-4-fast")
     api_key = os.getenv("OPENROUTER_API_KEY")
@@ -208,6 +288,10 @@ def main(eval_mode):
         llm_model=llm_model,
         api_key=api_key,
         evaluation_mode=eval_mode,
+        cache_dir=None if no_cache else cache_dir,
+        llm_concurrency=llm_concurrency,
+        llm_cache_dir=None if no_cache else LLM_CACHE_DIR,
+        llm_batch_tokens=llm_batch_tokens,
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""
+Cost-aware report for chunking configurations
+
+Smaller chunks mean more vectors, a bigger index and slower search, so the
+winner by quality alone is not always the one to ship. This module measures
+per-config costs (chunk count, embedding time, FAISS index and docstore size,
+query latency) and marks the configs on the quality-vs-cost Pareto front.
+"""
+
+import pickle
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from evaluators import embed_queries, search_batch
+
+
+def index_bytes(db: FAISS) -> int:
+    """Size of the serialized FAISS index"""
+    return int(faiss.serialize_index(db.index).nbytes)
+
+
+def docstore_bytes(db: FAISS) -> int:
+    """Size of the pickled docstore, as written by FAISS.save_local"""
+    return len(pickle.dumps((db.docstore, db.index_to_docstore_id)))
+
+
+def query_latencies(db: FAISS, query_matrix: np.ndarray, k: int, repeats: int = 3) -> List[float]:
+    """Search latency in seconds for every query, one query at a time"""
+    latencies = []
+    for _ in range(repeats):
+        for row in range(len(query_matrix)):
+            start = time.perf_counter()
+            search_batch(db, query_matrix[row:row + 1], k)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def measure_costs(
+        dbs: List[FAISS],
+        configs: List[Dict],
+        questions: List[str],
+        k: int = 2,
+        build_stats: Optional[Dict[str, Dict]] = None,
+        repeats: int = 3,
+) -> Dict[str, Dict]:
+    """
+    Measure cost metrics for every config
+
+    Query embedding is done once up front, so latency covers only the
+    index search and docstore lookup that differ between configs.
+
+    Returns:
+        Dict config name -> cost metrics
+    """
+    build_stats = build_stats or {}
+    query_matrix = embed_queries(dbs[0].embedding_function, questions)
+
+    costs = {}
+    for db, cfg in zip(dbs, configs):
+        latencies = np.array(query_latencies(db, query_matrix, k, repeats=repeats)) * 1000
+        stats = build_stats.get(cfg["name"], {})
+        idx_bytes = index_bytes(db)
+        doc_bytes = docstore_bytes(db)
+        costs[cfg["name"]] = {
+            "chunk_count": stats.get("chunk_count", db.index.ntotal),
+            "embed_seconds": stats.get("embed_seconds"),
+            "index_bytes": idx_bytes,
+            "docstore_bytes": doc_bytes,
+            "memory_bytes": idx_bytes + doc_bytes,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+        }
+    return costs
+
+
+def pareto_front(
+        quality: Dict[str, float],
+        costs: Dict[str, Dict],
+        cost_keys=("memory_bytes", "p95_ms"),
+) -> List[str]:
+    """
+    Configs not dominated on (higher quality, lower costs)
+
+    A config is dominated if another one is at least as good on quality and
+    every cost and strictly better on at least one of them.
+    """
+    def vector(name):
+        # качество со знаком минус: все координаты "меньше — лучше"
+        return [-quality[name]] + [costs[name][key] for key in cost_keys]
+
+    names = list(quality)
+    front = []
+    for a in names:
+        va = vector(a)
+        dominated = False
+        for b in names:
+            if a == b:
+                continue
+            vb = vector(b)
+            if all(x <= y for x, y in zip(vb, va)) and any(x < y for x, y in zip(vb, va)):
+                dominated = True
+                break
+        if not dominated:
+            front.append(a)
+    return front
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+def print_cost_table(win_stats: Dict[str, int], costs: Dict[str, Dict], total_questions: int):
+    """Print wins next to cost metrics and mark the Pareto front"""
+    front = set(pareto_front(win_stats, costs))
+
+    print("\n" + "="*80)
+    print("💰 КАЧЕСТВО И СТОИМОСТЬ КОНФИГУРАЦИЙ")
+    print("="*80 + "\n")
+    print(f"   {'config':20s} | {'wins':>7s} | {'chunks':>6s} | {'embed':>7s} | "
+          f"{'index':>8s} | {'docstore':>8s} | {'p50':>7s} | {'p95':>7s}")
+    for name, wins in sorted(win_stats.items(), key=lambda x: x[1], reverse=True):
+        c = costs[name]
+        embed = f"{c['embed_seconds']:.2f}s" if c["embed_seconds"] is not None else "—"
+        mark = "⭐" if name in front else "  "
+        print(f"{mark} {name:20s} | {wins:2d}/{total_questions:<4d} | {c['chunk_count']:6d} | {embed:>7s} | "
+              f"{_fmt_bytes(c['index_bytes']):>8s} | {_fmt_bytes(c['docstore_bytes']):>8s} | "
+              f"{c['p50_ms']:5.2f}ms | {c['p95_ms']:5.2f}ms")
+    print(f"\n⭐ Парето-фронт (победы vs память индекса+docstore и p95): {', '.join(sorted(front))}")
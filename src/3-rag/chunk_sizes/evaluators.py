@@ -5,7 +5,10 @@ This module provides different evaluation strategies for assessing
 the quality of chunking configurations.
 """
 
+import asyncio
 from typing import List, Dict, Any
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
 
 
@@ -25,36 +28,113 @@ class ScoreBasedEvaluator:
         Returns:
             List of dicts with config, avg_score, scores, and docs_and_scores
         """
-        results = []
+        return self.evaluate_batch(dbs, configs, [query], k=k)[0]
+
+    def evaluate_batch(self, dbs: List[FAISS], configs: List[Dict], queries: List[str], k: int = 2) -> List[List[Dict[str, Any]]]:
+        """
+        Evaluate many queries at once
         
-        for i, cfg in enumerate(configs):
-            docs_and_scores = dbs[i].similarity_search_with_score(query, k=k)
-            scores = [score for _, score in docs_and_scores]
-            avg_score = sum(scores) / len(scores) if scores else float('inf')
-            
-            results.append({
-                'config': cfg,
-                'avg_score': avg_score,
-                'scores': scores,
-                'docs_and_scores': docs_and_scores
-            })
+        Queries are embedded once (see embed_queries) and each config's index
+        is searched once with the whole query matrix. All dbs must share the
+        embedding model (as they do in run_tests).
         
-        # Sort by average score (lower is better)
-        results.sort(key=lambda x: x['avg_score'])
-        return results
+        Args:
+            dbs: List of FAISS databases (one per config)
+            configs: List of configuration dicts
+            queries: List of query strings
+            k: Number of chunks to retrieve per config
+            
+        Returns:
+            Per query (in input order): list of dicts as returned by evaluate()
+        """
+        if not queries:
+            return []
+
+        query_matrix = embed_queries(dbs[0].embedding_function, queries)
+
+        # per_config[i][q] -> docs_and_scores для конфигурации i и вопроса q
+        per_config = [search_batch(db, query_matrix, k) for db in dbs]
+
+        all_results = []
+        for q in range(len(queries)):
+            results = []
+            for i, cfg in enumerate(configs):
+                docs_and_scores = per_config[i][q]
+                scores = [score for _, score in docs_and_scores]
+                avg_score = sum(scores) / len(scores) if scores else float('inf')
+                
+                results.append({
+                    'config': cfg,
+                    'avg_score': avg_score,
+                    'scores': scores,
+                    'docs_and_scores': docs_and_scores
+                })
+            
+            # Sort by average score (lower is better)
+            results.sort(key=lambda x: x['avg_score'])
+            all_results.append(results)
+        return all_results
+
+
+def embed_queries(embedding_model, queries: List[str]) -> np.ndarray:
+    """
+    Embed queries exactly as FAISS.similarity_search does
+
+    embed_query is called per query rather than embed_documents for the
+    whole list: models with query prefixes or instructions (e5, bge, ...)
+    embed queries differently from documents.
+    
+    Returns:
+        float32 matrix with one row per query
+    """
+    return np.asarray([embedding_model.embed_query(q) for q in queries], dtype=np.float32)
+
+
+def search_batch(db: FAISS, query_matrix: np.ndarray, k: int) -> List[List[tuple]]:
+    """
+    Search a FAISS vector store with a matrix of query embeddings
+    
+    Mirrors FAISS.similarity_search_with_score_by_vector (L2 normalization,
+    skipping -1 ids) but issues a single index.search call for all rows.
+    Build query_matrix with embed_queries to get the same results as
+    FAISS.similarity_search_with_score.
+    
+    Returns:
+        Per query row: list of (Document, score) tuples
+    """
+    vectors = np.array(query_matrix, dtype=np.float32, copy=True)
+    if db._normalize_L2:
+        faiss.normalize_L2(vectors)
+    scores, indices = db.index.search(vectors, k)
+
+    batch = []
+    for row_scores, row_ids in zip(scores, indices):
+        docs_and_scores = []
+        for score, idx in zip(row_scores, row_ids):
+            if idx == -1:
+                continue
+            doc = db.docstore.search(db.index_to_docstore_id[idx])
+            docs_and_scores.append((doc, float(score)))
+        batch.append(docs_and_scores)
+    return batch
 
 
 class LLMBasedEvaluator:
     """Evaluates chunks using LLM assessment"""
     
-    def __init__(self, assessor):
+    def __init__(self, assessor, max_concurrency: int = 8, batch_tokens: int = 0):
         """
         Initialize LLM evaluator
         
         Args:
             assessor: LLMAssessor instance
+            max_concurrency: Max number of concurrent LLM requests in evaluate_batch()
+            batch_tokens: Token budget for packing several queries into one
+                request in evaluate_batch() (0 sends one request per query)
         """
         self.assessor = assessor
+        self.max_concurrency = max_concurrency
+        self.batch_tokens = batch_tokens
     
     def evaluate(self, dbs: List[FAISS], configs: List[Dict], query: str, k: int = 2) -> List[Dict[str, Any]]:
         """
@@ -82,7 +162,52 @@ class LLMBasedEvaluator:
         
         # Get LLM assessment
         result = self.assessor.assess_chunks(query, chunks_dict)
+        return self._build_results(configs, result, docs_dict)
+
+    def evaluate_batch(self, dbs: List[FAISS], configs: List[Dict], queries: List[str], k: int = 2) -> List[List[Dict[str, Any]]]:
+        """
+        Evaluate many queries with concurrent LLM requests
+        
+        Retrieval is batched as in ScoreBasedEvaluator, then assessments run
+        concurrently (bounded by max_concurrency) and are served from the
+        assessor's cache when available.
         
+        Returns:
+            Per query (in input order): list of dicts as returned by evaluate(),
+            empty if the LLM assessment for the query failed
+        """
+        if not queries:
+            return []
+
+        query_matrix = embed_queries(dbs[0].embedding_function, queries)
+        per_config = [search_batch(db, query_matrix, 1) for db in dbs]
+
+        items = []
+        docs_dicts = []
+        for q_idx, query in enumerate(queries):
+            chunks_dict = {}
+            docs_dict = {}
+            for i, cfg in enumerate(configs):
+                if per_config[i][q_idx]:
+                    doc, _ = per_config[i][q_idx][0]
+                    chunks_dict[cfg['name']] = doc.page_content
+                    docs_dict[cfg['name']] = doc
+            items.append((query, chunks_dict))
+            docs_dicts.append(docs_dict)
+
+        if self.batch_tokens:
+            coro = self.assessor.aassess_batched(
+                items, max_tokens=self.batch_tokens, max_concurrency=self.max_concurrency
+            )
+        else:
+            coro = self.assessor.aassess_many(items, max_concurrency=self.max_concurrency)
+        assessments = asyncio.run(coro)
+        return [
+            self._build_results(configs, result, docs_dict) if result is not None else []
+            for result, docs_dict in zip(assessments, docs_dicts)
+        ]
+
+    def _build_results(self, configs: List[Dict], result, docs_dict: Dict) -> List[Dict[str, Any]]:
         # Build results list
         results = []
         for assessment in result.scores:
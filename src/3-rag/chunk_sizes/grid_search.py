@@ -0,0 +1,174 @@
+"""
+Parallel chunk-parameter search with successive halving
+
+Candidates are (chunk_size, chunk_overlap) layouts. On every rung all
+surviving candidates are scored on a growing subset of questions in a process
+pool, the best 1/eta of them are kept and the question subset is multiplied
+by eta. Each worker keeps the indices it has built, and the on-disk cache
+lets later rungs reuse them in any worker.
+
+The number of retrieved chunks k is fixed rather than searched: the top-1
+distance is never larger than the top-k average, so a distance score would
+always pick the smallest k.
+"""
+
+import csv
+import itertools
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from evaluators import embed_queries, search_batch
+from index_cache import build_indices
+
+
+# Состояние процесса-воркера (инициализируется один раз на процесс)
+_worker = {}
+
+
+def make_candidates(chunk_sizes: Sequence[int], chunk_overlaps: Sequence[int]) -> List[Dict]:
+    """Cartesian product of parameter ranges, skipping overlaps not smaller than the chunk"""
+    candidates = []
+    for size, overlap in itertools.product(chunk_sizes, chunk_overlaps):
+        if overlap >= size:
+            continue
+        candidates.append({
+            "name": f"cs{size}_ov{overlap}",
+            "chunk_size": size,
+            "chunk_overlap": overlap,
+        })
+    return candidates
+
+
+def _init_worker(embed_model_name: str, docs: List[Document], cache_dir: Optional[str]):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    _worker["embedding_model"] = HuggingFaceEmbeddings(model_name=embed_model_name)
+    _worker["docs"] = docs
+    _worker["cache_dir"] = cache_dir
+    _worker["dbs"] = {}
+
+
+def _score_layout(layout: Tuple[int, int], k: int, questions: List[str]) -> float:
+    """
+    Score one chunk layout
+
+    Returns:
+        Mean over questions of the average top-k FAISS distance (lower is better),
+        the same metric as ScoreBasedEvaluator
+    """
+    size, overlap = layout
+    if layout not in _worker["dbs"]:
+        cfg = {"name": f"cs{size}_ov{overlap}", "chunk_size": size, "chunk_overlap": overlap}
+        _worker["dbs"][layout] = build_indices(
+            _worker["embedding_model"], [cfg], _worker["docs"], cache_dir=_worker["cache_dir"]
+        )[0]
+    db = _worker["dbs"][layout]
+
+    # один поиск по индексу на все вопросы ступени
+    query_matrix = embed_queries(_worker["embedding_model"], questions)
+    total = 0.0
+    for docs_and_scores in search_batch(db, query_matrix, k):
+        scores = [score for _, score in docs_and_scores]
+        total += sum(scores) / len(scores) if scores else float("inf")
+    return total / len(questions)
+
+
+def successive_halving(
+        candidates: List[Dict],
+        questions: List[str],
+        embed_model_name: str,
+        docs: List[Document],
+        k: int = 2,
+        eta: int = 3,
+        min_questions: Optional[int] = None,
+        workers: int = 4,
+        cache_dir: Optional[str] = None,
+        seed: int = 42,
+) -> List[Dict]:
+    """
+    Run successive halving over candidates
+
+    Args:
+        candidates: Configs from make_candidates()
+        questions: Full question set
+        embed_model_name: HuggingFace model name (each worker loads its own copy)
+        docs: Documents to chunk
+        k: Number of chunks retrieved per question (the same for every candidate)
+        eta: Keep the best 1/eta candidates per rung and grow the question subset eta times
+        min_questions: Questions on the first rung (defaults to a size that reaches
+            the full set on the last rung)
+        workers: Number of worker processes
+        cache_dir: Directory for persisted FAISS indices
+        seed: Seed for the question order
+
+    Returns:
+        Leaderboard: candidates with score, rung and n_questions, best first
+    """
+    if eta < 2:
+        raise ValueError("eta must be >= 2")
+
+    order = list(questions)
+    random.Random(seed).shuffle(order)
+
+    rungs = max(1, math.ceil(math.log(max(len(candidates), 1), eta)))
+    if min_questions is None:
+        min_questions = max(1, len(order) // eta ** (rungs - 1))
+
+    results = {c["name"]: dict(c, k=k, score=float("inf"), rung=0, n_questions=0) for c in candidates}
+    alive = list(candidates)
+    n_questions = min(min_questions, len(order))
+    rung = 0
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(embed_model_name, docs, cache_dir),
+    ) as pool:
+        while True:
+            rung += 1
+            subset = order[:n_questions]
+            start = time.perf_counter()
+
+            futures = {
+                c["name"]: pool.submit(_score_layout, (c["chunk_size"], c["chunk_overlap"]), k, subset)
+                for c in alive
+            }
+            for c in alive:
+                results[c["name"]].update(score=futures[c["name"]].result(), rung=rung, n_questions=n_questions)
+
+            alive.sort(key=lambda c: results[c["name"]]["score"])
+            print(f"🪜 Ступень {rung}: кандидатов={len(alive)}, вопросов={n_questions}, "
+                  f"лучший={alive[0]['name']} ({results[alive[0]['name']]['score']:.4f}), "
+                  f"время={time.perf_counter() - start:.2f}s")
+
+            if len(alive) <= 1 or n_questions >= len(order):
+                break
+            alive = alive[:max(1, len(alive) // eta)]
+            n_questions = min(len(order), n_questions * eta)
+
+    return sorted(results.values(), key=lambda r: (-r["rung"], r["score"]))
+
+
+def write_leaderboard(leaderboard: List[Dict], path: str):
+    """Save leaderboard as CSV"""
+    fields = ["rank", "name", "chunk_size", "chunk_overlap", "k", "score", "rung", "n_questions"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for rank, row in enumerate(leaderboard, 1):
+            writer.writerow(dict(row, rank=rank))
+
+
+def print_leaderboard(leaderboard: List[Dict], top: int = 10):
+    print("\n" + "="*80)
+    print("🏁 ТАБЛИЦА ЛИДЕРОВ")
+    print("="*80 + "\n")
+    for rank, row in enumerate(leaderboard[:top], 1):
+        print(f"{rank:2d}. {row['name']:22s} | score={row['score']:.4f} | "
+              f"ступень={row['rung']} | вопросов={row['n_questions']}")
+    print()
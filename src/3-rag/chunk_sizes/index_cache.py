@@ -0,0 +1,148 @@
+"""
+Embed-once index builder for chunking configurations
+
+Chunks produced by different configs often coincide (short paragraphs are
+kept intact by every splitter), so texts are deduplicated across all configs
+and each unique text is embedded once in large batches. Built FAISS indices
+are persisted per (documents hash, config, embedding model), which lets
+reruns on unchanged data skip index building entirely.
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from multi_splitter import split_documents_many
+
+
+DEFAULT_CACHE_DIR = ".cache/indices"
+STATS_FILE = "build_stats.json"
+
+
+def docs_hash(docs: List[Document]) -> str:
+    """Stable hash of document contents and metadata"""
+    h = hashlib.sha256()
+    for doc in docs:
+        h.update(doc.page_content.encode("utf-8"))
+        h.update(json.dumps(doc.metadata or {}, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def embedding_model_name(embedding_model) -> str:
+    return getattr(embedding_model, "model_name", None) or type(embedding_model).__name__
+
+
+def index_key(docs_digest: str, cfg: Dict, model_name: str) -> str:
+    """Cache key for one config: only parameters that affect the index are used"""
+    params = {
+        "docs": docs_digest,
+        "model": model_name,
+        "chunk_size": cfg["chunk_size"],
+        "chunk_overlap": cfg["chunk_overlap"],
+    }
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{cfg['name']}-{digest[:16]}"
+
+
+def embed_unique(embedding_model, texts: List[str], batch_size: int = 256) -> Dict[str, List[float]]:
+    """Embed each distinct text exactly once, in batches"""
+    unique = list(dict.fromkeys(texts))
+    vectors: Dict[str, List[float]] = {}
+    for start in range(0, len(unique), batch_size):
+        batch = unique[start:start + batch_size]
+        for text, vector in zip(batch, embedding_model.embed_documents(batch)):
+            vectors[text] = vector
+    return vectors
+
+
+def build_indices(
+        embedding_model,
+        configs: List[Dict],
+        docs: List[Document],
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        batch_size: int = 256,
+        build_stats: Optional[Dict[str, Dict]] = None,
+) -> List[FAISS]:
+    """
+    Build (or load from disk) one FAISS index per config
+
+    Args:
+        embedding_model: Embedding model for vector search
+        configs: List of chunking configurations
+        docs: List of documents to chunk
+        cache_dir: Directory for persisted indices (None disables the cache)
+        batch_size: Number of texts per embed_documents() call
+        build_stats: If given, filled with {config name: {"chunk_count", "embed_seconds"}};
+            embed_seconds estimates the cost of embedding the config on its own
+
+    Returns:
+        List of FAISS databases in the same order as configs
+    """
+    model_name = embedding_model_name(embedding_model)
+    digest = docs_hash(docs)
+    dbs: List[Optional[FAISS]] = [None] * len(configs)
+
+    # 1. Загружаем готовые индексы с диска
+    missing = []
+    for i, cfg in enumerate(configs):
+        path = Path(cache_dir) / index_key(digest, cfg, model_name) if cache_dir else None
+        if path is not None and (path / "index.faiss").exists():
+            dbs[i] = FAISS.load_local(str(path), embedding_model, allow_dangerous_deserialization=True)
+            print(f"💾 Индекс для {cfg['name']} загружен из кэша: {path}")
+            if build_stats is not None:
+                stats_path = path / STATS_FILE
+                build_stats[cfg["name"]] = json.loads(stats_path.read_text()) if stats_path.exists() else {
+                    "chunk_count": dbs[i].index.ntotal, "embed_seconds": None
+                }
+        else:
+            missing.append((i, cfg, path))
+
+    if not missing:
+        return dbs  # type: ignore[return-value]
+
+    # 2. Нарезаем документы для недостающих конфигураций (один индекс разделителей на документ)
+    split_by_name = split_documents_many([cfg for _, cfg, _ in missing], docs)
+    chunks_per_cfg = {}
+    all_texts = []
+    for i, cfg, _ in missing:
+        chunks = split_by_name[cfg["name"]]
+        chunks_per_cfg[i] = chunks
+        all_texts.extend(c.page_content for c in chunks)
+        print(f"📊 Создание БД для конфигурации: {cfg['name']} "
+              f"(chunk_size={cfg['chunk_size']}, overlap={cfg['chunk_overlap']}), "
+              f"всего чанков={len(chunks)}")
+
+    # 3. Считаем эмбеддинги один раз на уникальный текст
+    start = time.perf_counter()
+    vectors = embed_unique(embedding_model, all_texts, batch_size=batch_size)
+    embed_seconds = time.perf_counter() - start
+    print(f"🧮 Эмбеддингов посчитано: {len(vectors)} уникальных из {len(all_texts)} чанков "
+          f"за {embed_seconds:.2f}s")
+    seconds_per_text = embed_seconds / len(vectors) if vectors else 0.0
+
+    # 4. Собираем индексы из готовых векторов и сохраняем
+    for i, cfg, path in missing:
+        chunks = chunks_per_cfg[i]
+        db = FAISS.from_embeddings(
+            text_embeddings=[(c.page_content, vectors[c.page_content]) for c in chunks],
+            embedding=embedding_model,
+            metadatas=[c.metadata for c in chunks],
+        )
+        stats = {
+            "chunk_count": len(chunks),
+            "embed_seconds": seconds_per_text * len({c.page_content for c in chunks}),
+        }
+        if path is not None:
+            db.save_local(str(path))
+            (path / STATS_FILE).write_text(json.dumps(stats))
+        if build_stats is not None:
+            build_stats[cfg["name"]] = stats
+        dbs[i] = db
+
+    return dbs  # type: ignore[return-value]
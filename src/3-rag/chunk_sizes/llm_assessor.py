@@ -5,11 +5,19 @@ This module provides functionality to assess the quality of retrieved chunks
 using an LLM to evaluate how helpful each chunk is for answering a query.
 """
 
-from typing import Dict, List
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import tiktoken
 from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
+
+from src.common.json_cache import JsonCache, hash_parts
+
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 
 class ChunkAssessment(BaseModel):
@@ -33,13 +41,34 @@ class AssessmentResult(BaseModel):
     )
 
 
-def create_llm_client(model_name: str, api_key: str, temperature: float = 0.0):
+class QueryAssessment(BaseModel):
+    """Chunk assessments for one query of a batched request"""
+    query_id: str = Field(description="Identifier of the query, exactly as given in the request (e.g. q3)")
+    scores: List[ChunkAssessment] = Field(
+        description="List of chunk assessments for each configuration of this query"
+    )
+
+
+class BatchAssessmentResult(BaseModel):
+    """Assessments for several queries at once"""
+    results: List[QueryAssessment] = Field(
+        description="One entry per query in the request"
+    )
+
+
+def create_llm_client(
+        model_name: str, 
+        api_key: str, 
+        temperature: float = 0.0,
+        base_url: str = OPENROUTER_BASE_URL,
+):
     """
     Create and configure LLM client for assessment
     
     Args:
         model_name: Model to use (defaults to OPENROUTER_API_MODEL env var)
         temperature: Temperature for generation (0.0 for deterministic)
+        base_url: OpenAI-compatible endpoint (e.g. a local stub server in tests)
     
     Returns:
         Configured ChatOpenAI instance
@@ -47,7 +76,7 @@ def create_llm_client(model_name: str, api_key: str, temperature: float = 0.0):
     return ChatOpenAI(
         model=model_name,
         temperature=temperature,
-        base_url="https://openrouter.ai/api/v1",
+        base_url=base_url,
         api_key=api_key,
         timeout=30,
         max_retries=2,
@@ -81,6 +110,14 @@ USER_PROMPT = """Запрос пользователя: {query}
 Оцените каждый фрагмент и предоставьте оценки в указанном формате JSON."""
 
 
+BATCH_USER_PROMPT = """Ниже несколько независимых запросов пользователя, у каждого свой идентификатор и свои фрагменты текста.
+Оцените фрагменты каждого запроса отдельно, только относительно этого запроса.
+
+{groups}
+
+Верните оценки для каждого запроса с его идентификатором в указанном формате JSON."""
+
+
 def build_assessment_prompt():
     """Build the prompt template for LLM assessment"""
     return ChatPromptTemplate.from_messages([
@@ -89,20 +126,46 @@ def build_assessment_prompt():
     ])
 
 
+def build_batch_assessment_prompt():
+    """Build the prompt template for batched multi-query assessment"""
+    return ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", BATCH_USER_PROMPT + "\n\n{format_instructions}")
+    ])
+
+
 class LLMAssessor:
     """Handles LLM-based assessment of chunk quality"""
     
-    def __init__(self, model_name: str, api_key: str):
+    def __init__(
+            self, 
+            model_name: str, 
+            api_key: str,
+            base_url: str = OPENROUTER_BASE_URL,
+            cache_dir: Optional[str] = None,
+    ):
         """
         Initialize the LLM assessor
         
         Args:
             model_name: LLM model to use for assessment
+            base_url: OpenAI-compatible endpoint
+            cache_dir: Directory for persistent response cache (None disables it)
         """
-        self.llm = create_llm_client(model_name, api_key)
+        self.model_name = model_name
+        self.llm = create_llm_client(model_name, api_key, base_url=base_url)
         self.parser = PydanticOutputParser(pydantic_object=AssessmentResult)
         self.prompt = build_assessment_prompt()
         self.chain = self.prompt | self.llm | self.parser
+        self.cache = JsonCache(cache_dir) if cache_dir else None
+        self.prompt_hash = hash_parts(SYSTEM_PROMPT, USER_PROMPT, self.parser.get_format_instructions())
+
+        # Пакетный режим: несколько запросов в одном промпте
+        self.batch_parser = PydanticOutputParser(pydantic_object=BatchAssessmentResult)
+        self.batch_chain = build_batch_assessment_prompt() | self.llm | self.batch_parser
+        self.batch_prompt_hash = hash_parts(SYSTEM_PROMPT, BATCH_USER_PROMPT, self.batch_parser.get_format_instructions())
+        self._encoder = None
+        self.batch_stats = {"requests": 0, "splits": 0, "fallbacks": 0, "failed": 0}
     
     def format_chunks_for_prompt(self, chunks_dict: Dict[str, str]) -> str:
         """
@@ -120,6 +183,27 @@ class LLMAssessor:
             formatted.append(f"Text: {chunk_text[:500]}...")  # Limit length
             formatted.append("")
         return "\n".join(formatted)
+
+    def cache_key(self, query: str, chunks_dict: Dict[str, str], prompt_hash: Optional[str] = None) -> str:
+        """Cache key: (model, prompt template hash, query, chunk texts)"""
+        return hash_parts(self.model_name, prompt_hash or self.prompt_hash, query, sorted(chunks_dict.items()))
+
+    def _chain_input(self, query: str, chunks_dict: Dict[str, str]) -> Dict[str, str]:
+        return {
+            "query": query,
+            "chunks": self.format_chunks_for_prompt(chunks_dict),
+            "format_instructions": self.parser.get_format_instructions()
+        }
+
+    def _cached(self, key: str) -> Optional[AssessmentResult]:
+        if self.cache is None:
+            return None
+        value = self.cache.get(key)
+        return AssessmentResult.model_validate(value) if value is not None else None
+
+    def _store(self, key: str, result: AssessmentResult):
+        if self.cache is not None:
+            self.cache.set(key, result.model_dump())
     
     def assess_chunks(self, query: str, chunks_dict: Dict[str, str]) -> AssessmentResult:
         """
@@ -135,12 +219,203 @@ class LLMAssessor:
         Raises:
             Exception: If LLM call fails or parsing fails
         """
-        chunks_formatted = self.format_chunks_for_prompt(chunks_dict)
-        format_instructions = self.parser.get_format_instructions()
-        
-        result = self.chain.invoke({
-            "query": query,
-            "chunks": chunks_formatted,
-            "format_instructions": format_instructions
-        })
+        key = self.cache_key(query, chunks_dict)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        result = self.chain.invoke(self._chain_input(query, chunks_dict))
+        self._store(key, result)
+        return result
+
+    async def aassess_chunks(self, query: str, chunks_dict: Dict[str, str]) -> AssessmentResult:
+        """Async version of assess_chunks() sharing the same cache"""
+        key = self.cache_key(query, chunks_dict)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        result = await self.chain.ainvoke(self._chain_input(query, chunks_dict))
+        self._store(key, result)
         return result
+
+    async def aassess_many(
+            self, 
+            items: List[tuple], 
+            max_concurrency: int = 8,
+    ) -> List[Optional[AssessmentResult]]:
+        """
+        Assess many (query, chunks_dict) pairs concurrently
+        
+        Args:
+            items: List of (query, chunks_dict) tuples
+            max_concurrency: Max number of in-flight LLM requests
+            
+        Returns:
+            AssessmentResults in the same order as items; None where the
+            request failed (the other results are kept and cached)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(query, chunks_dict):
+            async with semaphore:
+                return await self._assess_or_none(query, chunks_dict)
+
+        return await asyncio.gather(*(run(q, c) for q, c in items))
+
+    async def _assess_or_none(self, query: str, chunks_dict: Dict[str, str]) -> Optional[AssessmentResult]:
+        """aassess_chunks() that reports a failed request instead of raising it"""
+        try:
+            return await self.aassess_chunks(query, chunks_dict)
+        except Exception as e:
+            # ошибка одного запроса не должна обрывать остальные
+            self.batch_stats["failed"] += 1
+            print(f"⚠️ Оценка не получена для запроса '{query}': {type(e).__name__}: {e}")
+            return None
+
+    def format_group(self, query_id: str, query: str, chunks_dict: Dict[str, str]) -> str:
+        """Format one (query, chunks) group for the batched prompt"""
+        return f"=== Запрос {query_id}: {query}\n\n{self.format_chunks_for_prompt(chunks_dict)}"
+
+    def count_tokens(self, text: str) -> int:
+        # энкодер грузится лениво: он нужен только пакетному режиму
+        if self._encoder is None:
+            self._encoder = tiktoken.get_encoding("cl100k_base")
+        return len(self._encoder.encode(text))
+
+    def pack_batches(
+            self, 
+            items: List[Tuple[str, Dict[str, str]]], 
+            max_tokens: int, 
+            max_group_size: int = 10,
+    ) -> List[List[int]]:
+        """
+        Greedily pack item indices into batches under a token budget
+        
+        The budget covers the shared preamble (system prompt + format
+        instructions) plus the formatted groups. An item larger than the
+        budget on its own still gets a batch of one.
+        """
+        preamble = self.count_tokens(
+            SYSTEM_PROMPT + BATCH_USER_PROMPT + self.batch_parser.get_format_instructions()
+        )
+        batches, current, used = [], [], preamble
+        for idx, (query, chunks_dict) in enumerate(items):
+            size = self.count_tokens(self.format_group(f"q{idx}", query, chunks_dict))
+            if current and (used + size > max_tokens or len(current) >= max_group_size):
+                batches.append(current)
+                current, used = [], preamble
+            current.append(idx)
+            used += size
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _assess_group(
+            self, 
+            items: List[Tuple[str, Dict[str, str]]], 
+            indices: List[int],
+            semaphore: asyncio.Semaphore,
+    ) -> Dict[int, Optional[AssessmentResult]]:
+        """
+        Assess a packed group under one semaphore permit
+        
+        If the response cannot be parsed, misses some queries or the request
+        fails, the permit is released and the missing queries are split in
+        half. Each half waits for its own permit, so retries never exceed
+        max_concurrency. A single query that still fails maps to None.
+        """
+        if len(indices) == 1:
+            idx = indices[0]
+            self.batch_stats["fallbacks"] += 1
+            async with semaphore:
+                return {idx: await self._assess_or_none(*items[idx])}
+
+        groups = "\n\n".join(self.format_group(f"q{i}", *items[i]) for i in indices)
+        async with semaphore:
+            self.batch_stats["requests"] += 1
+            try:
+                batch = await self.batch_chain.ainvoke({
+                    "groups": groups,
+                    "format_instructions": self.batch_parser.get_format_instructions(),
+                })
+            except OutputParserException:
+                batch = None
+            except Exception as e:
+                print(f"⚠️ Пакетный запрос на {len(indices)} вопросов не удался ({type(e).__name__}), делим пакет")
+                batch = None
+
+        results: Dict[int, Optional[AssessmentResult]] = {}
+        if batch is not None:
+            by_id = {f"q{i}": i for i in indices}
+            for qa in batch.results:
+                idx = by_id.get(qa.query_id.strip())
+                # принимаем только полные оценки для известных запросов
+                if idx is not None and {a.config_name for a in qa.scores} == set(items[idx][1]):
+                    results[idx] = AssessmentResult(scores=qa.scores)
+
+        missing = [i for i in indices if i not in results]
+        if not missing:
+            return results
+
+        # Не распарсилось, не хватает запросов или запрос упал: делим пополам и повторяем
+        # (разрешение семафора уже отпущено, половины встают в общую очередь)
+        self.batch_stats["splits"] += 1
+        if len(missing) == 1:
+            results.update(await self._assess_group(items, missing, semaphore))
+        else:
+            mid = len(missing) // 2
+            for part in await asyncio.gather(
+                self._assess_group(items, missing[:mid], semaphore),
+                self._assess_group(items, missing[mid:], semaphore),
+            ):
+                results.update(part)
+        return results
+
+    async def aassess_batched(
+            self, 
+            items: List[Tuple[str, Dict[str, str]]], 
+            max_tokens: int = 6000,
+            max_group_size: int = 10,
+            max_concurrency: int = 8,
+    ) -> List[Optional[AssessmentResult]]:
+        """
+        Assess many (query, chunks_dict) pairs, packing several into one request
+        
+        Args:
+            items: List of (query, chunks_dict) tuples
+            max_tokens: Token budget of one batched prompt
+            max_group_size: Max number of queries per request
+            max_concurrency: Max number of in-flight LLM requests
+            
+        Returns:
+            AssessmentResults in the same order as items; None for queries
+            that failed even on their own (finished groups are cached as
+            soon as they complete)
+        """
+        results: Dict[int, Optional[AssessmentResult]] = {}
+        pending = []
+        keys = {}
+        for idx, (query, chunks_dict) in enumerate(items):
+            keys[idx] = self.cache_key(query, chunks_dict, self.batch_prompt_hash)
+            cached = self._cached(keys[idx])
+            if cached is not None:
+                results[idx] = cached
+            else:
+                pending.append(idx)
+
+        pending_items = [items[i] for i in pending]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(batch):
+            part = await self._assess_group(pending_items, batch, semaphore)
+            for local_idx, result in part.items():
+                idx = pending[local_idx]
+                results[idx] = result
+                if result is not None:
+                    self._store(keys[idx], result)
+
+        await asyncio.gather(*(
+            run(batch) for batch in self.pack_batches(pending_items, max_tokens, max_group_size)
+        ))
+        return [results[i] for i in range(len(items))]
@@ -0,0 +1,177 @@
+"""
+Single-pass multi-configuration text splitter
+
+Reproduces RecursiveCharacterTextSplitter (keep_separator=True, len as the
+length function, strip_whitespace=True) but works on offsets. Separator
+positions are found once per document, splits of every piece are memoized,
+and chunk layouts for many (chunk_size, chunk_overlap) pairs are built from
+that shared index. Chunks are returned as (start, end) offsets into the
+source text, so no intermediate strings are copied.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+Span = Tuple[int, int]
+
+
+def _self_overlaps(sep: str) -> bool:
+    """True if occurrences of sep can overlap (a proper prefix is also a suffix)"""
+    return any(sep[:i] == sep[-i:] for i in range(1, len(sep)))
+
+
+class MultiConfigSplitter:
+    """Shared boundary index for one document, reused across chunk configs"""
+
+    def __init__(self, text: str, separators: Optional[List[str]] = None):
+        self.text = text
+        self.separators = list(separators or DEFAULT_SEPARATORS)
+        self._patterns = {sep: re.compile(re.escape(sep)) for sep in self.separators if sep}
+        # позиции разделителей во всём тексте: считаются один раз на документ
+        self._positions: Dict[str, List[int]] = {
+            sep: [m.start() for m in pattern.finditer(text)]
+            for sep, pattern in self._patterns.items()
+        }
+        self._overlapping = {sep: _self_overlaps(sep) for sep in self.separators if sep}
+        self._splits_cache: Dict[Tuple[int, int, int], Tuple[List[Span], int]] = {}
+
+    def _occurrences(self, sep: str, start: int, end: int) -> List[int]:
+        """Start positions of non-overlapping matches inside [start, end), as re.split would see them"""
+        if self._overlapping[sep] and start > 0:
+            # глобальный список может не совпасть с локальным сканированием
+            return [m.start() for m in self._patterns[sep].finditer(self.text, start, end)]
+        positions = self._positions[sep]
+        result = []
+        i = bisect_left(positions, start)
+        while i < len(positions) and positions[i] + len(sep) <= end:
+            result.append(positions[i])
+            i += 1
+        return result
+
+    def _splits(self, start: int, end: int, sep_index: int) -> Tuple[List[Span], int]:
+        """
+        Split a piece by the first separator (from sep_index on) present in it
+
+        Returns:
+            Splits as spans and the index of the next separator to recurse with
+            (len(separators) if there is none)
+        """
+        key = (start, end, sep_index)
+        if key in self._splits_cache:
+            return self._splits_cache[key]
+
+        separators = self.separators[sep_index:]
+        chosen = len(self.separators) - 1
+        occurrences: List[int] = []
+        for offset, sep in enumerate(separators):
+            if not sep:
+                chosen = sep_index + offset
+                break
+            occurrences = self._occurrences(sep, start, end)
+            if occurrences:
+                chosen = sep_index + offset
+                break
+
+        sep = self.separators[chosen]
+        if not sep:
+            splits = [(i, i + 1) for i in range(start, end)]
+        else:
+            # разделитель остаётся в начале следующего куска (keep_separator=True)
+            bounds = [start] + occurrences + [end]
+            splits = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+        result = (splits, chosen + 1 if sep else len(self.separators))
+        self._splits_cache[key] = result
+        return result
+
+    def _merge(self, splits: List[Span], chunk_size: int, chunk_overlap: int) -> List[Span]:
+        """Offset version of TextSplitter._merge_splits with an empty separator (merged chunks are stripped)"""
+        spans = []
+        head = 0  # current chunk is splits[head:i]
+        total = 0
+        for i, (start, end) in enumerate(splits):
+            length = end - start
+            if total + length > chunk_size and i > head:
+                spans.append(self._strip(splits[head][0], splits[i - 1][1]))
+                while total > chunk_overlap or (total + length > chunk_size and total > 0):
+                    total -= splits[head][1] - splits[head][0]
+                    head += 1
+            total += length
+        if head < len(splits):
+            spans.append(self._strip(splits[head][0], splits[-1][1]))
+        return [span for span in spans if span is not None]
+
+    def _split(self, start: int, end: int, sep_index: int, chunk_size: int, chunk_overlap: int) -> List[Span]:
+        splits, next_index = self._splits(start, end, sep_index)
+        has_next = next_index < len(self.separators)
+
+        final: List[Span] = []
+        good: List[Span] = []
+        for split in splits:
+            if split[1] - split[0] < chunk_size:
+                good.append(split)
+                continue
+            if good:
+                final.extend(self._merge(good, chunk_size, chunk_overlap))
+                good = []
+            if not has_next:
+                final.append(split)
+            else:
+                final.extend(self._split(split[0], split[1], next_index, chunk_size, chunk_overlap))
+        if good:
+            final.extend(self._merge(good, chunk_size, chunk_overlap))
+        return final
+
+    def _strip(self, start: int, end: int) -> Optional[Span]:
+        while start < end and self.text[start].isspace():
+            start += 1
+        while end > start and self.text[end - 1].isspace():
+            end -= 1
+        return (start, end) if end > start else None
+
+    def split_offsets(self, chunk_size: int, chunk_overlap: int) -> List[Span]:
+        """
+        Chunk layout for one configuration
+
+        Returns:
+            List of (start, end) offsets; text[start:end] equals the chunk that
+            RecursiveCharacterTextSplitter would produce
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        return self._split(0, len(self.text), 0, chunk_size, chunk_overlap)
+
+    def split_many(self, params: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], List[Span]]:
+        """Chunk layouts for many (chunk_size, chunk_overlap) pairs sharing the boundary index"""
+        return {(size, overlap): self.split_offsets(size, overlap) for size, overlap in params}
+
+
+def split_documents_many(
+        configs: List[Dict],
+        docs: List[Document],
+        separators: Optional[List[str]] = None,
+) -> Dict[str, List[Document]]:
+    """
+    Split documents for all configs with one boundary index per document
+
+    Returns:
+        Dict config name -> chunks (Documents with a copy of the source metadata)
+    """
+    params = {(cfg["chunk_size"], cfg["chunk_overlap"]) for cfg in configs}
+    chunks: Dict[str, List[Document]] = {cfg["name"]: [] for cfg in configs}
+    for doc in docs:
+        splitter = MultiConfigSplitter(doc.page_content, separators)
+        layouts = splitter.split_many(params)
+        for cfg in configs:
+            for start, end in layouts[(cfg["chunk_size"], cfg["chunk_overlap"])]:
+                md = (doc.metadata or {}).copy() if hasattr(doc, "metadata") else {}
+                chunks[cfg["name"]].append(Document(page_content=doc.page_content[start:end], metadata=md))
+    return chunks
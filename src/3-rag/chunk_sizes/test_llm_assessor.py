@@ -0,0 +1,163 @@
+import asyncio
+import json
+import re
+
+from aiohttp import web
+
+import llm_assessor
+from llm_assessor import LLMAssessor
+
+
+async def start_stub_llm(delay: float = 0.02, max_batch: int = 10) -> web.AppRunner:
+    """
+    Заглушка OpenAI-совместимого API для оценщика
+
+    Оценивает каждую конфигурацию каждого запроса; на запрос со словом 'сбой' отвечает 400,
+    на пакет больше max_batch запросов — текстом вместо JSON.
+    """
+    stats = {"calls": 0, "in_flight": 0, "max_in_flight": 0, "batch_sizes": []}
+
+    def scores(text: str) -> list:
+        return [{"config_name": name, "score": 10, "reasoning": "ok"}
+                for name in re.findall(r"^\[\d+\] Configuration: (.+)$", text, flags=re.MULTILINE)]
+
+    async def completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        stats["calls"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            stats["in_flight"] -= 1
+        prompt = body["messages"][-1]["content"]
+        groups = re.split(r"^=== Запрос (q\d+): .*$", prompt, flags=re.MULTILINE)
+        if "сбой" in prompt:
+            return web.json_response({"error": {"message": "bad request"}}, status=400)
+        if len(groups) > 1:
+            stats["batch_sizes"].append(len(groups) // 2)
+            if len(groups) // 2 > max_batch:
+                content = "Извините, слишком много запросов сразу"
+            else:
+                content = json.dumps({"results": [
+                    {"query_id": query_id, "scores": scores(text)} for query_id, text in zip(groups[1::2], groups[2::2])
+                ]})
+        else:
+            content = json.dumps({"scores": scores(prompt)})
+        return web.json_response({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    app["stats"] = stats
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def run_with_stub(scenario, **stub_kwargs):
+    """scenario(make_assessor, llm_stats) выполняется рядом с заглушкой LLM"""
+
+    async def main():
+        llm = await start_stub_llm(**stub_kwargs)
+        base_url = f"http://127.0.0.1:{llm.addresses[0][1]}/v1"
+
+        def make_assessor(cache_dir=None) -> LLMAssessor:
+            return LLMAssessor("stub-model", "test", base_url=base_url, cache_dir=cache_dir)
+
+        try:
+            return await scenario(make_assessor, llm.app["stats"])
+        finally:
+            await llm.cleanup()
+
+    return asyncio.run(main())
+
+
+def make_items(n: int, failing: tuple = ()) -> list:
+    return [
+        (f"вопрос {i}" if i not in failing else f"сбой {i}",
+         {"cs200_ov0": f"фрагмент {i} мелкой нарезки", "cs800_ov100": f"фрагмент {i} крупной нарезки"})
+        for i in range(n)
+    ]
+
+
+def assert_complete(result, chunks_dict):
+    assert result is not None
+    assert {score.config_name for score in result.scores} == set(chunks_dict)
+
+
+def test_assess_many_bounds_concurrency_and_reruns_from_cache(tmp_path):
+    items = make_items(12)
+
+    async def scenario(make_assessor, llm_stats):
+        first = await make_assessor(str(tmp_path)).aassess_many(items, max_concurrency=3)
+        calls = llm_stats["calls"]
+        second = await make_assessor(str(tmp_path)).aassess_many(items, max_concurrency=3)
+        return first, second, calls, llm_stats
+
+    first, second, calls, llm_stats = run_with_stub(scenario)
+    for result, (_, chunks_dict) in zip(first, items):
+        assert_complete(result, chunks_dict)
+    assert llm_stats["max_in_flight"] == 3
+    # повтор целиком из JsonCache: заглушку больше не спрашивают
+    assert calls == 12 and llm_stats["calls"] == 12
+    assert second == first
+
+
+def test_failed_request_maps_to_none_without_aborting_the_rest(tmp_path):
+    items = make_items(5, failing=(2,))
+
+    async def scenario(make_assessor, llm_stats):
+        assessor = make_assessor(str(tmp_path))
+        return await assessor.aassess_many(items, max_concurrency=2), assessor.batch_stats
+
+    results, batch_stats = run_with_stub(scenario)
+    assert results[2] is None
+    for i in (0, 1, 3, 4):
+        assert_complete(results[i], items[i][1])
+    assert batch_stats["failed"] == 1
+
+
+def count_words(self, text: str) -> int:
+    # энкодер tiktoken скачивается из сети; для проверки упаковки хватает счёта слов
+    return len(text.split())
+
+
+def test_pack_batches_respects_token_budget(monkeypatch):
+    monkeypatch.setattr(LLMAssessor, "count_tokens", count_words)
+    assessor = LLMAssessor("stub-model", "test", base_url="http://127.0.0.1:9/v1")
+    items = [(f"вопрос {i} " + "очень " * (i % 7), {"cs200_ov0": "слово " * (10 * i)}) for i in range(30)]
+    preamble = count_words(assessor, llm_assessor.SYSTEM_PROMPT + llm_assessor.BATCH_USER_PROMPT
+                           + assessor.batch_parser.get_format_instructions())
+    max_tokens = preamble + 400
+
+    batches = assessor.pack_batches(items, max_tokens=max_tokens, max_group_size=5)
+    assert sorted(i for batch in batches for i in batch) == list(range(30))
+    for batch in batches:
+        assert len(batch) <= 5
+        size = preamble + sum(count_words(assessor, assessor.format_group(f"q{i}", *items[i])) for i in batch)
+        # пакет из одного слишком большого запроса допустим, остальные укладываются в бюджет
+        assert size <= max_tokens or len(batch) == 1
+
+
+def test_unparsable_batch_is_split_until_every_query_is_assessed(tmp_path, monkeypatch):
+    monkeypatch.setattr(LLMAssessor, "count_tokens", count_words)
+    items = make_items(8)
+
+    async def scenario(make_assessor, llm_stats):
+        assessor = make_assessor(str(tmp_path))
+        results = await assessor.aassess_batched(items, max_tokens=100_000, max_group_size=8, max_concurrency=2)
+        return results, assessor.batch_stats, llm_stats
+
+    # заглушка не разбирает пакеты больше двух запросов: 8 -> 4 -> 2
+    results, batch_stats, llm_stats = run_with_stub(scenario, max_batch=2)
+    for result, (_, chunks_dict) in zip(results, items):
+        assert_complete(result, chunks_dict)
+    assert llm_stats["batch_sizes"][0] == 8
+    assert sorted(llm_stats["batch_sizes"]) == [2, 2, 2, 2, 4, 4, 8]
+    assert batch_stats["splits"] == 3
+    assert llm_stats["max_in_flight"] <= 2
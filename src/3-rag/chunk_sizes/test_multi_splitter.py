@@ -0,0 +1,72 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from langchain_core.documents import Document
+
+from multi_splitter import DEFAULT_SEPARATORS, MultiConfigSplitter, split_documents_many
+
+
+def mixed_text(seed: int, length: int = 3000) -> str:
+    """Случайный текст со всеми уровнями разделителей, включая идущие подряд"""
+    rng = random.Random(seed)
+    pieces = ["\n\n", "\n", ". ", " ", "\n\n\n", "  ", ".", "чай", "улун", "пуэр", "заварка", "a" * 30]
+    weights = [2, 3, 4, 20, 1, 2, 1, 10, 10, 10, 10, 1]
+    text = ""
+    while len(text) < length:
+        text += rng.choices(pieces, weights)[0]
+    return text
+
+
+TEXTS = {
+    "paragraphs": "\n\n".join(f"Абзац {i}. " + "слово " * (i * 7 % 23) for i in range(20)),
+    "lines": "\n".join(f"строка {i} " + "x" * (i * 5 % 37) for i in range(40)),
+    "sentences": ". ".join(f"Предложение номер {i} про чай" for i in range(40)),
+    "words": " ".join(f"слово{i}" for i in range(300)),
+    "no_separators": "абвгдеёжзийклмнопрстуфхцчшщъыьэюя" * 20,
+    "runs_of_newlines": "a\n\n\nb\n\n\n\nc\n\nd\n" * 30 + "  хвост  ",
+    "mixed_1": mixed_text(1),
+    "mixed_2": mixed_text(2),
+}
+
+PARAMS = [(5, 0), (10, 3), (40, 10), (100, 20), (250, 0), (1000, 200)]
+
+# разделители make_splitter и умолчания самого RecursiveCharacterTextSplitter (без ". ")
+SEPARATORS = {"repo": DEFAULT_SEPARATORS, "langchain": ["\n\n", "\n", " ", ""]}
+
+
+def reference(chunk_size: int, chunk_overlap: int, separators=DEFAULT_SEPARATORS) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators)
+
+
+@pytest.mark.parametrize("separators", sorted(SEPARATORS))
+@pytest.mark.parametrize("chunk_size,chunk_overlap", PARAMS)
+@pytest.mark.parametrize("name", sorted(TEXTS))
+def test_offsets_match_recursive_character_splitter(name, chunk_size, chunk_overlap, separators):
+    text = TEXTS[name]
+    expected = reference(chunk_size, chunk_overlap, SEPARATORS[separators]).split_text(text)
+    offsets = MultiConfigSplitter(text, SEPARATORS[separators]).split_offsets(chunk_size, chunk_overlap)
+    assert [text[start:end] for start, end in offsets] == expected
+
+
+def test_split_many_reuses_index_with_the_same_result():
+    text = TEXTS["mixed_1"]
+    splitter = MultiConfigSplitter(text)
+    layouts = splitter.split_many(PARAMS)
+    for size, overlap in PARAMS:
+        assert layouts[(size, overlap)] == MultiConfigSplitter(text).split_offsets(size, overlap)
+
+
+def test_split_documents_many_copies_metadata():
+    docs = [Document(page_content=TEXTS["sentences"], metadata={"source": "a"})]
+    configs = [{"name": "cs40_ov10", "chunk_size": 40, "chunk_overlap": 10}]
+    chunks = split_documents_many(configs, docs)["cs40_ov10"]
+    expected = reference(40, 10).split_documents(docs)
+    assert [c.page_content for c in chunks] == [c.page_content for c in expected]
+    assert all(c.metadata == {"source": "a"} and c.metadata is not docs[0].metadata for c in chunks)
+
+
+def test_overlap_larger_than_size_is_rejected():
+    with pytest.raises(ValueError):
+        MultiConfigSplitter("текст").split_offsets(10, 20)
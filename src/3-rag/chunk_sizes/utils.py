@@ -4,6 +4,8 @@ import bs4
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from multi_splitter import DEFAULT_SEPARATORS
+
 
 def load_data_from_url(url):
     loader = WebBaseLoader(
@@ -25,9 +27,10 @@ def make_splitter(cfg):
     return RecursiveCharacterTextSplitter(
         chunk_size=cfg["chunk_size"],
         chunk_overlap=cfg["chunk_overlap"],
-        separators=["\n\n", "\n", ". ", " ", ""],
+        separators=DEFAULT_SEPARATORS,
     )
 
+
 def clean_wikipedia_text(text: str) -> str:
     """
     Specialized cleaning for Wikipedia text content.
@@ -1,41 +1,173 @@
+import io
+import itertools
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO, Union
+
 import pandas as pd
+from langchain_core.documents import Document
+
+
+# строка-разделитель markdown-таблиц: |---|:---:|
+SEPARATOR_ROW = r"^\s*:?-{3,}:?\s*$"
+
+
+def _detect_sep(first_line: str) -> str:
+    return '|' if '|' in first_line else '\t'
+
+
+def _parse_header(header_line: str, sep: str):
+    """Positions of non-empty header cells and their names ("| a | b |" has empty border cells)"""
+    cells = header_line.rstrip('\r\n').split(sep)
+    positions = [i for i, cell in enumerate(cells) if cell.strip()]
+    return len(cells), positions, [cells[i].strip() for i in positions]
+
+
+def _read_chunk(text: str, sep: str, width: int, positions: List[int]) -> pd.DataFrame:
+    """
+    Cells at the header's positions for a block of table lines
+
+    The C reader handles the common case; a block with ragged rows (fewer or
+    more cells than the header) is split line by line instead, so short rows
+    are padded with empty cells and extra cells are dropped.
+    """
+    try:
+        return pd.read_csv(
+            io.StringIO(text),
+            sep=sep,
+            header=None,
+            names=list(range(width)),
+            usecols=positions,
+            dtype=str,
+            na_filter=False,
+            skip_blank_lines=True,
+            quoting=3,  # csv.QUOTE_NONE: кавычки в ячейках — обычный текст
+            engine='c',
+        )
+    except ValueError:  # pd.errors.ParserError — тоже ValueError
+        lines = pd.Series(text.splitlines(), dtype=object)
+        lines = lines[lines.str.strip() != '']
+        return lines.str.split(sep, expand=True, regex=False).reindex(columns=positions)
+
+
+def _clean_frame(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Strip cells, name columns and drop markdown separator rows"""
+    df = df.fillna('').apply(lambda col: col.str.strip())
+    df.columns = columns
+    is_separator = df.apply(lambda col: col.str.match(SEPARATOR_ROW)).all(axis=1)
+    return df[~is_separator]
+
+
+def iter_table_frames(
+        source: Union[str, Path, TextIO],
+        chunksize: int = 10_000,
+        sep: Optional[str] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a pipe/tab table in DataFrame chunks without reading it whole
+
+    Args:
+        source: Path to a table file or an open text stream
+        chunksize: Rows per yielded DataFrame
+        sep: '|' or '\\t'; detected from the header line when None
+
+    Yields:
+        DataFrames with stripped string cells and the header's columns;
+        rows shorter than the header get empty cells, extra cells are dropped
+    """
+    handle = open(source, 'r', encoding='utf-8') if isinstance(source, (str, Path)) else source
+    try:
+        header_line = ''
+        while not header_line.strip():
+            header_line = handle.readline()
+            if not header_line:
+                return
+        sep = sep or _detect_sep(header_line)
+        width, positions, columns = _parse_header(header_line, sep)
+        while True:
+            lines = list(itertools.islice(handle, chunksize))
+            if not lines:
+                break
+            frame = _clean_frame(_read_chunk(''.join(lines), sep, width, positions), columns)
+            if len(frame):
+                yield frame
+    finally:
+        if handle is not source:
+            handle.close()
+
 
 def extract_table_as_dataframe(table_text: str) -> pd.DataFrame:
     """Преобразуем таблицу в DataFrame."""
-    lines = table_text.strip().split('\n')
-    rows = []
-    for line in lines:
-        if '|' in line:
-            row = [cell.strip() for cell in line.split('|') if cell.strip()]
-        else:
-            row = [cell.strip() for cell in line.split('\t') if cell.strip()]
-        if row:
-            rows.append(row)
-    if not rows:
+    frames = list(iter_table_frames(io.StringIO(table_text.strip())))
+    if not frames:
         return pd.DataFrame()
-    df = pd.DataFrame(rows[1:], columns=rows[0])
-    return df
+    return pd.concat(frames, ignore_index=True)
+
+
+def linearize_rows(df: pd.DataFrame) -> pd.Series:
+    """Row descriptions "col: value. col: value" built column by column (no per-row Python loop)"""
+    if df.empty:
+        return pd.Series([], dtype=object)
+    values = df.fillna('').astype(str)
+    text = f"{df.columns[0]}: " + values.iloc[:, 0]
+    for i, col in enumerate(df.columns[1:], 1):
+        text = text + f". {col}: " + values.iloc[:, i]
+    return text
+
 
 def table_as_string(df: pd.DataFrame) -> str:
     """Создаём описательный текст для каждой строки."""
     if df.empty:
         return ""
-    descriptions = []
-    for _, row in df.iterrows():
-        desc = ". ".join([f"{col}: {row[col]}" for col in df.columns])
-        descriptions.append(desc)
-    return "\n".join(descriptions)
+    return "\n".join(linearize_rows(df).tolist())
+
 
+def table_to_documents(
+        source: Union[str, Path, TextIO],
+        rows_per_doc: int = 50,
+        metadata: Optional[Dict] = None,
+        chunksize: int = 10_000,
+) -> Iterator[Document]:
+    """
+    Ingest a large table as row-group Documents ready for chunking
 
-table_example = """
+    Each Document holds the linearized text of rows_per_doc consecutive rows;
+    metadata carries the column names and the row range.
+    """
+    metadata = metadata or {}
+    row_offset = 0
+    for frame in iter_table_frames(source, chunksize=chunksize):
+        lines = linearize_rows(frame).tolist()
+        columns = [str(c) for c in frame.columns]
+        for start in range(0, len(lines), rows_per_doc):
+            group = lines[start:start + rows_per_doc]
+            yield Document(
+                page_content="\n".join(group),
+                metadata={
+                    **metadata,
+                    "content_type": "table",
+                    "columns": columns,
+                    "row_start": row_offset + start,
+                    "row_end": row_offset + start + len(group),
+                },
+            )
+        row_offset += len(lines)
+
+
+if __name__ == "__main__":
+    table_example = """
 | Продукт | Цена | Количество | Статус |
 | Ноутбук | 50000 | 5 | В наличии |
 | Монитор | 15000 | 3 | Ограничено |
 | Клавиатура | 5000 | 10 | В наличии |
 """
-df = extract_table_as_dataframe(table_example)
+    df = extract_table_as_dataframe(table_example)
+
+    print("📊 Структурированные данные:")
+    print(df.to_dict(orient='records'))
+    print("\n📝 Описательный текст:")
+    print(table_as_string(df))
 
-print("📊 Структурированные данные:")
-print(df.to_dict(orient='records'))
-print("\n📝 Описательный текст:")
-print(table_as_string(df))
+    print("\n📄 Документы по группам строк:")
+    for doc in table_to_documents(io.StringIO(table_example), rows_per_doc=2, metadata={"source": "example"}):
+        print(doc.metadata)
+        print(doc.page_content)
@@ -0,0 +1,238 @@
+"""
+Incremental eval-dataset generator
+
+Generates question/answer/facts examples for documents with an LLM and
+appends them to a JSONL dataset. Each record carries the SHA-256 of its
+document content, so a rerun only generates questions for new or changed
+documents. Short documents are packed several per request, requests run
+concurrently under a limit, and the response is parsed into Pydantic models;
+a group that fails to parse or whose request fails is split in half and
+retried, without holding a concurrency permit while it waits.
+"""
+
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field
+from langchain_core.documents import Document
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.common.json_cache import atomic_write_text, read_jsonl
+
+
+class QAExample(BaseModel):
+    """One generated question with its answer"""
+    question: str = Field(description="Question answered by the text", min_length=3)
+    answer: str = Field(description="Short exact answer based only on the text", min_length=1)
+    facts: List[str] = Field(description="Key facts from the text the retriever must find")
+
+
+class DocQuestions(BaseModel):
+    """Questions for one document of the request"""
+    doc_key: str = Field(description="Document key exactly as given in the request (e.g. d2)")
+    examples: List[QAExample] = Field(description="2-3 questions of different difficulty", min_length=1)
+
+
+class GeneratedBatch(BaseModel):
+    """Questions for every document of the request"""
+    documents: List[DocQuestions] = Field(description="One entry per document in the request")
+
+
+PROMPT = ChatPromptTemplate.from_template("""
+Ты – помощник, который придумывает вопросы по тексту.
+Для КАЖДОГО документа ниже сформулируй вопросы, на которые этот документ отвечает, и дай короткие точные ответы.
+
+Требования:
+- Сгенерируй 2–3 вопроса разной сложности по каждому документу.
+- Дай точные ответы, опираясь только на факты из документа.
+- Выдели список ключевых фактов, которые должен найти retriever.
+- Не придумывай информацию вне текста.
+- Указывай doc_key документа ровно так, как он дан.
+
+{format_instructions}
+
+Документы:
+{documents}
+""")
+
+
+def content_hash(doc: Document) -> str:
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def load_done_hashes(path: str) -> Set[str]:
+    """Content hashes already present in the dataset"""
+    return {record["doc_hash"] for record in read_jsonl(path) if "doc_hash" in record}
+
+
+def prune_dataset(path: str, keep_hashes: Set[str]) -> int:
+    """Drop records whose document is gone or changed; returns number of removed records"""
+    if not Path(path).exists():
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        total = sum(1 for line in f if line.strip())
+    kept = [record for record in read_jsonl(path) if record.get("doc_hash") in keep_hashes]
+    atomic_write_text(path, "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in kept))
+    return total - len(kept)
+
+
+def pack_documents(docs: List[Document], max_chars: int = 4000, max_docs: int = 8) -> List[List[int]]:
+    """Greedily pack document indices into groups under a character budget"""
+    groups, current, used = [], [], 0
+    for idx, doc in enumerate(docs):
+        size = len(doc.page_content)
+        if current and (used + size > max_chars or len(current) >= max_docs):
+            groups.append(current)
+            current, used = [], 0
+        current.append(idx)
+        used += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+class DatasetGenerator:
+    """Concurrent, batched question generation appended to a JSONL dataset"""
+
+    def __init__(
+            self,
+            llm,
+            dataset_path: str,
+            id_key: str = "id",
+            max_concurrency: int = 4,
+            max_chars: int = 4000,
+            max_docs: int = 8,
+    ):
+        """
+        Args:
+            llm: Chat model used for generation
+            dataset_path: JSONL file examples are appended to
+            id_key: Metadata key stored as ground_truth_doc_id
+            max_concurrency: Maximum number of requests in flight
+            max_chars: Character budget of documents packed into one request
+            max_docs: Maximum documents per request
+        """
+        self.llm = llm
+        self.dataset_path = dataset_path
+        self.id_key = id_key
+        self.max_concurrency = max_concurrency
+        self.max_chars = max_chars
+        self.max_docs = max_docs
+        self.parser = PydanticOutputParser(pydantic_object=GeneratedBatch)
+        self.chain = PROMPT.partial(format_instructions=self.parser.get_format_instructions()) | llm
+        self.model_name = getattr(llm, "model_name", None) or type(llm).__name__
+        self.stats = {"requests": 0, "splits": 0, "errors": 0, "failed_docs": 0, "examples": 0}
+
+    def _append(self, doc: Document, doc_hash: str, examples: List[QAExample]):
+        with open(self.dataset_path, "a", encoding="utf-8") as f:
+            for ex in examples:
+                record = {
+                    "doc_hash": doc_hash,
+                    "ground_truth_doc_id": doc.metadata.get(self.id_key),
+                    "question": ex.question,
+                    "answer": ex.answer,
+                    "facts": ex.facts,
+                    "model": self.model_name,
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stats["examples"] += len(examples)
+
+    async def _generate_group(
+            self,
+            docs: List[Document],
+            hashes: List[str],
+            indices: List[int],
+            semaphore: asyncio.Semaphore,
+    ):
+        """
+        Generate for a group under one semaphore permit per request
+
+        The permit covers only the LLM request itself. If the response cannot
+        be parsed or the request fails, the permit is released and the group
+        is split in half; documents the model skipped are retried one by one.
+        Each retry waits for its own permit, so retries never exceed
+        max_concurrency. A single document that still fails is counted and
+        skipped.
+        """
+        keys = {f"d{n}": idx for n, idx in enumerate(indices, 1)}
+        documents = "\n\n".join(f"[{key}]\n{docs[idx].page_content}" for key, idx in keys.items())
+        batch = None
+        async with semaphore:
+            self.stats["requests"] += 1
+            try:
+                response = await self.chain.ainvoke({"documents": documents})
+                batch = self.parser.parse(response.content)  # type: ignore
+            except OutputParserException:
+                pass
+            except Exception as e:
+                # ошибка API или сети не должна обрывать остальные группы
+                self.stats["errors"] += 1
+                print(f"⚠️  Запрос на {len(indices)} документов не удался ({type(e).__name__}: {e})")
+
+        if batch is None:
+            if len(indices) == 1:
+                print(f"⚠️  Не удалось получить вопросы для документа {docs[indices[0]].metadata}")
+                self.stats["failed_docs"] += 1
+                return
+            # разрешение семафора уже отпущено, половины встают в общую очередь
+            self.stats["splits"] += 1
+            middle = len(indices) // 2
+            await asyncio.gather(
+                self._generate_group(docs, hashes, indices[:middle], semaphore),
+                self._generate_group(docs, hashes, indices[middle:], semaphore),
+            )
+            return
+
+        answered = {item.doc_key: item.examples for item in batch.documents if item.doc_key in keys}
+        missing = [idx for key, idx in keys.items() if key not in answered]
+        for key, examples in answered.items():
+            idx = keys[key]
+            self._append(docs[idx], hashes[idx], examples)
+        if missing and len(indices) > 1:
+            # модель пропустила документы — спрашиваем о них отдельно
+            await asyncio.gather(*(self._generate_group(docs, hashes, [idx], semaphore) for idx in missing))
+        elif missing:
+            self.stats["failed_docs"] += 1
+
+    async def agenerate(self, docs: List[Document]) -> Dict[str, int]:
+        """
+        Generate examples for documents not yet in the dataset
+
+        Returns:
+            Stats: pending/skipped documents, requests, splits, failed requests,
+            failed documents, examples
+        """
+        hashes = [content_hash(doc) for doc in docs]
+        done = load_done_hashes(self.dataset_path)
+        # одинаковые документы генерируем один раз
+        pending = []
+        for i, h in enumerate(hashes):
+            if h not in done:
+                done.add(h)
+                pending.append(i)
+        pending_docs = [docs[i] for i in pending]
+        pending_hashes = [hashes[i] for i in pending]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        groups = pack_documents(pending_docs, max_chars=self.max_chars, max_docs=self.max_docs)
+        await asyncio.gather(*(
+            self._generate_group(pending_docs, pending_hashes, group, semaphore) for group in groups
+        ))
+        return {"pending": len(pending), "skipped": len(docs) - len(pending), **self.stats}
+
+    def generate(self, docs: List[Document]) -> Dict[str, int]:
+        """Synchronous wrapper around agenerate()"""
+        return asyncio.run(self.agenerate(docs))
+
+
+def load_dataset(path: str, doc_hashes: Optional[Set[str]] = None) -> List[Dict]:
+    """Read dataset records, optionally only for the given content hashes"""
+    return [
+        record for record in read_jsonl(path)
+        if doc_hashes is None or record.get("doc_hash") in doc_hashes
+    ]
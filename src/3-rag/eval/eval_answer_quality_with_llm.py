@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 load_dotenv()
 from langchain_openai import ChatOpenAI
 
+from src.common.llm_judge import LLMJudge
+
 MODEL = os.getenv("OPENAI_MODEL", "gpt-5")
 llm = ChatOpenAI(model_name=MODEL, temperature=0)
 
@@ -12,36 +14,25 @@ examples = [{"query": "Когда основана компания?", "answer":
 predictions = [{"query": "Когда основана компания?", "result": "Компания создана в 1999 году."},
                {"query": "Кто основатели?", "result": "Иван Иванов и Мария Петрова."}]
 
-def evaluate_qa_with_llm(query: str, prediction: str, reference: str) -> dict:
-    prompt = f"""Ты эксперт по оценке качества ответов.
-
-Вопрос: {query}
-Ожидаемый ответ: {reference}
-Полученный ответ: {prediction}
-
-Оцени, насколько полученный ответ соответствует ожидаемому по смыслу.
-Ответь ТОЛЬКО одним словом: CORRECT или INCORRECT"""
-
-    response = llm.invoke(prompt)
-    verdict = response.content.strip().upper()
-    score = 1.0 if verdict == "CORRECT" else 0.0
-    
-    return score, verdict
-
 print("=== Оценка с помощью LLM ===\n")
+# все пары оцениваются параллельно, не больше MAX_CONCURRENCY запросов одновременно;
+# вердикты кэшируются на диске, повторный запуск с теми же ответами не обращается к LLM
+MAX_CONCURRENCY = int(os.getenv("JUDGE_MAX_CONCURRENCY", "8"))
+judge = LLMJudge(llm, max_concurrency=MAX_CONCURRENCY)
+results = judge.judge_many([
+    {"query": example["query"], "prediction": prediction["result"], "reference": example["answer"]}
+    for example, prediction in zip(examples, predictions)
+])
+
 scores_llm = []
-for example, prediction in zip(examples, predictions):
-    score, verdict = evaluate_qa_with_llm(
-        query=example["query"],
-        prediction=prediction["result"],
-        reference=example["answer"]
-    )
-    scores_llm.append(score)
+for example, prediction, (score, verdict) in zip(examples, predictions, results):
+    if score is not None:
+        scores_llm.append(score)
     print(f"Вопрос: {example['query']}")
     print(f"Полученный ответ: {prediction['result']}")
     print(f"Ожидаемый ответ: {example['answer']}")
     print(f"Оценка: {score} ({verdict})\n")
 
-avg_score_llm = sum(scores_llm) / len(scores_llm)
+print(f"💾 Кэш вердиктов: {judge.hits} попаданий, {judge.misses} запросов к LLM")
+avg_score_llm = sum(scores_llm) / len(scores_llm) if scores_llm else 0.0
 print(f"Средняя оценка (LLM): {avg_score_llm:.2f}")
-
@@ -0,0 +1,234 @@
+"""
+Sharded, resumable RAGAS evaluation runner
+
+Streams the eval dataset (JSONL or Parquet) in shards, evaluates several
+shards concurrently with ragas.aevaluate and appends per-sample metric results
+to a checkpoint JSONL as soon as a shard finishes. A rerun skips samples that
+are already in the checkpoint, so an interrupted evaluation resumes where it
+stopped; a sample with any failed (NaN) metric is not checkpointed and is
+evaluated again on the next run. The final scores are aggregated from the
+checkpoint.
+
+Each sample needs user_input, response, retrieved_contexts and reference;
+sample_id is optional (a content hash is used otherwise).
+"""
+
+import asyncio
+import json
+import math
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+import click
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from ragas import aevaluate
+from ragas.dataset_schema import EvaluationDataset
+from ragas.metrics import AnswerRelevancy, ContextRecall, Faithfulness
+from ragas.run_config import RunConfig
+
+from src.common.json_cache import hash_parts, read_jsonl
+
+
+SAMPLE_FIELDS = ["user_input", "response", "retrieved_contexts", "reference"]
+RESULTS_FILE = "results.jsonl"
+
+
+def sample_id(sample: Dict) -> str:
+    """Explicit sample_id or a hash of the evaluated fields"""
+    if sample.get("sample_id") is not None:
+        return str(sample["sample_id"])
+    return hash_parts(*(sample.get(f) for f in SAMPLE_FIELDS))[:16]
+
+
+def iter_samples(path: str, batch_size: int = 1024) -> Iterator[Dict]:
+    """Stream samples from a JSONL or Parquet file without loading it whole"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq  # pyarrow нужен только для Parquet
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            for row in batch.to_pylist():
+                if isinstance(row.get("retrieved_contexts"), tuple):
+                    row["retrieved_contexts"] = list(row["retrieved_contexts"])
+                yield row
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_shards(samples: Iterator[Dict], shard_size: int, skip: Set[str]) -> Iterator[List[Dict]]:
+    """Group samples not yet in the checkpoint into shards"""
+    shard = []
+    for sample in samples:
+        sid = sample_id(sample)
+        if sid in skip:
+            continue
+        shard.append({**sample, "sample_id": sid})
+        if len(shard) >= shard_size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
+
+def _clean(value):
+    # NaN не сериализуется в стандартный JSON
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+class RagasRunner:
+    """Evaluates a dataset shard by shard with a per-sample checkpoint"""
+
+    def __init__(
+            self,
+            metrics: List,
+            llm,
+            embeddings=None,
+            checkpoint_dir: str = ".cache/ragas",
+            shard_size: int = 50,
+            shard_concurrency: int = 2,
+            max_workers: int = 16,
+            timeout: int = 180,
+    ):
+        """
+        Args:
+            metrics: RAGAS metric instances
+            llm: LLM for the metrics
+            embeddings: Embeddings for the metrics that need them
+            checkpoint_dir: Directory of the per-sample results file
+            shard_size: Samples per aevaluate() call
+            shard_concurrency: Shards evaluated at the same time
+            max_workers: RAGAS workers (concurrent metric jobs) per shard
+            timeout: Timeout of one RAGAS operation in seconds
+        """
+        self.metrics = metrics
+        self.llm = llm
+        self.embeddings = embeddings
+        self.checkpoint_path = Path(checkpoint_dir) / RESULTS_FILE
+        self.shard_size = shard_size
+        self.shard_concurrency = shard_concurrency
+        self.run_config = RunConfig(max_workers=max_workers, timeout=timeout)
+        self.stats = {"shards": 0, "failed_shards": 0, "evaluated": 0, "incomplete": 0, "skipped": 0}
+
+    def done_ids(self) -> Set[str]:
+        """Ids of samples already in the checkpoint"""
+        return {r["sample_id"] for r in self.load_results()}
+
+    def load_results(self) -> List[Dict]:
+        return list(read_jsonl(self.checkpoint_path))
+
+    def _checkpoint(self, rows: List[Dict]):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _evaluate_shard(self, shard: List[Dict]):
+        dataset = EvaluationDataset.from_list([{f: s[f] for f in SAMPLE_FIELDS} for s in shard])
+        result = await aevaluate(
+            dataset=dataset,
+            metrics=self.metrics,
+            llm=self.llm,
+            embeddings=self.embeddings,
+            run_config=self.run_config,
+            show_progress=False,
+        )
+        rows = []
+        for sample, scores in zip(shard, result.scores):
+            scores = {name: _clean(value) for name, value in scores.items()}
+            # сэмплы, где упала хоть одна метрика, не сохраняем — их пересчитает следующий запуск
+            if any(value is None for value in scores.values()):
+                self.stats["incomplete"] += 1
+                continue
+            rows.append({"sample_id": sample["sample_id"], **scores})
+        self._checkpoint(rows)
+        self.stats["evaluated"] += len(rows)
+
+    async def arun(self, path: str):
+        """Evaluate all samples of path that are not in the checkpoint yet"""
+        done = self.done_ids()
+        semaphore = asyncio.Semaphore(self.shard_concurrency)
+        tasks = set()
+
+        async def run(number, shard):
+            async with semaphore:
+                try:
+                    await self._evaluate_shard(shard)
+                    print(f"✅ Шард {number}: {len(shard)} сэмплов")
+                except Exception as e:
+                    self.stats["failed_shards"] += 1
+                    print(f"❌ Шард {number} не оценён ({e}), будет пересчитан при следующем запуске")
+
+        total = 0
+        for number, shard in enumerate(iter_shards(iter_samples(path), self.shard_size, done), 1):
+            total += len(shard)
+            self.stats["shards"] += 1
+            tasks.add(asyncio.create_task(run(number, shard)))
+            # не держим в памяти больше шардов, чем можем оценивать одновременно
+            if len(tasks) >= self.shard_concurrency * 2:
+                _, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if tasks:
+            await asyncio.wait(tasks)
+        self.stats["skipped"] = len(done)
+        return self.stats
+
+    def run(self, path: str):
+        """Synchronous wrapper around arun()"""
+        return asyncio.run(self.arun(path))
+
+    def aggregate(self, ids: Optional[Set[str]] = None) -> Dict[str, float]:
+        """Mean of every metric over checkpointed samples (missing values ignored)"""
+        sums: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        for row in self.load_results():
+            if ids is not None and row["sample_id"] not in ids:
+                continue
+            for name, value in row.items():
+                if name == "sample_id" or value is None:
+                    continue
+                sums[name] = sums.get(name, 0.0) + value
+                counts[name] = counts.get(name, 0) + 1
+        return {name: sums[name] / counts[name] for name in sums}
+
+
+@click.command()
+@click.argument("dataset", type=click.Path(exists=True))
+@click.option("--checkpoint-dir", default=".cache/ragas", show_default=True)
+@click.option("--shard-size", default=50, show_default=True, help="Samples per shard")
+@click.option("--shard-concurrency", default=2, show_default=True, help="Shards evaluated at once")
+@click.option("--max-workers", default=16, show_default=True, help="RAGAS workers per shard")
+def main(dataset, checkpoint_dir, shard_size, shard_concurrency, max_workers):
+    """Evaluate DATASET (.jsonl or .parquet) with RAGAS, resuming from the checkpoint."""
+    load_dotenv()
+    ragas_llm = ChatOpenAI(
+        model=os.getenv("OPENROUTER_MODEL", "x-ai/grok-code-fast-1"),
+        base_url="https://openrouter.ai/api/v1",
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        temperature=0,
+    )
+    runner = RagasRunner(
+        metrics=[Faithfulness(), AnswerRelevancy(), ContextRecall()],
+        llm=ragas_llm,
+        checkpoint_dir=checkpoint_dir,
+        shard_size=shard_size,
+        shard_concurrency=shard_concurrency,
+        max_workers=max_workers,
+    )
+    stats = runner.run(dataset)
+    print(f"\nШардов: {stats['shards']}, оценено сэмплов: {stats['evaluated']}, "
+          f"из чекпоинта: {stats['skipped']}, неудачных шардов: {stats['failed_shards']}")
+    if stats["incomplete"]:
+        print(f"⚠️ У {stats['incomplete']} сэмплов не посчитались все метрики, они будут пересчитаны при следующем запуске")
+
+    ids = {sample_id(s) for s in iter_samples(dataset)}
+    print("\n=== Результаты RAGAS ===")
+    for name, value in runner.aggregate(ids).items():
+        print(f"{name}: {value:.3f}")
+
+
+if __name__ == "__main__":
+    main()
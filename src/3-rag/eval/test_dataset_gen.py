@@ -0,0 +1,73 @@
+import asyncio
+import json
+import re
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+from dataset_gen import DatasetGenerator, load_dataset
+
+
+class FakeGenModel(Runnable):
+    """Модель-заглушка: на пакет больше max_docs документов отвечает битым JSON, на документ со 'сбой' падает"""
+
+    model_name = "fake-gen"
+
+    def __init__(self, max_docs: int = 2, delay: float = 0.01):
+        self.max_docs = max_docs
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        raise NotImplementedError
+
+    async def ainvoke(self, input, config=None, **kwargs) -> AIMessage:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            docs = re.findall(r"\[(d\d+)\]\n(.+)", input.to_string())
+            if any("сбой" in text for _, text in docs):
+                raise ConnectionError("provider unavailable")
+            if len(docs) > self.max_docs:
+                return AIMessage(content="Извините, не могу ответить в JSON")
+            return AIMessage(content=json.dumps({"documents": [
+                {"doc_key": key, "examples": [{"question": f"О чём: {text}?", "answer": text, "facts": [text]}]}
+                for key, text in docs
+            ]}, ensure_ascii=False))
+        finally:
+            self.in_flight -= 1
+
+
+def make_docs(n: int):
+    return [Document(page_content=f"документ {i}", metadata={"id": i}) for i in range(n)]
+
+
+def test_splits_stay_under_max_concurrency(tmp_path):
+    llm = FakeGenModel(max_docs=1)
+    generator = DatasetGenerator(llm, str(tmp_path / "dataset.jsonl"), max_concurrency=2, max_docs=8)
+    stats = generator.generate(make_docs(16))
+    # каждый пакет из 8 документов делится до одиночных запросов
+    assert llm.max_in_flight <= 2
+    assert stats["splits"] > 0
+    assert (stats["examples"], stats["failed_docs"]) == (16, 0)
+    assert sorted(r["ground_truth_doc_id"] for r in load_dataset(str(tmp_path / "dataset.jsonl"))) == list(range(16))
+
+
+def test_failed_request_does_not_abort_other_groups(tmp_path):
+    docs = make_docs(6)
+    docs[4] = Document(page_content="сбой", metadata={"id": 4})
+    path = str(tmp_path / "dataset.jsonl")
+    stats = DatasetGenerator(FakeGenModel(), path, max_concurrency=3, max_docs=2).generate(docs)
+    assert stats["errors"] >= 1
+    assert (stats["examples"], stats["failed_docs"]) == (5, 1)
+    assert sorted(r["ground_truth_doc_id"] for r in load_dataset(path)) == [0, 1, 2, 3, 5]
+
+    # на повторе спрашиваем только о документе, который не удался
+    llm = FakeGenModel()
+    stats = DatasetGenerator(llm, path).generate(docs)
+    assert (stats["pending"], llm.calls) == (1, 1)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+pytest.importorskip("ragas")
+
+import ragas_runner
+from ragas_runner import RagasRunner
+
+
+class FakeDataset:
+    def __init__(self, samples):
+        self.samples = samples
+
+    @classmethod
+    def from_list(cls, samples):
+        return cls(samples)
+
+
+def fake_aevaluate(failing: set, calls: list):
+    """aevaluate-заглушка: для вопросов из failing метрика answer_relevancy — NaN"""
+
+    async def aevaluate(dataset, **kwargs):
+        calls.append([s["user_input"] for s in dataset.samples])
+
+        class Result:
+            scores = [
+                {"faithfulness": 1.0, "answer_relevancy": float("nan") if s["user_input"] in failing else 0.5}
+                for s in dataset.samples
+            ]
+
+        return Result()
+
+    return aevaluate
+
+
+def write_dataset(path, questions):
+    path.write_text("".join(
+        json.dumps({"user_input": q, "response": "r", "retrieved_contexts": ["c"], "reference": "r"},
+                   ensure_ascii=False) + "\n"
+        for q in questions
+    ), encoding="utf-8")
+
+
+def test_sample_with_failed_metric_is_evaluated_again(tmp_path, monkeypatch):
+    dataset = tmp_path / "dataset.jsonl"
+    write_dataset(dataset, ["a", "b", "c"])
+    monkeypatch.setattr(ragas_runner, "EvaluationDataset", FakeDataset)
+    calls = []
+
+    monkeypatch.setattr(ragas_runner, "aevaluate", fake_aevaluate({"b"}, calls))
+    runner = RagasRunner(metrics=[], llm=None, checkpoint_dir=str(tmp_path / "ckpt"), shard_size=2)
+    stats = runner.run(str(dataset))
+    assert (stats["evaluated"], stats["incomplete"]) == (2, 1)
+    assert all(None not in row.values() for row in runner.load_results())
+
+    monkeypatch.setattr(ragas_runner, "aevaluate", fake_aevaluate(set(), calls))
+    runner = RagasRunner(metrics=[], llm=None, checkpoint_dir=str(tmp_path / "ckpt"), shard_size=2)
+    stats = runner.run(str(dataset))
+    # повтор оценивает только сэмпл с упавшей метрикой
+    assert calls[-1] == ["b"]
+    assert (stats["evaluated"], stats["incomplete"], stats["skipped"]) == (1, 0, 2)
+    assert runner.aggregate() == {"faithfulness": 1.0, "answer_relevancy": 0.5}
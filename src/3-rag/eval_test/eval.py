@@ -5,84 +5,32 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_openai import ChatOpenAI
 
 from eval_data import documents, ground_truth_docs, golden_vs_predicted_answers
+from retrieval_metrics import evaluate_retrieval, print_report
+from src.common.llm_judge import DEFAULT_CACHE_DIR as JUDGE_CACHE_DIR, LLMJudge
 
 
-def precision_at_k(retriever, k: int) -> float:
-    precision_total = 0
-    for question, true_docs in ground_truth_docs.items():
-        found_docs = retriever.invoke(question)
-        found_ids = [d.metadata["source"] for d in found_docs[:k]]
-        relevant_found = sum(1 for doc_id in true_docs if doc_id in found_ids)
-        precision = relevant_found / k
-        precision_total += precision
+def evaluate_faithfulness(llm, cache_dir: str = JUDGE_CACHE_DIR, max_concurrency: int = 8) -> float:
+    judge = LLMJudge(llm, cache_dir=cache_dir, max_concurrency=max_concurrency)
+    items = [
+        {"query": query, "prediction": answers["predicted"], "reference": answers["golden"]}
+        for query, answers in golden_vs_predicted_answers.items()
+    ]
+    results = judge.judge_many(items)
 
-        print(f"Вопрос: {question}")
-        print(f"  Эталонные документы: {true_docs}")
-        print(f"  Найденные документы: {found_ids}")
-        print(f"  Precision@{k}: {precision:.2f}\n")
-
-    avg_precision = precision_total / len(ground_truth_docs)
-    
-    return avg_precision
-
-
-def recall_at_k(retriever, k: int) -> float:
-    recall_total = 0
-    for question, true_docs in ground_truth_docs.items():
-        found_docs = retriever.invoke(question)
-        found_ids = [d.metadata["source"] for d in found_docs[:k]]
-        relevant_found = sum(1 for doc_id in true_docs if doc_id in found_ids)
-        recall = relevant_found / len(true_docs) if true_docs else 0
-        recall_total += recall
-
-        print(f"Вопрос: {question}")
-        print(f"  Эталонные документы: {true_docs}")
-        print(f"  Найденные документы: {found_ids}")
-        print(f"  Recall@{k}: {recall:.2f} ({relevant_found}/{len(true_docs)})\n")
-
-    avg_recall = recall_total / len(ground_truth_docs)
-    
-    return avg_recall
-
-
-def evaluate_qa_with_llm(
-        llm: ChatOpenAI, 
-        query: str, 
-        prediction: str, 
-        reference: str
-) -> tuple[float, str]:
-    prompt = f"""Ты эксперт по оценке качества ответов.
-
-Вопрос: {query}
-Ожидаемый ответ: {reference}
-Полученный ответ: {prediction}
-
-Оцени, насколько полученный ответ соответствует ожидаемому по смыслу.
-Ответь ТОЛЬКО одним словом: CORRECT или INCORRECT"""
-
-    response = llm.invoke(prompt)
-    verdict = response.content.strip().upper() # type: ignore
-    score = 1.0 if verdict == "CORRECT" else 0.0
-    
-    return score, verdict
-
-
-def evaluate_faithfulness(llm) -> float:    
     scores_llm = []
-    for query, answers in golden_vs_predicted_answers.items():
-        score, verdict = evaluate_qa_with_llm(
-            llm=llm,
-            query=query,
-            prediction=answers["predicted"],
-            reference=answers["golden"],                    
-        )
-        scores_llm.append(score)
-        print(f"Вопрос: {query}")
-        print(f"Ожидаемый ответ: {answers['golden']}")
-        print(f"Полученный ответ: {answers['predicted']}")
+    for item, (score, verdict) in zip(items, results):
+        # неудавшаяся оценка не входит в среднее
+        if score is not None:
+            scores_llm.append(score)
+        print(f"Вопрос: {item['query']}")
+        print(f"Ожидаемый ответ: {item['reference']}")
+        print(f"Полученный ответ: {item['prediction']}")
         print(f"Оценка: {score} ({verdict})\n")
 
-    avg_score_llm = sum(scores_llm) / len(scores_llm)
+    print(f"💾 Кэш вердиктов: {judge.hits} попаданий, {judge.misses} запросов к LLM")
+    if judge.errors:
+        print(f"❌ Не удалось оценить: {judge.errors} из {len(items)}")
+    avg_score_llm = sum(scores_llm) / len(scores_llm) if scores_llm else 0.0
 
     return avg_score_llm
 
@@ -91,19 +39,17 @@ def evaluate_faithfulness(llm) -> float:
 
 if __name__ == "__main__":
 
-    K = 2
+    KS = [1, 2, 3, 5]
 
-    # make retriever
+    # make vector store
     embed_model = HuggingFaceEmbeddings(model_name="cointegrated/rubert-tiny2")
     vector_store = FAISS.from_documents(documents, embed_model)
-    retriever = vector_store.as_retriever(search_kwargs={"k": K})
 
-    # evaluate
-    avg_precision = precision_at_k(retriever, k=K)
-    avg_recall = precision_at_k(retriever, k=K)
-    
-    print(f"Средняя Precision@{avg_precision}: {avg_precision:.2f}")
-    print(f"Средняя Recall@{avg_recall}: {avg_recall:.2f}")
+    # evaluate: один проход поиска на вопрос для всех k и всех метрик
+    print("=== Оценка поиска ===\n")
+    report = evaluate_retrieval(vector_store.similarity_search, ground_truth_docs, ks=KS)
+    print_report(report)
+    print()
 
 
     # evaluate llm
@@ -114,8 +60,7 @@ if __name__ == "__main__":
     llm = ChatOpenAI(
         model=model_name,
         api_key=api_key,
-        # base_url=api_url,
-        base_url="https://openrouter.ai/api/v1",
+        base_url=api_url or "https://openrouter.ai/api/v1",
         temperature=0,        
     )
 
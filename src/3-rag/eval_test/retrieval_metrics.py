@@ -0,0 +1,152 @@
+"""
+Single-retrieval metrics engine
+
+Retrieves once per question at the largest k, caches the ranked document ids
+and computes Precision@k, Recall@k, MRR@k, nDCG@k and HitRate@k for all
+requested k values at once with NumPy.
+
+A retrieved id counts as relevant only on its first occurrence in the
+ranking, so several chunks of the same source document are not counted twice.
+"""
+
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+METRICS = ["precision", "recall", "mrr", "ndcg", "hit_rate"]
+
+
+def retrieve_ranked_ids(
+        search: Callable[[str, int], List[Document]],
+        questions: Sequence[str],
+        max_k: int,
+        id_key: str = "source",
+) -> List[List[str]]:
+    """
+    Run retrieval exactly once per question
+
+    Args:
+        search: Function (question, k) -> ranked documents,
+            e.g. vector_store.similarity_search
+        questions: Questions to retrieve for
+        max_k: Largest k any metric needs
+        id_key: Metadata key used as document id
+
+    Returns:
+        Ranked ids per question
+    """
+    return [[d.metadata[id_key] for d in search(q, max_k)[:max_k]] for q in questions]
+
+
+def relevance_matrix(ranked_ids: List[List[str]], true_ids: List[List[str]], max_k: int) -> np.ndarray:
+    """Binary (questions x max_k) matrix, 1 where a new relevant id is retrieved"""
+    rel = np.zeros((len(ranked_ids), max_k), dtype=np.float64)
+    for q, (ids, truth) in enumerate(zip(ranked_ids, true_ids)):
+        truth = set(truth)
+        seen = set()
+        for r, doc_id in enumerate(ids[:max_k]):
+            if doc_id in truth and doc_id not in seen:
+                rel[q, r] = 1.0
+            seen.add(doc_id)
+    return rel
+
+
+def compute_metrics(rel: np.ndarray, n_true: np.ndarray, ks: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    Vectorized metrics for every question and k
+
+    Args:
+        rel: Relevance matrix from relevance_matrix()
+        n_true: Number of ground-truth ids per question
+        ks: k values (each <= rel.shape[1])
+
+    Returns:
+        Dict metric -> (questions x len(ks)) array
+    """
+    ks_arr = np.asarray(ks)
+    cols = ks_arr - 1
+    max_k = rel.shape[1]
+    n_true = np.asarray(n_true, dtype=np.float64)
+
+    hits = rel.cumsum(axis=1)[:, cols]
+
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+    dcg = (rel * discounts).cumsum(axis=1)[:, cols]
+    ideal = np.concatenate([[0.0], discounts.cumsum()])
+    ideal_len = np.minimum(n_true[:, None], ks_arr[None, :]).astype(int)
+    idcg = ideal[ideal_len]
+
+    # ранг первого релевантного документа (max_k + 1, если не найден)
+    any_rel = rel.any(axis=1)
+    first_rank = np.where(any_rel, rel.argmax(axis=1) + 1, max_k + 1)
+    mrr = np.where(first_rank[:, None] <= ks_arr[None, :], 1.0 / first_rank[:, None], 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recall = np.where(n_true[:, None] > 0, hits / n_true[:, None], 0.0)
+        ndcg = np.where(idcg > 0, dcg / idcg, 0.0)
+
+    return {
+        "precision": hits / ks_arr[None, :],
+        "recall": recall,
+        "mrr": mrr,
+        "ndcg": ndcg,
+        "hit_rate": (hits > 0).astype(np.float64),
+    }
+
+
+def evaluate_retrieval(
+        search: Callable[[str, int], List[Document]],
+        ground_truth: Dict[str, List[str]],
+        ks: Sequence[int] = (1, 2, 3, 5),
+        id_key: str = "source",
+) -> Dict:
+    """
+    Evaluate retrieval for many k values with one retrieval pass
+
+    Returns:
+        Report dict:
+            "ks": list of k,
+            "summary": {k: {metric: mean over questions}},
+            "per_question": [{"question", "true_ids", "ranked_ids", "metrics": {k: {metric: value}}}]
+    """
+    ks = sorted(set(ks))
+    questions = list(ground_truth)
+    true_ids = [ground_truth[q] for q in questions]
+    max_k = ks[-1]
+
+    ranked_ids = retrieve_ranked_ids(search, questions, max_k, id_key=id_key)
+    rel = relevance_matrix(ranked_ids, true_ids, max_k)
+    metrics = compute_metrics(rel, np.array([len(t) for t in true_ids]), ks)
+
+    summary = {
+        k: {name: float(values[:, j].mean()) for name, values in metrics.items()}
+        for j, k in enumerate(ks)
+    }
+    per_question = [
+        {
+            "question": q,
+            "true_ids": true_ids[i],
+            "ranked_ids": ranked_ids[i],
+            "metrics": {k: {name: float(values[i, j]) for name, values in metrics.items()} for j, k in enumerate(ks)},
+        }
+        for i, q in enumerate(questions)
+    ]
+    return {"ks": ks, "summary": summary, "per_question": per_question}
+
+
+def print_report(report: Dict, show_questions: bool = True):
+    """Print per-question rankings and the summary table"""
+    if show_questions:
+        for item in report["per_question"]:
+            print(f"Вопрос: {item['question']}")
+            print(f"  Эталонные документы: {item['true_ids']}")
+            print(f"  Найденные документы: {item['ranked_ids']}")
+            first_rank = next((r for r, d in enumerate(item['ranked_ids'], 1) if d in item['true_ids']), None)
+            print(f"  Первый релевантный на позиции: {first_rank if first_rank else '—'}\n")
+
+    print(f"{'k':>3s} | " + " | ".join(f"{m:>9s}" for m in METRICS))
+    for k in report["ks"]:
+        row = report["summary"][k]
+        print(f"{k:3d} | " + " | ".join(f"{row[m]:9.3f}" for m in METRICS))
@@ -0,0 +1,251 @@
+"""
+Synthetic large-corpus retrieval benchmark
+
+eval_data.py is far too small to show scaling behaviour, so this script
+mutates and templates the tea documents into a corpus of any size (10k-1M
+chunks) with known question -> source mappings. Generation is fully offline
+and deterministic for a fixed seed. For each corpus size it reports build
+time, index/docstore memory, query throughput and Precision/Recall/MRR/nDCG@k.
+
+By default texts are embedded with HashingEmbeddings (hashed word stems, no
+model download), so the benchmark runs on any machine; --embeddings hf uses
+the same rubert-tiny2 model as eval.py.
+"""
+
+import json
+import pickle
+import random
+import resource
+import time
+import zlib
+from typing import Dict, List, Tuple
+
+import click
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from retrieval_metrics import METRICS, compute_metrics, relevance_matrix
+
+
+TEA_TYPES = ["пуэр", "улун", "зелёный чай", "белый чай", "красный чай", "жёлтый чай"]
+PROVINCES = ["Юньнань", "Фуцзянь", "Чжэцзян", "Аньхой", "Сычуань", "Гуандун", "Хунань", "Гуйчжоу"]
+SYLLABLES = ["ба", "бай", "ван", "гу", "да", "дань", "жу", "лао", "лун", "мэй", "нин", "пао",
+             "сян", "тай", "те", "фэн", "хоу", "хун", "цзин", "ци", "чжу", "шань", "шэн", "юй"]
+
+# шаблоны фактов: {name}, {tea}, {province}, {age}, {flavor}
+FACT_TEMPLATES = [
+    "{name} — {tea} из провинции {province}, которому может быть {age} лет.",
+    "{name} собирают в провинции {province}: это {tea} с нотами {flavor}.",
+    "Говорят, {name} пили на завтрак драконы провинции {province}. {tea_cap} с ароматом {flavor}.",
+    "{name} — самый ленивый {tea}: почки сушат {age} дней, и он готов.",
+]
+FLAVORS = ["мёда", "сухофруктов", "орехов", "цветов", "дыма", "хлеба", "шоколада", "трав"]
+
+QUESTION_TEMPLATES = [
+    "Из какой провинции {name}?",
+    "Что за чай {name}?",
+    "Какой вкус у чая {name}?",
+    "Расскажи про {name}",
+]
+
+
+def _variety_name(index: int, rng: random.Random) -> str:
+    """Unique pseudo-Chinese variety name: random prefix + syllables encoding the index"""
+    parts = [rng.choice(SYLLABLES)]
+    n = index
+    while True:
+        parts.append(SYLLABLES[n % len(SYLLABLES)])
+        n //= len(SYLLABLES)
+        if n == 0:
+            break
+    return " ".join(p.capitalize() for p in parts)
+
+
+def generate_corpus(
+        n_chunks: int,
+        base_documents: List[Document],
+        n_queries: int = 1000,
+        seed: int = 42,
+) -> Tuple[List[Document], Dict[str, List[str]]]:
+    """
+    Build a synthetic corpus and its ground truth
+
+    Every chunk is a templated fact about a unique variety followed by a
+    sentence of one of the base documents. Questions mention the variety
+    name, so the chunk's source is the single relevant document.
+
+    Returns:
+        (chunks, {question: [source]})
+    """
+    rng = random.Random(seed)
+    chunks = []
+    facts = []
+    for i in range(n_chunks):
+        base = base_documents[i % len(base_documents)]
+        tea = rng.choice(TEA_TYPES)
+        fact = {
+            "name": _variety_name(i, rng),
+            "tea": tea,
+            "tea_cap": tea.capitalize(),
+            "province": rng.choice(PROVINCES),
+            "age": rng.randint(3, 80),
+            "flavor": rng.choice(FLAVORS),
+        }
+        text = rng.choice(FACT_TEMPLATES).format(**fact) + " " + base.page_content
+        source = f"synthetic_{i:07d}.pdf"
+        chunks.append(Document(page_content=text, metadata={"source": source, "base": base.metadata.get("source")}))
+        facts.append(fact)
+
+    ground_truth: Dict[str, List[str]] = {}
+    for i in rng.sample(range(n_chunks), min(n_queries, n_chunks)):
+        question = rng.choice(QUESTION_TEMPLATES).format(**facts[i])
+        ground_truth[question] = [chunks[i].metadata["source"]]
+    return chunks, ground_truth
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic offline embeddings: hashed word stems and stem bigrams, L2-normalized"""
+
+    def __init__(self, dim: int = 256, stem: int = 5):
+        self.dim = dim
+        self.stem = stem
+        self.model_name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[int]:
+        words = ["".join(ch for ch in w if ch.isalnum())[:self.stem] for w in text.lower().split()]
+        words = [w for w in words if w]
+        grams = words + [a + " " + b for a, b in zip(words, words[1:])]
+        return [zlib.crc32(g.encode("utf-8")) % self.dim for g in grams]
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            np.add.at(matrix[row], self._features(text), 1.0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+def embed_matrix(embedding_model, texts: List[str], batch_size: int = 4096) -> np.ndarray:
+    """Embeddings of texts as one float32 matrix"""
+    if isinstance(embedding_model, HashingEmbeddings):
+        return np.vstack([embedding_model._embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+    return np.asarray(embedding_model.embed_documents(texts), dtype=np.float32)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux — килобайты
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_benchmark(
+        embedding_model,
+        n_chunks: int,
+        ks: List[int],
+        n_queries: int = 1000,
+        seed: int = 42,
+) -> Dict:
+    """Generate a corpus of n_chunks, index it and measure cost and quality"""
+    from eval_data import documents
+
+    start = time.perf_counter()
+    chunks, ground_truth = generate_corpus(n_chunks, documents, n_queries=n_queries, seed=seed)
+    generate_seconds = time.perf_counter() - start
+
+    texts = [c.page_content for c in chunks]
+    start = time.perf_counter()
+    vectors = embed_matrix(embedding_model, texts)
+    embed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    db = FAISS.from_embeddings(
+        text_embeddings=list(zip(texts, vectors)),
+        embedding=embedding_model,
+        metadatas=[c.metadata for c in chunks],
+    )
+    index_seconds = time.perf_counter() - start
+
+    # позиция в индексе совпадает с порядком чанков
+    sources = [c.metadata["source"] for c in chunks]
+    questions = list(ground_truth)
+    query_matrix = embed_matrix(embedding_model, questions)
+    max_k = max(ks)
+
+    start = time.perf_counter()
+    _, ids = db.index.search(query_matrix, max_k)
+    search_seconds = time.perf_counter() - start
+
+    ranked_ids = [[sources[i] for i in row if i != -1] for row in ids]
+    true_ids = [ground_truth[q] for q in questions]
+    rel = relevance_matrix(ranked_ids, true_ids, max_k)
+    metrics = compute_metrics(rel, np.array([len(t) for t in true_ids]), ks)
+
+    return {
+        "n_chunks": n_chunks,
+        "n_queries": len(questions),
+        "generate_seconds": generate_seconds,
+        "embed_seconds": embed_seconds,
+        "index_seconds": index_seconds,
+        "index_bytes": int(faiss.serialize_index(db.index).nbytes),
+        "docstore_bytes": len(pickle.dumps((db.docstore, db.index_to_docstore_id))),
+        "qps": len(questions) / search_seconds if search_seconds > 0 else float("inf"),
+        "peak_rss_mb": peak_rss_mb(),
+        "metrics": {
+            k: {name: float(values[:, j].mean()) for name, values in metrics.items()}
+            for j, k in enumerate(ks)
+        },
+    }
+
+
+def print_result(result: Dict):
+    print(f"\n📦 Корпус: {result['n_chunks']} чанков, {result['n_queries']} вопросов")
+    print(f"   генерация {result['generate_seconds']:.2f}s | эмбеддинги {result['embed_seconds']:.2f}s | "
+          f"индекс {result['index_seconds']:.2f}s")
+    print(f"   индекс {result['index_bytes'] / 2**20:.1f}MB | docstore {result['docstore_bytes'] / 2**20:.1f}MB | "
+          f"пик RSS {result['peak_rss_mb']:.0f}MB | {result['qps']:.0f} запросов/с")
+    print(f"   {'k':>3s} | " + " | ".join(f"{m:>9s}" for m in METRICS))
+    for k, row in result["metrics"].items():
+        print(f"   {k:3d} | " + " | ".join(f"{row[m]:9.3f}" for m in METRICS))
+
+
+@click.command()
+@click.option("--sizes", default="10000,100000", show_default=True,
+              help="Comma-separated corpus sizes in chunks")
+@click.option("--queries", default=1000, show_default=True, help="Questions per corpus")
+@click.option("--ks", default="1,3,5,10", show_default=True, help="Comma-separated k values")
+@click.option("--seed", default=42, show_default=True)
+@click.option("--embeddings", type=click.Choice(["hashing", "hf"]), default="hashing", show_default=True,
+              help="hashing: offline hashed features; hf: cointegrated/rubert-tiny2")
+@click.option("--dim", default=256, show_default=True, help="Dimension of hashing embeddings")
+@click.option("--output", default=None, help="Write results to this JSON file")
+def main(sizes, queries, ks, seed, embeddings, dim, output):
+    """Benchmark retrieval on synthetic tea corpora of growing size."""
+    if embeddings == "hf":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedding_model = HuggingFaceEmbeddings(model_name="cointegrated/rubert-tiny2")
+    else:
+        embedding_model = HashingEmbeddings(dim=dim)
+
+    ks_list = sorted({int(k) for k in ks.split(",")})
+    results = []
+    for size in (int(s) for s in sizes.split(",")):
+        result = run_benchmark(embedding_model, size, ks_list, n_queries=queries, seed=seed)
+        print_result(result)
+        results.append(result)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Performance regression suite for tea guide search modes
+
+Runs bm25, semantic and hybrid search over a fixed query set and records
+cold-start time, index load time, per-query p50/p95/p99 latency, QPS under N
+threads, peak RSS and recall@k against exact (brute-force) search. Results are
+written to JSON; `compare` flags regressions against a saved baseline.
+
+Exact references per mode:
+    semantic: brute-force L2 over all vectors reconstructed from the FAISS index
+    bm25:     full BM25 scoring of every chunk
+    hybrid:   weighted reciprocal rank fusion of the two exact lists
+"""
+
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import click
+import numpy as np
+
+from tea_guide import HYBRID_BM25_WEIGHT, SEARCH_MODES, load_db, search
+
+
+BENCH_QUERIES = [
+    "гайвань",
+    "Железная богиня милосердия",
+    "как заваривать белый чай",
+    "температура воды для зеленого чая",
+    "пуэр шу и шен отличия",
+    "сколько раз можно заваривать улун",
+    "Да Хун Пао",
+    "Те Гуаньинь",
+    "Лунцзин",
+    "время заваривания черного чая",
+    "как хранить пуэр",
+    "чайная церемония гунфу ча",
+    "исинская глина",
+    "красный чай Дянь Хун",
+    "жёлтый чай Цзюнь Шань Инь Чжэнь",
+    "сколько чая класть на 100 мл",
+    "чем отличается белый чай от зеленого",
+    "ферментация чая",
+    "где растёт Те Гуаньинь",
+    "полезные свойства зеленого чая",
+]
+
+RRF_C = 60  # как в EnsembleRetriever
+
+# метрика -> направление: +1 больше = лучше, -1 меньше = лучше
+TRACKED_METRICS = {
+    "p50_ms": -1,
+    "p95_ms": -1,
+    "p99_ms": -1,
+    "qps": +1,
+    "recall_vs_exact": +1,
+}
+TRACKED_GLOBAL = {
+    "cold_start_seconds": -1,
+    "index_load_seconds": -1,
+    "peak_rss_mb": -1,
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux — килобайты, в macOS — байты
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if platform.system() == "Darwin" else rss / 1024
+
+
+def percentiles_ms(latencies: List[float]) -> Dict[str, float]:
+    ms = np.array(latencies) * 1000
+    return {f"p{p}_ms": float(np.percentile(ms, p)) for p in (50, 95, 99)}
+
+
+class ExactSearch:
+    """Brute-force reference rankings for every search mode"""
+
+    def __init__(self, vector_store, bm25_retriever):
+        self.vector_store = vector_store
+        self.bm25 = bm25_retriever
+        index = vector_store.index
+        self.vectors = index.reconstruct_n(0, index.ntotal)
+        self.contents = [
+            vector_store.docstore.search(vector_store.index_to_docstore_id[i]).page_content
+            for i in range(index.ntotal)
+        ]
+
+    def semantic(self, query: str, k: int) -> List[str]:
+        q = np.asarray(self.vector_store.embedding_function.embed_query(query), dtype=np.float32)
+        distances = ((self.vectors - q) ** 2).sum(axis=1)
+        return [self.contents[i] for i in np.argsort(distances, kind="stable")[:k]]
+
+    def bm25_ranked(self, query: str, k: int) -> List[str]:
+        scores = self.bm25.vectorizer.get_scores(self.bm25.preprocess_func(query))
+        # порядок при равных оценках тот же, что в BM25Okapi.get_top_n
+        return [self.bm25.docs[i].page_content for i in np.argsort(scores)[::-1][:k]]
+
+    def hybrid(self, query: str, k: int) -> List[str]:
+        rrf = defaultdict(float)
+        for ranked, weight in ((self.bm25_ranked(query, k), HYBRID_BM25_WEIGHT),
+                               (self.semantic(query, k), 1 - HYBRID_BM25_WEIGHT)):
+            for rank, content in enumerate(ranked, start=1):
+                rrf[content] += weight / (rank + RRF_C)
+        return sorted(rrf, key=rrf.get, reverse=True)[:k]
+
+    def ranked(self, mode: str, query: str, k: int) -> List[str]:
+        return {"semantic": self.semantic, "bm25": self.bm25_ranked, "hybrid": self.hybrid}[mode](query, k)
+
+
+def bench_mode(vector_store, bm25_retriever, exact: ExactSearch, mode: str,
+               queries: List[str], k: int, repeats: int, threads: int) -> Dict:
+    """Latency, throughput and recall vs exact search for one mode"""
+    # прогрев: первые запросы платят за ленивую инициализацию
+    search(vector_store, bm25_retriever, queries[0], k=k, mode=mode)
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            search(vector_store, bm25_retriever, query, k=k, mode=mode)
+            latencies.append(time.perf_counter() - start)
+
+    workload = queries * repeats
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda q: search(vector_store, bm25_retriever, q, k=k, mode=mode), workload))
+    qps = len(workload) / (time.perf_counter() - start)
+
+    recalls = []
+    for query in queries:
+        found = {doc.page_content for doc, _ in search(vector_store, bm25_retriever, query, k=k, mode=mode)}
+        reference = exact.ranked(mode, query, k)
+        recalls.append(len(found & set(reference)) / len(reference) if reference else 1.0)
+
+    return {
+        **percentiles_ms(latencies),
+        "qps": qps,
+        "threads": threads,
+        "recall_vs_exact": float(np.mean(recalls)),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure_cold_start() -> float:
+    """Wall time of a fresh interpreter that imports, loads indices and answers one query"""
+    code = (
+        "from tea_guide import load_db, search\n"
+        "vs, bm25 = load_db()\n"
+        f"search(vs, bm25, {BENCH_QUERIES[0]!r}, k=3, mode='hybrid')\n"
+    )
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+@click.group()
+def cli():
+    """Tea guide search benchmarks."""
+
+
+@cli.command()
+@click.option("--output", default="bench_results.json", show_default=True, help="Where to write results")
+@click.option("--k", default=3, show_default=True, help="Results per query")
+@click.option("--repeats", default=5, show_default=True, help="Passes over the query set")
+@click.option("--threads", default=4, show_default=True, help="Threads for the QPS measurement")
+@click.option("--modes", default=",".join(SEARCH_MODES), show_default=True, help="Comma-separated modes")
+@click.option("--no-cold-start", is_flag=True, help="Skip the cold-start subprocess")
+def run(output, k, repeats, threads, modes, no_cold_start):
+    """Run the benchmark and write results to JSON."""
+    results = {"k": k, "repeats": repeats, "queries": len(BENCH_QUERIES), "modes": {}}
+
+    if not no_cold_start:
+        results["cold_start_seconds"] = measure_cold_start()
+        print(f"🧊 Холодный старт: {results['cold_start_seconds']:.2f}s")
+
+    start = time.perf_counter()
+    vector_store, bm25_retriever = load_db()
+    results["index_load_seconds"] = time.perf_counter() - start
+    print(f"📂 Загрузка индексов: {results['index_load_seconds']:.2f}s")
+
+    exact = ExactSearch(vector_store, bm25_retriever)
+    for mode in modes.split(","):
+        stats = bench_mode(vector_store, bm25_retriever, exact, mode, BENCH_QUERIES, k, repeats, threads)
+        results["modes"][mode] = stats
+        print(f"⏱️  {mode:8s} | p50 {stats['p50_ms']:7.2f}ms | p95 {stats['p95_ms']:7.2f}ms | "
+              f"p99 {stats['p99_ms']:7.2f}ms | {stats['qps']:7.1f} QPS ({threads} потоков) | "
+              f"recall@{k} {stats['recall_vs_exact']:.3f}")
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    print(f"🧠 Пиковый RSS: {results['peak_rss_mb']:.0f}MB")
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результаты сохранены в {output}")
+
+
+def find_regressions(current: Dict, baseline: Dict, tolerance: float, recall_tolerance: float) -> List[str]:
+    """Human-readable list of metrics that got worse than the baseline allows"""
+    def worse(name, direction, new, old):
+        if new is None or old is None:
+            return False
+        if name == "recall_vs_exact":
+            return new < old - recall_tolerance
+        if direction < 0:
+            return new > old * (1 + tolerance)
+        return new < old * (1 - tolerance)
+
+    problems = []
+    for name, direction in TRACKED_GLOBAL.items():
+        new, old = current.get(name), baseline.get(name)
+        if worse(name, direction, new, old):
+            problems.append(f"{name}: {old:.3f} -> {new:.3f}")
+    for mode, old_stats in baseline.get("modes", {}).items():
+        new_stats = current.get("modes", {}).get(mode)
+        if new_stats is None:
+            problems.append(f"{mode}: отсутствует в текущих результатах")
+            continue
+        for name, direction in TRACKED_METRICS.items():
+            new, old = new_stats.get(name), old_stats.get(name)
+            if worse(name, direction, new, old):
+                problems.append(f"{mode}.{name}: {old:.3f} -> {new:.3f}")
+    return problems
+
+
+@cli.command()
+@click.argument("current", type=click.Path(exists=True))
+@click.argument("baseline", type=click.Path(exists=True))
+@click.option("--tolerance", default=0.2, show_default=True,
+              help="Allowed relative slowdown for latency/QPS/RSS/load times")
+@click.option("--recall-tolerance", default=0.01, show_default=True, help="Allowed absolute drop in recall")
+def compare(current, baseline, tolerance, recall_tolerance):
+    """Compare CURRENT results with BASELINE; exit code 1 on regression."""
+    with open(current, encoding="utf-8") as f:
+        current_results = json.load(f)
+    with open(baseline, encoding="utf-8") as f:
+        baseline_results = json.load(f)
+
+    problems = find_regressions(current_results, baseline_results, tolerance, recall_tolerance)
+    if problems:
+        print(f"❌ Найдены регрессии (допуск {tolerance:.0%}):")
+        for problem in problems:
+            print(f"   - {problem}")
+        sys.exit(1)
+    print("✅ Регрессий не найдено")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,323 @@
+"""
+Async concurrent web crawler loader.
+
+Обходит сайт начиная с seed URL-ов (в ширину, с ограничением глубины и домена),
+скачивает страницы через один общий пул соединений aiohttp и парсит их тем же
+способом, что и WebBaseLoader: `bs4.SoupStrainer` выбирает нужную часть страницы.
+Документы отдаются по мере загрузки страниц, поэтому цепочка обработки может
+начинать чистку/нарезку, не дожидаясь окончания обхода.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import aiohttp
+import bs4
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; stepic-lc-crawler/0.1)",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+}
+
+_DONE = object()
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve a (possibly relative) link and strip the fragment
+
+    Returns:
+        Absolute http(s) URL or None if the link should not be followed
+    """
+    if base is not None:
+        url = urljoin(base, url)
+    url, _ = urldefrag(url)
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    # "http://host" и "http://host/" — одна и та же страница
+    if parsed.path == "":
+        url = parsed._replace(path="/").geturl()
+    return url
+
+
+class HostThrottle:
+    """Per-host concurrency limit plus a minimal delay between request starts"""
+
+    def __init__(self, per_host_limit: int, delay: float):
+        self.per_host_limit = per_host_limit
+        self.delay = delay
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._next_slot: Dict[str, float] = {}
+
+    def _host_state(self, host: str) -> Tuple[asyncio.Semaphore, asyncio.Lock]:
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+            self._locks[host] = asyncio.Lock()
+            self._next_slot[host] = 0.0
+        return self._semaphores[host], self._locks[host]
+
+    async def wait_turn(self, host: str):
+        """Wait until the politeness delay for the host has passed"""
+        _, lock = self._host_state(host)
+        async with lock:
+            now = time.monotonic()
+            wait = self._next_slot[host] - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_slot[host] = max(now, self._next_slot[host]) + self.delay
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        return self._host_state(host)[0]
+
+
+class AsyncCrawlerLoader(BaseLoader):
+    """Crawls pages from seed URLs and streams them as Documents"""
+
+    def __init__(
+            self,
+            seed_urls: Iterable[str],
+            max_depth: int = 2,
+            max_pages: int = 200,
+            same_domain: bool = True,
+            allowed_prefixes: Optional[List[str]] = None,
+            bs_kwargs: Optional[dict] = None,
+            bs_get_text_kwargs: Optional[dict] = None,
+            max_connections: int = 20,
+            per_host_limit: int = 4,
+            delay: float = 0.5,
+            timeout: float = 30,
+            headers: Optional[dict] = None,
+            raise_for_status: bool = False,
+    ):
+        """
+        Initialize the crawler
+
+        Args:
+            seed_urls: URLs to start crawling from (depth 0)
+            max_depth: How many link hops to follow from the seeds
+            max_pages: Hard limit on the number of fetched pages
+            same_domain: Follow only links on the seed domains
+            allowed_prefixes: Follow only URLs starting with one of these prefixes
+            bs_kwargs: Kwargs for BeautifulSoup, e.g. {"parse_only": bs4.SoupStrainer(id="content")}
+            bs_get_text_kwargs: Kwargs for soup.get_text()
+            max_connections: Size of the shared connection pool (and number of workers)
+            per_host_limit: Max concurrent requests to a single host
+            delay: Min seconds between request starts to the same host
+            timeout: Total timeout per request in seconds
+            headers: HTTP headers for every request
+            raise_for_status: Raise on HTTP errors instead of skipping the page
+        """
+        self.seed_urls = [u for u in (normalize_url(s) for s in seed_urls) if u]
+        if not self.seed_urls:
+            raise ValueError("At least one valid http(s) seed URL is required")
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.same_domain = same_domain
+        self.allowed_prefixes = allowed_prefixes
+        self.bs_kwargs = bs_kwargs or {}
+        self.bs_get_text_kwargs = bs_get_text_kwargs or {}
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.delay = delay
+        self.timeout = timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self.raise_for_status = raise_for_status
+        self.allowed_hosts = {urlparse(u).netloc for u in self.seed_urls}
+        self.stats = {"fetched": 0, "failed": 0, "skipped": 0}
+
+    def should_follow(self, url: str) -> bool:
+        """Check domain and prefix restrictions for a discovered link"""
+        if self.same_domain and urlparse(url).netloc not in self.allowed_hosts:
+            return False
+        if self.allowed_prefixes and not any(url.startswith(p) for p in self.allowed_prefixes):
+            return False
+        return True
+
+    def parse_page(self, url: str, html: str, depth: int) -> Tuple[Document, List[str]]:
+        """
+        Parse HTML into a Document and a list of outgoing links
+
+        Text is extracted with the configured SoupStrainer (as in WebBaseLoader),
+        links are collected with a separate strainer for <a href> tags so
+        that restricting the content area does not hide navigation.
+        """
+        soup = bs4.BeautifulSoup(html, "html.parser", **self.bs_kwargs)
+        text = soup.get_text(**self.bs_get_text_kwargs)
+
+        links_soup = bs4.BeautifulSoup(
+            html, "html.parser", parse_only=bs4.SoupStrainer("a", href=True)
+        )
+        links = []
+        for a in links_soup.find_all("a", href=True):
+            link = normalize_url(a["href"], base=url)
+            if link:
+                links.append(link)
+
+        metadata = {"source": url, "depth": depth}
+        return Document(page_content=text, metadata=metadata), links
+
+    async def fetch(self, session: aiohttp.ClientSession, throttle: HostThrottle, url: str) -> Optional[str]:
+        """Fetch a single page respecting per-host limits. Returns None for non-HTML/failed pages"""
+        host = urlparse(url).netloc
+        async with throttle.semaphore(host):
+            await throttle.wait_turn(host)
+            try:
+                async with session.get(url) as response:
+                    if self.raise_for_status:
+                        response.raise_for_status()
+                    if response.status >= 400:
+                        self.stats["failed"] += 1
+                        return None
+                    content_type = response.headers.get("Content-Type", "")
+                    if "html" not in content_type:
+                        self.stats["skipped"] += 1
+                        return None
+                    return await response.text(errors="replace")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if self.raise_for_status:
+                    raise
+                self.stats["failed"] += 1
+                return None
+
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        """Crawl concurrently and yield Documents as soon as pages are parsed"""
+        frontier: asyncio.Queue = asyncio.Queue()
+        results: asyncio.Queue = asyncio.Queue()
+        seen = set(self.seed_urls)
+        for url in self.seed_urls:
+            frontier.put_nowait((url, 0))
+
+        throttle = HostThrottle(self.per_host_limit, self.delay)
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host_limit)
+        client_timeout = aiohttp.ClientTimeout(total=self.timeout)
+        scheduled = len(seen)
+
+        async def worker(session):
+            nonlocal scheduled
+            while True:
+                url, depth = await frontier.get()
+                try:
+                    html = await self.fetch(session, throttle, url)
+                    if html is None:
+                        continue
+                    doc, links = self.parse_page(url, html, depth)
+                    self.stats["fetched"] += 1
+                    await results.put(doc)
+                    if depth >= self.max_depth:
+                        continue
+                    for link in links:
+                        if scheduled >= self.max_pages:
+                            break
+                        if link in seen or not self.should_follow(link):
+                            continue
+                        seen.add(link)
+                        scheduled += 1
+                        frontier.put_nowait((link, depth + 1))
+                except Exception as e:
+                    await results.put(e)
+                finally:
+                    frontier.task_done()
+
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=client_timeout, headers=self.headers
+        ) as session:
+            workers = [asyncio.create_task(worker(session)) for _ in range(self.max_connections)]
+
+            async def close_when_done():
+                await frontier.join()
+                await results.put(_DONE)
+
+            closer = asyncio.create_task(close_when_done())
+            try:
+                while True:
+                    item = await results.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                closer.cancel()
+                for w in workers:
+                    w.cancel()
+                await asyncio.gather(closer, *workers, return_exceptions=True)
+
+    def lazy_load(self) -> Iterator[Document]:
+        """
+        Sync streaming interface for LoaderRunnable / chain.invoke
+
+        The event loop runs in a background thread and hands over Documents
+        through a queue, so the caller still gets pages as they arrive.
+        """
+        out: queue.Queue = queue.Queue(maxsize=self.max_connections * 2)
+        stop = threading.Event()
+
+        async def pump():
+            try:
+                async for doc in self.alazy_load():
+                    # блокирующий put уводим в поток, чтобы не останавливать воркеров
+                    await asyncio.to_thread(out.put, doc)
+                    if stop.is_set():
+                        return
+            except Exception as e:
+                out.put(e)
+            finally:
+                out.put(_DONE)
+
+        thread = threading.Thread(target=asyncio.run, args=(pump(),), daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # освобождаем место, если поток ждёт на полной очереди
+            while thread.is_alive():
+                try:
+                    out.get_nowait()
+                except queue.Empty:
+                    thread.join(timeout=0.1)
+
+
+if __name__ == "__main__":
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    loader = AsyncCrawlerLoader(
+        seed_urls=["https://docs.langchain.com/oss/python/langchain/overview"],
+        allowed_prefixes=["https://docs.langchain.com/oss/python/"],
+        max_depth=2,
+        max_pages=100,
+        bs_kwargs={"parse_only": bs4.SoupStrainer(id="content")},
+        per_host_limit=4,
+        delay=0.25,
+    )
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+
+    async def ingest():
+        start = time.perf_counter()
+        chunks = []
+        # нарезаем документы по мере поступления страниц
+        async for doc in loader.alazy_load():
+            doc_chunks = splitter.split_documents([doc])
+            chunks.extend(doc_chunks)
+            print(f"[{time.perf_counter() - start:6.2f}s] depth={doc.metadata['depth']} "
+                  f"чанков={len(doc_chunks):3d} {doc.metadata['source']}")
+        print(f"\nСтраниц: {loader.stats['fetched']}, ошибок: {loader.stats['failed']}, "
+              f"пропущено: {loader.stats['skipped']}, чанков: {len(chunks)}, "
+              f"время: {time.perf_counter() - start:.2f}s")
+
+    asyncio.run(ingest())
@@ -1,7 +1,9 @@
-from langchain_community.document_loaders import WebBaseLoader, PyMuPDFLoader
+from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_core.runnables import RunnableLambda
 import bs4
 
+from crawler_loader import AsyncCrawlerLoader
+
 
 class LoaderRunnable(RunnableLambda):
     """Wrapper to make loaders compatible with RunnableParallel"""
@@ -18,9 +20,12 @@ class LoaderRunnable(RunnableLambda):
 
 
 # Create loader runnables for each data source
+# max_depth=0 — только сама статья; увеличьте, чтобы обойти соседние статьи раздела
 load_html = LoaderRunnable(
-    WebBaseLoader(
-        web_paths=("https://tea-mail.by/stati-o-nas/kak-pravilno-zavarivat-kitayskiy-chay/",),
+    AsyncCrawlerLoader(
+        seed_urls=("https://tea-mail.by/stati-o-nas/kak-pravilno-zavarivat-kitayskiy-chay/",),
+        allowed_prefixes=["https://tea-mail.by/stati-o-nas/"],
+        max_depth=0,
         bs_kwargs={"parse_only": bs4.SoupStrainer(class_="post-info")}
     ),
     topic="brewing_guide",
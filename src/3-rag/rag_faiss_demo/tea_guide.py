@@ -146,38 +146,57 @@ def hybrid_search(vector_store: FAISS, bm25_retriever: BM25Retriever,
     docs = ensemble_retriever.invoke(query)
     return docs[:k]  # Return top k
 
-def db_lookup(vector_store: FAISS, bm25_retriever: BM25Retriever, 
-              query: str, k: int = 3, mode: str = 'hybrid', max_to_output: int = 700):
+SEARCH_MODES = ['bm25', 'semantic', 'hybrid']
+HYBRID_BM25_WEIGHT = 0.6
+
+
+def search(vector_store: FAISS, bm25_retriever: BM25Retriever,
+           query: str, k: int = 3, mode: str = 'hybrid'):
     """
-    Search with different modes
+    Search without printing anything
     
     Args:
         mode: 'hybrid' (default), 'semantic', 'bm25'
-    """
-    print(f"\n{'='*50} 🔍 ПОИСК {'='*50}")
-    print(f"📝 Запрос: {query}")
-    print(f"🎯 Режим: {mode.upper()}")
-    print(f"{'='*70}\n")
     
+    Returns:
+        List of (doc, score) tuples (score is None for bm25/hybrid)
+    """
     if mode == 'hybrid':
         # Hybrid: 60% BM25 + 40% semantic (favor keywords for tea names)
-        docs_found = hybrid_search(vector_store, bm25_retriever, query, k=k, bm25_weight=0.6)
+        docs_found = hybrid_search(vector_store, bm25_retriever, query, k=k, bm25_weight=HYBRID_BM25_WEIGHT)
         # Convert to list of (doc, None) tuples for consistent handling
-        docs_found = [(doc, None) for doc in docs_found]
+        return [(doc, None) for doc in docs_found]
         
     elif mode == 'bm25':
         # Pure keyword search
         bm25_retriever.k = k
         docs = bm25_retriever.invoke(query)
-        docs_found = [(doc, None) for doc in docs]
+        return [(doc, None) for doc in docs]
         
     elif mode == 'semantic':
         # Pure semantic search with scores
-        docs_found = vector_store.similarity_search_with_score(query, k=k)
+        return vector_store.similarity_search_with_score(query, k=k)
+
+    raise ValueError(f"Unknown search mode: {mode}")
+
+def db_lookup(vector_store: FAISS, bm25_retriever: BM25Retriever, 
+              query: str, k: int = 3, mode: str = 'hybrid', max_to_output: int = 700):
+    """
+    Search with different modes
     
-    else:
+    Args:
+        mode: 'hybrid' (default), 'semantic', 'bm25'
+    """
+    print(f"\n{'='*50} 🔍 ПОИСК {'='*50}")
+    print(f"📝 Запрос: {query}")
+    print(f"🎯 Режим: {mode.upper()}")
+    print(f"{'='*70}\n")
+    
+    if mode not in SEARCH_MODES:
         print(f"❌ Неизвестный режим: {mode}")
         return
+
+    docs_found = search(vector_store, bm25_retriever, query, k=k, mode=mode)
     
     # Display results
     for i, doc_tuple in enumerate(docs_found, 1):
@@ -226,7 +245,7 @@ def compare_modes(vector_store: FAISS, bm25_retriever: BM25Retriever, query: str
     print(f"📊 Для запроса: '{query}'")
     print(f"{'#'*70}")
     
-    for mode in ['bm25', 'semantic', 'hybrid']:
+    for mode in SEARCH_MODES:
         db_lookup(vector_store, bm25_retriever, query, k=2, mode=mode, max_to_output=700)
         if mode != 'hybrid':
             input("Нажмите Enter для следующего режима...")
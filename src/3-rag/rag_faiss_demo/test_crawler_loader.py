@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+from crawler_loader import AsyncCrawlerLoader
+
+
+class LocalSite:
+    """Локальный сайт-дерево: /page/N ссылается на /page/2N+1 и /page/2N+2, каждая страница отвечает с задержкой"""
+
+    def __init__(self, pages: int = 50, latency: float = 0.05):
+        self.pages = pages
+        self.latency = latency
+        self.requests = []  # (путь, время начала)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._ready = threading.Event()
+
+    async def handle_page(self, request: web.Request) -> web.Response:
+        n = int(request.match_info["n"])
+        self.requests.append((request.path, time.monotonic()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if n >= self.pages:
+            raise web.HTTPNotFound()
+        links = "".join(f'<a href="/page/{child}">page {child}</a>'
+                        for child in (2 * n + 1, 2 * n + 2) if child < self.pages)
+        html = f'<html><body><div id="content">Страница {n}</div><nav>{links}</nav></body></html>'
+        return web.Response(text=html, content_type="text/html")
+
+    def start(self) -> str:
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self._serve, daemon=True).start()
+        self._ready.wait(5)
+        return f"http://127.0.0.1:{self.port}/page/0"
+
+    def _serve(self):
+        asyncio.set_event_loop(self.loop)
+        app = web.Application()
+        app.router.add_get("/page/{n}", self.handle_page)
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture
+def site():
+    site = LocalSite()
+    site.seed = site.start()
+    yield site
+    site.stop()
+
+
+def test_crawls_site_breadth_first_within_depth(site):
+    loader = AsyncCrawlerLoader([site.seed], max_depth=2, delay=0)
+    docs = list(loader.lazy_load())
+    # глубина 2 в двоичном дереве: 1 + 2 + 4 страницы
+    assert sorted(doc.metadata["source"].rsplit("/", 1)[1] for doc in docs) == [str(n) for n in range(7)]
+    assert {doc.metadata["depth"] for doc in docs} == {0, 1, 2}
+    assert loader.stats == {"fetched": 7, "failed": 0, "skipped": 0}
+
+
+def test_max_pages_limits_requests(site):
+    loader = AsyncCrawlerLoader([site.seed], max_depth=10, max_pages=5, delay=0)
+    docs = list(loader.lazy_load())
+    assert len(docs) == 5
+    assert len(site.requests) == 5
+
+
+def test_per_host_limit_and_delay(site):
+    loader = AsyncCrawlerLoader([site.seed], max_depth=3, max_connections=10, per_host_limit=2, delay=0.02)
+    docs = list(loader.lazy_load())
+    assert len(docs) == 15
+    assert site.max_in_flight <= 2
+    starts = sorted(start for _, start in site.requests)
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    # небольшой допуск на точность таймеров
+    assert min(gaps) >= 0.02 - 0.005
+
+
+def test_early_close_stops_crawling(site):
+    loader = AsyncCrawlerLoader([site.seed], max_depth=10, max_connections=2, per_host_limit=2, delay=0)
+    threads_before = threading.active_count()
+    docs = loader.lazy_load()
+    taken = [next(docs) for _ in range(3)]
+    docs.close()
+    requests_at_close = len(site.requests)
+    time.sleep(10 * site.latency)
+    assert len(taken) == 3
+    assert len(site.requests) == requests_at_close < site.pages
+    assert threading.active_count() == threads_before
+
+
+def test_async_early_close_cancels_workers(site):
+    async def take_two():
+        loader = AsyncCrawlerLoader([site.seed], max_depth=10, max_connections=4, delay=0)
+        docs = loader.alazy_load()
+        taken = [await docs.__anext__(), await docs.__anext__()]
+        await docs.aclose()
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return taken, pending
+
+    taken, pending = asyncio.run(take_two())
+    assert len(taken) == 2
+    assert pending == []
+    assert len(site.requests) < site.pages
@@ -0,0 +1,80 @@
+"""
+Persistent on-disk JSON storage shared by the chunking and evaluation tools
+
+JsonCache keeps one small JSON file per key, named by the SHA-256 of the key
+parts, so concurrent writers never touch the same file unless they computed
+the same answer, and a rerun with unchanged inputs is served from disk.
+Every write goes through a temporary file and os.replace, so readers never
+see a partially written file. JSONL readers skip a torn last line left by
+an interrupted run.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+
+def hash_parts(*parts: Any) -> str:
+    """Stable SHA-256 of JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def atomic_write_text(path: Union[str, Path], text: str):
+    """Replace the file contents in one step (temporary file in the same directory + os.replace)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_jsonl(path: Union[str, Path]) -> Iterator[Dict]:
+    """Records of a JSONL file; a missing file is empty, unparsable lines are skipped"""
+    path = Path(path)
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # недописанная строка после прерванного запуска
+                continue
+
+
+class JsonCache:
+    """Key-value cache of JSON payloads stored as one file per key"""
+
+    def __init__(self, cache_dir: Union[str, Path]):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        # two-level layout keeps directories small for large caches
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        atomic_write_text(self._path(key), json.dumps(value, ensure_ascii=False))
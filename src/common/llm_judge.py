@@ -0,0 +1,121 @@
+"""
+Concurrent LLM-as-judge with a persistent verdict cache
+
+Judgments run as async requests with bounded concurrency, so a large suite of
+golden answers takes about as long as a few round-trips. Verdicts are stored
+on disk keyed by (model, prompt template hash, query, prediction, reference),
+so a rerun with unchanged answers makes no requests at all.
+
+A failed judgement (network or API error) is reported for its item only;
+the other verdicts are kept and cached.
+
+Any LangChain chat model with ainvoke() works as the judge; for tests point
+ChatOpenAI's base_url at a local OpenAI-compatible stub.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from src.common.json_cache import JsonCache, hash_parts
+
+
+QA_PROMPT = """Ты эксперт по оценке качества ответов.
+
+Вопрос: {query}
+Ожидаемый ответ: {reference}
+Полученный ответ: {prediction}
+
+Оцени, насколько полученный ответ соответствует ожидаемому по смыслу.
+Ответь ТОЛЬКО одним словом: CORRECT или INCORRECT"""
+
+DEFAULT_CACHE_DIR = ".cache/judge_verdicts"
+
+
+def build_qa_prompt(query: str, prediction: str, reference: str) -> str:
+    return QA_PROMPT.format(query=query, prediction=prediction, reference=reference)
+
+
+def parse_verdict(content: str) -> Tuple[float, str]:
+    """Verdict string and its score (1.0 for CORRECT, 0.0 otherwise)"""
+    verdict = content.strip().upper()
+    return (1.0 if verdict == "CORRECT" else 0.0), verdict
+
+
+class LLMJudge:
+    """Async judge runner over a chat model, with an on-disk verdict cache"""
+
+    def __init__(
+            self,
+            llm,
+            cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+            max_concurrency: int = 8,
+            prompt_template: str = QA_PROMPT,
+    ):
+        """
+        Args:
+            llm: Chat model used as the judge
+            cache_dir: Directory for cached verdicts (None disables the cache)
+            max_concurrency: Maximum number of judge requests in flight
+            prompt_template: Template with {query}, {prediction} and {reference}
+        """
+        self.llm = llm
+        self.cache = JsonCache(cache_dir) if cache_dir else None
+        self.max_concurrency = max_concurrency
+        self.prompt_template = prompt_template
+        self.model_name = getattr(llm, "model_name", None) or type(llm).__name__
+        self._prompt_hash = hash_parts(prompt_template)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def cache_key(self, query: str, prediction: str, reference: str) -> str:
+        return hash_parts(self.model_name, self._prompt_hash, query, prediction, reference)
+
+    async def ajudge(self, query: str, prediction: str, reference: str) -> Tuple[float, str]:
+        """Judge one answer, using the cache when possible"""
+        key = self.cache_key(query, prediction, reference)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            self.hits += 1
+            return cached["score"], cached["verdict"]
+
+        self.misses += 1
+        prompt = self.prompt_template.format(query=query, prediction=prediction, reference=reference)
+        response = await self.llm.ainvoke(prompt)
+        score, verdict = parse_verdict(response.content)  # type: ignore
+        if self.cache is not None:
+            self.cache.set(key, {"score": score, "verdict": verdict})
+        return score, verdict
+
+    async def ajudge_many(self, items: List[Dict[str, str]]) -> List[Tuple[Optional[float], str]]:
+        """
+        Judge many answers concurrently
+
+        Args:
+            items: Dicts with "query", "prediction" and "reference"
+
+        Returns:
+            (score, verdict) per item, in the same order; a failed judgement
+            gives (None, "ERROR: <exception type>") and does not affect the others
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(item):
+            async with semaphore:
+                return await self.ajudge(item["query"], item["prediction"], item["reference"])
+
+        results = await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+        verdicts = []
+        for result in results:
+            if isinstance(result, Exception):
+                self.errors += 1
+                verdicts.append((None, f"ERROR: {type(result).__name__}"))
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                verdicts.append(result)
+        return verdicts
+
+    def judge_many(self, items: List[Dict[str, str]]) -> List[Tuple[Optional[float], str]]:
+        """Synchronous wrapper around ajudge_many()"""
+        return asyncio.run(self.ajudge_many(items))
@@ -0,0 +1,43 @@
+import json
+
+from src.common.json_cache import JsonCache, atomic_write_text, hash_parts, read_jsonl
+
+
+def test_hash_parts_is_stable_and_order_sensitive():
+    assert hash_parts("model", {"b": 1, "a": 2}) == hash_parts("model", {"a": 2, "b": 1})
+    assert hash_parts("a", "b") != hash_parts("b", "a")
+
+
+def test_cache_roundtrip_survives_new_instance(tmp_path):
+    cache = JsonCache(tmp_path)
+    key = hash_parts("вопрос")
+    assert cache.get(key) is None
+    cache.set(key, {"verdict": "CORRECT", "score": 1.0})
+
+    reopened = JsonCache(tmp_path)
+    assert reopened.get(key) == {"verdict": "CORRECT", "score": 1.0}
+    assert (cache.hits, cache.misses, reopened.hits) == (0, 1, 1)
+    # временные файлы атомарной записи не остаются
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_corrupted_entry_is_a_miss(tmp_path):
+    cache = JsonCache(tmp_path)
+    key = hash_parts("x")
+    cache.set(key, [1])
+    cache._path(key).write_text("{", encoding="utf-8")
+    assert cache.get(key) is None
+
+
+def test_atomic_write_replaces_whole_file(tmp_path):
+    path = tmp_path / "sub" / "data.jsonl"
+    atomic_write_text(path, "old\n" * 100)
+    atomic_write_text(path, "new\n")
+    assert path.read_text(encoding="utf-8") == "new\n"
+
+
+def test_read_jsonl_skips_torn_lines(tmp_path):
+    path = tmp_path / "results.jsonl"
+    assert list(read_jsonl(path)) == []
+    path.write_text(json.dumps({"id": 1}) + "\n\n" + json.dumps({"id": 2}) + '\n{"id": 3', encoding="utf-8")
+    assert list(read_jsonl(path)) == [{"id": 1}, {"id": 2}]
@@ -0,0 +1,74 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+
+from src.common.llm_judge import LLMJudge
+
+
+class FakeJudgeModel:
+    """Чат-модель-заглушка: CORRECT, если ответ совпадает с эталоном; падает на вопросах с 'сбой'"""
+
+    model_name = "fake-judge"
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if "сбой" in prompt:
+                raise ConnectionError("provider unavailable")
+            expected = prompt.split("Ожидаемый ответ: ")[1].split("\n")[0]
+            received = prompt.split("Полученный ответ: ")[1].split("\n")[0]
+            return AIMessage(content="CORRECT" if expected == received else " incorrect\n")
+        finally:
+            self.in_flight -= 1
+
+
+def make_items(n: int):
+    return [
+        {"query": f"вопрос {i}", "prediction": "да" if i % 2 == 0 else "нет", "reference": "да"}
+        for i in range(n)
+    ]
+
+
+def test_judge_many_keeps_order_and_bounds_concurrency(tmp_path):
+    llm = FakeJudgeModel()
+    judge = LLMJudge(llm, cache_dir=str(tmp_path), max_concurrency=3)
+    results = judge.judge_many(make_items(10))
+    assert results == [(1.0, "CORRECT") if i % 2 == 0 else (0.0, "INCORRECT") for i in range(10)]
+    assert llm.max_in_flight == 3
+    assert (judge.hits, judge.misses) == (0, 10)
+
+
+def test_rerun_is_served_from_cache(tmp_path):
+    LLMJudge(FakeJudgeModel(), cache_dir=str(tmp_path)).judge_many(make_items(6))
+
+    llm = FakeJudgeModel()
+    judge = LLMJudge(llm, cache_dir=str(tmp_path))
+    results = judge.judge_many(make_items(6))
+    assert llm.calls == 0
+    assert judge.hits == 6
+    assert [score for score, _ in results] == [1.0, 0.0] * 3
+
+
+def test_failed_judgement_does_not_lose_the_others(tmp_path):
+    items = make_items(5)
+    items[2]["query"] = "сбой"
+    judge = LLMJudge(FakeJudgeModel(), cache_dir=str(tmp_path))
+    results = judge.judge_many(items)
+    assert results[2] == (None, "ERROR: ConnectionError")
+    assert [r for i, r in enumerate(results) if i != 2] == [(1.0, "CORRECT"), (0.0, "INCORRECT"),
+                                                            (0.0, "INCORRECT"), (1.0, "CORRECT")]
+    assert judge.errors == 1
+
+    # удачные вердикты уже в кэше: повтор спрашивает модель только об упавшем
+    llm = FakeJudgeModel()
+    LLMJudge(llm, cache_dir=str(tmp_path)).judge_many(items)
+    assert llm.calls == 1